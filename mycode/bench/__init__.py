@@ -0,0 +1,35 @@
+# mycode\bench\__init__.py
+
+from .harness import (
+    BASELINE_PATH,
+    DEFAULT_THRESHOLDS,
+    time_function,
+    time_run,
+    machine_info,
+    benchmark_results,
+    save_results,
+    load_results,
+    compare_results,
+    format_comparison
+)
+from .micro import MICRO_BENCHMARKS, micro_benchmark, run_micro_benchmarks
+from .macro import macro_experiments, macro_benchmark_name, run_macro_benchmarks
+
+__all__ = [
+    "BASELINE_PATH",
+    "DEFAULT_THRESHOLDS",
+    "time_function",
+    "time_run",
+    "machine_info",
+    "benchmark_results",
+    "save_results",
+    "load_results",
+    "compare_results",
+    "format_comparison",
+    "MICRO_BENCHMARKS",
+    "micro_benchmark",
+    "run_micro_benchmarks",
+    "macro_experiments",
+    "macro_benchmark_name",
+    "run_macro_benchmarks"
+]
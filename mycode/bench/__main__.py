@@ -0,0 +1,105 @@
+import argparse
+import fnmatch
+import os
+import sys
+
+from .harness import (
+    BASELINE_PATH,
+    DEFAULT_THRESHOLDS,
+    benchmark_results,
+    compare_results,
+    default_results_path,
+    format_comparison,
+    load_results,
+    save_results
+)
+from .macro import macro_benchmark_name, macro_experiments, run_macro_benchmarks
+from .micro import MICRO_BENCHMARKS, run_micro_benchmarks
+
+
+def _select(names: list[str], patterns: list[str] | None) -> list[str]:
+    if patterns is None:
+        return names
+    return [name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+
+def main():
+    """
+    Main entry point for running the benchmarks and comparing them against the baseline.
+    """
+    parser = argparse.ArgumentParser(
+        description="Run the micro- and macro-benchmarks of the testing processes, see `mycode/bench`.",
+        epilog="""
+        Example usage: `python -m mycode.bench --suite micro --filter "micro/*specification"`,
+        which times the specifications of every program and compares them against the baseline.
+        """
+    )
+    parser.add_argument('--suite', choices=["micro", "macro", "all"], default="all",
+                        help="The benchmarks to run, `all` by default.")
+    parser.add_argument(
+        '--filter',
+        type=lambda value: [item.strip() for item in value.split(",") if item.strip()],
+        help="A comma-separated list of glob patterns of the benchmark names, e.g., `micro/OPO_UTest,macro/QFT-*`.",
+        default=None
+    )
+    parser.add_argument('--list', action="store_true", help="List the benchmarks without running them.")
+    parser.add_argument('--repeats', type=int, default=None,
+                        help="The number of measurements of each benchmark, 5 for micro and 3 for macro by default.")
+    parser.add_argument('--output', type=str, default=None,
+                        help="The JSON file of the results, `bench_results/bench_<DATE>.json` by default.")
+    parser.add_argument('--baseline', type=str, default=BASELINE_PATH,
+                        help="The JSON file of the baseline, `mycode/bench/baseline.json` by default.")
+    parser.add_argument('--save-baseline', action="store_true",
+                        help="Save the results as the baseline (keeping its thresholds) instead of comparing them.")
+    args = parser.parse_args()
+
+    micro_names = _select(list(MICRO_BENCHMARKS), args.filter) if args.suite in ["micro", "all"] else []
+    macro_names = _select([macro_benchmark_name(*experiment) for experiment in macro_experiments()],
+                          args.filter) if args.suite in ["macro", "all"] else []
+    if args.list:
+        print("\n".join(micro_names + macro_names))
+        return
+    if not micro_names and not macro_names:
+        parser.error("no benchmark matches the arguments")
+
+    benchmarks = {}
+    if micro_names:
+        print(f"Running {len(micro_names)} micro-benchmarks...")
+        benchmarks.update(run_micro_benchmarks(micro_names, args.repeats or 5))
+    if macro_names:
+        print(f"Running {len(macro_names)} macro-benchmarks...")
+        benchmarks.update(run_macro_benchmarks(macro_names, args.repeats or 3))
+    results = benchmark_results(benchmarks)
+    output_path = args.output or default_results_path()
+    save_results(results, output_path)
+    print(f"The results are saved at {output_path}")
+
+    if args.save_baseline:
+        # The benchmarks that were not run keep their previous timings
+        baseline = {"thresholds": DEFAULT_THRESHOLDS, "benchmarks": {}}
+        if os.path.isfile(args.baseline):
+            baseline = load_results(args.baseline)
+        save_results({
+            "thresholds": baseline.get("thresholds", DEFAULT_THRESHOLDS),
+            **results,
+            "benchmarks": {**baseline["benchmarks"], **benchmarks}
+        }, args.baseline)
+        print(f"The baseline is saved at {args.baseline}")
+        return
+    if not os.path.isfile(args.baseline):
+        print(f"No baseline at {args.baseline}, use --save-baseline to record one.")
+        return
+
+    # Only the benchmarks that were run are compared
+    baseline = load_results(args.baseline)
+    baseline = dict(baseline, benchmarks={
+        name: timing for name, timing in baseline["benchmarks"].items() if name in benchmarks
+    })
+    rows = compare_results(results, baseline)
+    print(format_comparison(rows, results, baseline))
+    if any(row["status"] == "regression" for row in rows):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
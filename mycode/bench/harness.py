@@ -0,0 +1,340 @@
+"""
+This module times the benchmarks, records them as JSON and compares them against a baseline.
+
+A micro-benchmark times a function of the testing processes on fixed inputs by
+``timeit``: the number of calls per measurement is calibrated so that one measurement
+lasts at least `MIN_MEASURE_SECONDS`, and the median of several measurements is kept.
+A macro-benchmark times a fixed slice of an experiment as a whole, see
+`mycode/bench/macro.py`. The results are saved with the information of the machine
+(platform, CPU, memory and library versions), as the timings of different machines
+are not comparable.
+
+A benchmark regresses if its median is slower than the baseline by more than its
+threshold, e.g., a threshold of 0.3 flags a benchmark that got 30% slower. The
+thresholds are looked up by the name of the benchmark, a glob pattern of names, and
+then its kind (`micro` or `macro`), so that noisy benchmarks (e.g., the specifications
+taking a few microseconds) can be given a looser threshold in the baseline.
+"""
+
+import fnmatch
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+import timeit
+from datetime import datetime, timezone
+from importlib import metadata
+from typing import Callable, Literal
+
+import psutil
+
+# The committed baseline of the repository
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+# The default directory of the results at the root of the repository
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "bench_results")
+# The relative slowdowns tolerated by default before a benchmark is flagged as a regression
+DEFAULT_THRESHOLDS = {"micro": 0.5, "macro": 0.3}
+# The minimum duration of one measurement of a micro-benchmark
+MIN_MEASURE_SECONDS = 0.2
+# The libraries whose versions are recorded with the results
+_LIBRARIES = ["qiskit", "qiskit-aer", "numpy", "scipy", "psutil"]
+
+
+def time_function(function: Callable[[], object], repeats: int = 5, min_seconds: float = MIN_MEASURE_SECONDS) -> dict:
+    """
+    Time a function without arguments, see the module docstring.
+
+    Args:
+        function (Callable[[], object]): The function to time.
+        repeats (int): The number of measurements.
+        min_seconds (float): The minimum duration of one measurement.
+
+    Returns:
+        dict: The median, minimum and maximum seconds per call (`median`, `min` and
+              `max`), the number of measurements (`repeats`) and of calls per
+              measurement (`loops`).
+
+    Example:
+        >>> time_function(lambda: generate_numbers(8, 2))
+        {'median': 0.00021, 'min': 0.0002, 'max': 0.00024, 'repeats': 5, 'loops': 1000}
+    """
+    timer = timeit.Timer(function, timer=time.perf_counter)
+    # The smallest power of ten of calls lasting at least `min_seconds`, also warming up the caches
+    loops = 1
+    while timer.timeit(loops) < min_seconds:
+        loops *= 10
+    seconds = [total / loops for total in timer.repeat(repeats, loops)]
+    return {
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "max": max(seconds),
+        "repeats": repeats,
+        "loops": loops
+    }
+
+
+def time_run(function: Callable[[], object], repeats: int = 3) -> dict:
+    """
+    Time a long-running function by calling it once per measurement, see `time_function`.
+    """
+    seconds = []
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start_time)
+    return {
+        "median": statistics.median(seconds),
+        "min": min(seconds),
+        "max": max(seconds),
+        "repeats": repeats,
+        "loops": 1
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info() -> dict:
+    """
+    Return the information of the machine and the environment recorded with the results.
+    """
+    versions = {}
+    for library in _LIBRARIES:
+        try:
+            versions[library] = metadata.version(library)
+        except metadata.PackageNotFoundError:
+            versions[library] = None
+    cpu_freq = psutil.cpu_freq()
+    return {
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor() or None,
+        "python": platform.python_version(),
+        "logical_cpus": psutil.cpu_count(logical=True),
+        "physical_cpus": psutil.cpu_count(logical=False),
+        "max_cpu_mhz": cpu_freq.max if cpu_freq is not None else None,
+        "total_memory_mb": psutil.virtual_memory().total / 2 ** 20,
+        "libraries": versions,
+        "git_commit": _git_commit()
+    }
+
+
+def benchmark_results(benchmarks: dict[str, dict]) -> dict:
+    """
+    Bundle the timings of the benchmarks with the machine information and the date.
+    """
+    return {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "machine": machine_info(),
+        "benchmarks": benchmarks
+    }
+
+
+def save_results(results: dict, path: str) -> None:
+    """
+    Save the results (or a baseline) as a JSON file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=4)
+        file.write("\n")
+
+
+def load_results(path: str) -> dict:
+    """
+    Load the results (or a baseline) from a JSON file.
+    """
+    with open(path, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def default_results_path() -> str:
+    """
+    Return a new results file under `DEFAULT_RESULTS_DIR`, named by the current time.
+    """
+    return os.path.join(DEFAULT_RESULTS_DIR, f"bench_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+
+
+def benchmark_threshold(name: str, kind: Literal["micro", "macro"], thresholds: dict[str, float]) -> float:
+    """
+    Return the threshold of a benchmark by its name, the first glob pattern matching
+    its name (e.g., `micro/*_specification`), its kind, or `DEFAULT_THRESHOLDS`.
+    """
+    if name in thresholds:
+        return thresholds[name]
+    for pattern, threshold in thresholds.items():
+        if pattern not in DEFAULT_THRESHOLDS and fnmatch.fnmatchcase(name, pattern):
+            return threshold
+    return thresholds.get(kind, DEFAULT_THRESHOLDS[kind])
+
+
+def compare_results(results: dict, baseline: dict) -> list[dict]:
+    """
+    Compare the medians of the benchmarks against a baseline.
+
+    Args:
+        results (dict): The current results, see `benchmark_results`.
+        baseline (dict): The baseline results, optionally with the `thresholds` by
+                         benchmark name, glob pattern or kind.
+
+    Returns:
+        list[dict]: One row per benchmark of either side, with the keys `name`, `baseline`
+                    and `current` (the medians or None), `ratio` (current / baseline),
+                    `threshold` and `status`, i.e., `regression`, `improvement`, `ok`,
+                    `new` (not in the baseline) or `missing` (not run).
+
+    Example:
+        >>> compare_results(results, load_results(BASELINE_PATH))[0]
+        {'name': 'micro/OPO_UTest', 'baseline': 0.0011, 'current': 0.0016, 'ratio': 1.45,
+         'threshold': 0.5, 'status': 'ok'}
+    """
+    thresholds = baseline.get("thresholds", {})
+    current_benchmarks, baseline_benchmarks = results["benchmarks"], baseline["benchmarks"]
+    rows = []
+    for name in list(current_benchmarks) + [name for name in baseline_benchmarks if name not in current_benchmarks]:
+        current, reference = current_benchmarks.get(name), baseline_benchmarks.get(name)
+        kind = (current or reference)["kind"]
+        threshold = benchmark_threshold(name, kind, thresholds)
+        row = {
+            "name": name,
+            "baseline": reference["median"] if reference else None,
+            "current": current["median"] if current else None,
+            "ratio": None,
+            "threshold": threshold
+        }
+        if reference is None:
+            row["status"] = "new"
+        elif current is None:
+            row["status"] = "missing"
+        else:
+            row["ratio"] = current["median"] / reference["median"]
+            if row["ratio"] > 1 + threshold:
+                row["status"] = "regression"
+            elif row["ratio"] < 1 / (1 + threshold):
+                row["status"] = "improvement"
+            else:
+                row["status"] = "ok"
+        rows.append(row)
+    return rows
+
+
+def _format_duration(seconds: float | None) -> str:
+    if seconds is None:
+        return "-"
+    for unit, scale in [("s", 1), ("ms", 1e-3), ("us", 1e-6)]:
+        if seconds >= scale:
+            return f"{seconds / scale:.3g} {unit}"
+    return f"{seconds / 1e-9:.3g} ns"
+
+
+def format_comparison(rows: list[dict], results: dict, baseline: dict) -> str:
+    """
+    Format the comparison as a table, noting whether the machines of both sides differ.
+    """
+    name_width = max([len(row["name"]) for row in rows] + [9])
+    header = f"{'Benchmark':<{name_width}}  {'Baseline':>10}  {'Current':>10}  {'Ratio':>6}  {'Limit':>6}  Status"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        ratio = f"{row['ratio']:.2f}" if row["ratio"] is not None else "-"
+        lines.append(
+            f"{row['name']:<{name_width}}  {_format_duration(row['baseline']):>10}  "
+            f"{_format_duration(row['current']):>10}  {ratio:>6}  {1 + row['threshold']:>6.2f}  {row['status']}"
+        )
+    lines.append("-" * len(header))
+    statuses = [row["status"] for row in rows]
+    lines.append(", ".join(f"{statuses.count(status)} {status}" for status in
+                           ["regression", "improvement", "ok", "new", "missing"] if status in statuses))
+    machine_keys = ["platform", "processor", "logical_cpus", "total_memory_mb"]
+    if any(results["machine"].get(key) != baseline.get("machine", {}).get(key) for key in machine_keys):
+        lines.append("Note: the baseline was recorded on another machine, so the ratios are indicative only.")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the benchmark harness.
+    Run:
+        python -m mycode.bench.harness
+    """
+    import tempfile
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_results():
+        benchmarks = {
+            "micro/fast": {"kind": "micro", "median": 1.0e-3},
+            "micro/noisy": {"kind": "micro", "median": 2.9e-3},
+            "macro/slow": {"kind": "macro", "median": 2.0},
+            "macro/new": {"kind": "macro", "median": 1.0}
+        }
+        baseline = {
+            "thresholds": {"micro/noisy": 2.0, "micro/*y": 1.0, "macro": 0.25},
+            "benchmarks": {
+                "micro/fast": {"kind": "micro", "median": 3.0e-3},
+                "micro/noisy": {"kind": "micro", "median": 1.0e-3},
+                "macro/slow": {"kind": "macro", "median": 1.5},
+                "macro/old": {"kind": "macro", "median": 1.0}
+            }
+        }
+        return benchmark_results(benchmarks), baseline
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_timing(results_baseline):
+        timing = time_function(lambda: time.sleep(1e-3), repeats=3, min_seconds=0.02)
+        assert timing["repeats"] == 3 and timing["loops"] == 100
+        assert 1e-3 <= timing["min"] <= timing["median"] <= timing["max"]
+        timing = time_run(lambda: time.sleep(1e-2), repeats=2)
+        assert timing["loops"] == 1 and timing["median"] >= 1e-2
+
+    def unit_test_compare(results_baseline):
+        results, baseline = results_baseline
+        rows = {row["name"]: row for row in compare_results(results, baseline)}
+        # The thresholds are looked up by name, then by pattern, then by kind, then by default
+        assert [rows[name]["threshold"] for name in ["micro/fast", "micro/noisy", "macro/slow"]] == [0.5, 2.0, 0.25]
+        assert benchmark_threshold("micro/lazy", "micro", baseline["thresholds"]) == 1.0
+        assert rows["micro/fast"]["status"] == "improvement" and rows["micro/noisy"]["status"] == "ok"
+        assert rows["macro/slow"]["status"] == "regression" and abs(rows["macro/slow"]["ratio"] - 4 / 3) < 1e-9
+        assert rows["macro/new"]["status"] == "new" and rows["macro/old"]["status"] == "missing"
+        assert "1 regression, 1 improvement, 1 ok, 1 new, 1 missing" in format_comparison(list(rows.values()), results, baseline)
+
+    def unit_test_save_load(results_baseline):
+        results, _ = results_baseline
+        assert results["machine"]["logical_cpus"] >= 1 and results["machine"]["libraries"]["numpy"]
+        path = os.path.join(tempfile.mkdtemp(), "bench", "results.json")
+        save_results(results, path)
+        assert load_results(path) == results
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_results, "function": unit_test_timing},
+        "1": {"input": test_input_results, "function": unit_test_compare},
+        "2": {"input": test_input_results, "function": unit_test_save_load},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
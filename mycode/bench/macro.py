@@ -0,0 +1,148 @@
+"""
+This module defines the macro-benchmarks, i.e., a fixed slice of RQ1 and RQ2 of every program.
+
+The work items of each experiment in the `toy` mode are enumerated by a dry run (see
+`mycode/planner.py`), and the first `MACRO_ITEMS` of them in the order of execution
+form its slice. The slice is then run by `run_experiments` through the workload slice
+of these items (see `mycode/utils/workload_slice.py`), seeded and without any result
+cache, so that every run executes the same circuits. The experiments save their CSV
+files and checkpoint journals under a temporary directory (see ``saving_root``), so
+that the results of the replication are never overwritten.
+"""
+
+import contextlib
+import io
+import shutil
+import tempfile
+
+from ..config import ABB2FULL_MAPPING
+from ..planner import plan_experiments
+from ..run import expand_experiments, run_experiments
+from ..utils import saving_root
+from .harness import time_run
+
+# The RQs of the macro-benchmarks, and the number of work items of each experiment
+MACRO_RQS = ["1", "2"]
+MACRO_ITEMS = 1
+# The replication mode and the seed of the slices
+MACRO_MODE = "toy"
+MACRO_SEED = 0
+
+
+def macro_experiments() -> list[tuple[str, str]]:
+    """
+    Return the (program abbreviation, RQ index) pairs of the macro-benchmarks.
+    """
+    return expand_experiments(list(ABB2FULL_MAPPING), MACRO_RQS, skip_missing=True)
+
+
+def macro_benchmark_name(abbreviation: str, rq_num: str) -> str:
+    """
+    Return the name of a macro-benchmark, e.g., `macro/QFT-RQ1`.
+    """
+    return f"macro/{ABB2FULL_MAPPING[abbreviation]}-RQ{rq_num}"
+
+
+def macro_slices(experiments: list[tuple[str, str]]) -> dict[tuple[str, str], list[str]]:
+    """
+    Return the keys of the first `MACRO_ITEMS` work items of each experiment, see the module docstring.
+    """
+    items = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        plan_experiments(experiments, MACRO_MODE, items=items)
+    slices = {experiment: [] for experiment in experiments}
+    for item in items:
+        keys = slices[(item["program"], item["rq"])]
+        if len(keys) < MACRO_ITEMS:
+            keys.append(item["key"])
+    return slices
+
+
+def run_macro_benchmarks(names: list[str] | None = None, repeats: int = 3) -> dict[str, dict]:
+    """
+    Run the macro-benchmarks and return their timings, see `time_run`.
+
+    Args:
+        names (list[str] | None): The names of the benchmarks to run, all by default.
+        repeats (int): The number of runs of each slice.
+
+    Returns:
+        dict[str, dict]: The timing of each benchmark by name, with the kind `macro` and
+                         the number of work items of the slice (`items`).
+    """
+    experiments = [
+        experiment for experiment in macro_experiments()
+        if names is None or macro_benchmark_name(*experiment) in names
+    ]
+    timings = {}
+    root_dir = tempfile.mkdtemp(prefix="mycode_bench_")
+    try:
+        for experiment, keys in macro_slices(experiments).items():
+            def run_slice():
+                # The journal of the previous run is discarded by running in a fresh directory
+                with saving_root(tempfile.mkdtemp(dir=root_dir)), contextlib.redirect_stdout(io.StringIO()):
+                    run_experiments([experiment], MACRO_MODE, seed=MACRO_SEED, workload={"items": keys})
+
+            timings[macro_benchmark_name(*experiment)] = {"kind": "macro", "items": len(keys), **time_run(run_slice, repeats)}
+    finally:
+        shutil.rmtree(root_dir, ignore_errors=True)
+    return timings
+
+
+if __name__ == "__main__":
+    """
+    Smoke testing for the macro-benchmarks.
+    Run:
+        python -m mycode.bench.macro
+    """
+    import os
+
+    from ..campaign import journal_path
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_experiments():
+        return [("pauli", "2")]
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_experiments(experiments):
+        # Every program has RQ1 and RQ2
+        assert len(macro_experiments()) == 2 * len(ABB2FULL_MAPPING)
+        assert macro_benchmark_name(*experiments[0]) == "macro/LinearPauliRotations-RQ2"
+
+    def unit_test_run(experiments):
+        slices = macro_slices(experiments)
+        assert len(slices[experiments[0]]) == MACRO_ITEMS
+        # The slice is fixed, and runs without touching the data of the repository
+        assert macro_slices(experiments) == slices
+        journal = journal_path(*experiments[0], MACRO_MODE)
+        modified = os.path.getmtime(journal) if os.path.isfile(journal) else None
+        timing = run_macro_benchmarks([macro_benchmark_name(*experiments[0])], repeats=2)["macro/LinearPauliRotations-RQ2"]
+        assert timing["items"] == MACRO_ITEMS and timing["repeats"] == 2
+        # The second run is not resumed from the journal of the first one
+        assert timing["min"] > 0.5 * timing["max"]
+        assert (os.path.getmtime(journal) if os.path.isfile(journal) else None) == modified
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_experiments, "function": unit_test_experiments},
+        "1": {"input": test_input_experiments, "function": unit_test_run},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
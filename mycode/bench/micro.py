@@ -0,0 +1,297 @@
+"""
+This module defines the micro-benchmarks, i.e., the functions called by every test case.
+
+Each benchmark is registered by `micro_benchmark` as a setup function, which builds the
+inputs once and returns the function to time without arguments, so that only the
+benchmarked call is measured. The inputs are fixed and sized as the test cases of the
+`all` mode with 4 target qubits and 1024 shots, e.g., the measured counts of the
+uniform distribution over 4 qubits. The functions decorated with ``timed_stage`` are
+timed with their stage timing, as in the testing processes.
+"""
+
+import importlib
+import math
+from typing import Callable
+
+import numpy as np
+from qiskit import QuantumCircuit
+
+from ..config import ABB2FULL_MAPPING
+from ..utils import (
+    generate_numbers,
+    iter_numbers,
+    Counts,
+    outputdict2samps,
+    OPO_UTest,
+    expected_samples,
+    bit_controlled_preparation_1MS,
+    qubit_controlled_preparation_1MS,
+    bit_recycled_preparation_1MS,
+    qubit_recycled_preparation_1MS,
+    bit_controlled_preparation_2MS,
+    qubit_controlled_preparation_2MS,
+    bit_controlled_preparation_kMS,
+    qubit_controlled_preparation_kMS,
+    bit_controlled_preparation_MPS,
+    qubit_controlled_preparation_MPS,
+    fused_preparation_2MS,
+    fused_preparation_MPS,
+    control_state_preparation,
+    repeat_until_success,
+    generate_invalid_masks
+)
+from .harness import time_function
+
+# The setup functions of the micro-benchmarks by name
+MICRO_BENCHMARKS: dict[str, Callable[[], Callable[[], object]]] = {}
+
+# The sizes of the inputs, i.e., the target qubits, the control qubits and the shots
+_N, _M, _SHOTS = 4, 2, 1024
+
+
+def micro_benchmark(name: str) -> Callable:
+    """
+    Register the setup function of a micro-benchmark under `micro/<name>`.
+    """
+    def register(setup: Callable[[], Callable[[], object]]) -> Callable[[], Callable[[], object]]:
+        MICRO_BENCHMARKS[f"micro/{name}"] = setup
+        return setup
+    return register
+
+
+def _uniform_counts(n: int, shots: int) -> Counts:
+    return Counts(np.full(2 ** n, shots // 2 ** n, dtype=np.int64))
+
+
+# ----------------------------
+# Inputs, outputs and test oracle
+# ----------------------------
+
+@micro_benchmark("generate_numbers")
+def _generate_numbers():
+    return lambda: generate_numbers(8, 2)
+
+
+@micro_benchmark("iter_numbers")
+def _iter_numbers():
+    # The numbers are consumed one by one, as in the PSTC loops
+    return lambda: sum(1 for _ in iter_numbers(8, 2))
+
+
+@micro_benchmark("outputdict2samps")
+def _outputdict2samps():
+    dict_counts = dict(enumerate(_uniform_counts(_N, _SHOTS).array.tolist()))
+    return lambda: outputdict2samps(dict_counts)
+
+
+@micro_benchmark("OPO_UTest")
+def _OPO_UTest():
+    rng = np.random.default_rng(0)
+    exp_samps = rng.integers(0, 2 ** _N, _SHOTS)
+    test_samps = rng.integers(0, 2 ** _N, _SHOTS)
+    return lambda: OPO_UTest(exp_samps, test_samps)
+
+
+@micro_benchmark("expected_samples")
+def _expected_samples():
+    exp_probs = [1 / 2 ** _N] * 2 ** _N
+    return lambda: expected_samples(range(2 ** _N), size=_SHOTS, p=exp_probs)
+
+
+# ----------------------------
+# Program specifications
+# ----------------------------
+
+# The arguments of PSTC_specification and MSTC_specification of each program
+_NUMBERS = list(range(2 ** _N))
+_PROBS = [1 / 2 ** _N] * 2 ** _N
+_SPECIFICATION_ARGUMENTS = {
+    "id": ((_N, 5), (_PROBS,)),
+    "comp": ((_N, 5, 3, True), (_NUMBERS, _PROBS, 3, True)),
+    "amplitude": (
+        (_N, 5, math.pi / 4, math.pi / 2, [-1, 1], [-1, 1]),
+        (_N, _NUMBERS, _PROBS, math.pi / 4, math.pi / 2, [-1, 1], [-1, 1])
+    ),
+    "pauli": ((5, math.pi / 2, math.pi / 2), (_NUMBERS, _PROBS, math.pi / 2, math.pi / 2)),
+    "quad": (
+        ([0, 1, 0, 1], [[0, 0, 0, 0], [0, 1, 1, 0], [1, 0, 0, 1], [1, 1, 0, 0]], [1, 0, -1, 1], 1, 3),
+        (_NUMBERS, _N, [[0, 0, 0, 0], [0, 1, 1, 0], [1, 0, 0, 1], [1, 1, 0, 0]], [1, 0, -1, 1], 1, 3, _PROBS)
+    ),
+    "qft": ((_N, 5, True), (_NUMBERS, _PROBS, _N, True)),
+    "adder": ((3, [0, 1, 0, 1], [0, 1, 1, 1]), (_NUMBERS, _PROBS, _N, 3, [0, 1, 1, 1]))
+}
+
+
+def _register_specifications() -> None:
+    for abbreviation, (pstc_arguments, mstc_arguments) in _SPECIFICATION_ARGUMENTS.items():
+        full_name = ABB2FULL_MAPPING[abbreviation]
+        module = importlib.import_module(f"mycode.testing.{full_name}.utils")
+        for mode, arguments in [("PSTC", pstc_arguments), ("MSTC", mstc_arguments)]:
+            specification = getattr(module, f"{mode}_specification")
+            micro_benchmark(f"{full_name}/{mode}_specification")(
+                lambda specification=specification, arguments=arguments: lambda: specification(*arguments)
+            )
+
+
+_register_specifications()
+
+
+# ----------------------------
+# Preparation circuits
+# ----------------------------
+
+# The preparations applied to a fresh circuit of n + m qubits, with their extra arguments
+_PREPARATIONS = {
+    "bit_controlled_preparation_1MS": (bit_controlled_preparation_1MS, ()),
+    "qubit_controlled_preparation_1MS": (qubit_controlled_preparation_1MS, ()),
+    "bit_controlled_preparation_2MS": (bit_controlled_preparation_2MS, ()),
+    "qubit_controlled_preparation_2MS": (qubit_controlled_preparation_2MS, ()),
+    "bit_controlled_preparation_kMS": (bit_controlled_preparation_kMS, (2, 1)),
+    "qubit_controlled_preparation_kMS": (qubit_controlled_preparation_kMS, (2, 1)),
+    "bit_controlled_preparation_MPS": (bit_controlled_preparation_MPS, ()),
+    "qubit_controlled_preparation_MPS": (qubit_controlled_preparation_MPS, ())
+}
+
+
+def _register_preparations() -> None:
+    for name, (preparation, arguments) in _PREPARATIONS.items():
+        m = _N if name.endswith("1MS") else _M
+        micro_benchmark(name)(
+            lambda preparation=preparation, m=m, arguments=arguments:
+                lambda: preparation(_N, m, *arguments, QuantumCircuit(_N + m, _N + m))
+        )
+
+
+_register_preparations()
+
+
+@micro_benchmark("bit_recycled_preparation_1MS")
+def _bit_recycled_preparation_1MS():
+    return lambda: bit_recycled_preparation_1MS(_N, _M, QuantumCircuit(_M + _N, _N))
+
+
+@micro_benchmark("qubit_recycled_preparation_1MS")
+def _qubit_recycled_preparation_1MS():
+    return lambda: qubit_recycled_preparation_1MS(_N, _M, QuantumCircuit(_M + _N, _N))
+
+
+@micro_benchmark("fused_preparation_2MS")
+def _fused_preparation_2MS():
+    qc = bit_controlled_preparation_2MS(_N, _M, QuantumCircuit(_N + _M, _N + _M))
+    qc.measure(qc.qubits[_M:], qc.clbits[_M:])
+    return lambda: fused_preparation_2MS(_N, _M, qc)
+
+
+@micro_benchmark("fused_preparation_MPS")
+def _fused_preparation_MPS():
+    qc = bit_controlled_preparation_MPS(_N, _M, QuantumCircuit(_N + _M, _N + _M))
+    qc.measure(qc.qubits[_M:], qc.clbits[_M:])
+    return lambda: fused_preparation_MPS(_N, _M, qc)
+
+
+@micro_benchmark("control_state_preparation(sep)")
+def _separable_control_state_preparation():
+    theta_list = [math.pi / 3] * _N
+    return lambda: control_state_preparation(theta_list, "sep")
+
+
+@micro_benchmark("control_state_preparation(ent)")
+def _entangled_control_state_preparation():
+    theta_list = [math.pi / 3] * (2 ** _M - 1)
+    return lambda: control_state_preparation(theta_list, "ent")
+
+
+@micro_benchmark("control_state_preparation(multiplexed)")
+def _multiplexed_control_state_preparation():
+    theta_list = [math.pi / 3] * (2 ** _M - 1)
+    return lambda: control_state_preparation(theta_list, "ent", "multiplexed")
+
+
+# ----------------------------
+# Repeat-until-success
+# ----------------------------
+
+@micro_benchmark("repeat_until_success")
+def _repeat_until_success():
+    # The control qubits of an MPS circuit, whose outcome 11 is invalid
+    qc = QuantumCircuit(_N + _M, _N + _M)
+    qc.h(qc.qubits[:_M])
+    qc = bit_controlled_preparation_MPS(_N, _M, qc)
+    qc.measure(qc.qubits, qc.clbits)
+    invalid_list = generate_invalid_masks(_M, [2 ** _M - 1])
+    return lambda: repeat_until_success(qc, _SHOTS, invalid_list)
+
+
+@micro_benchmark("repeat_until_success(acceptance_prob)")
+def _repeat_until_success_acceptance():
+    qc = QuantumCircuit(_N + _M, _N + _M)
+    qc.h(qc.qubits[:_M])
+    qc = bit_controlled_preparation_MPS(_N, _M, qc)
+    qc.measure(qc.qubits, qc.clbits)
+    invalid_list = generate_invalid_masks(_M, [2 ** _M - 1])
+    return lambda: repeat_until_success(qc, _SHOTS, invalid_list, acceptance_prob=1 - 1 / 2 ** _M)
+
+
+def run_micro_benchmarks(names: list[str] | None = None, repeats: int = 5) -> dict[str, dict]:
+    """
+    Run the micro-benchmarks and return their timings, see `time_function`.
+
+    Args:
+        names (list[str] | None): The names of the benchmarks to run, all by default.
+        repeats (int): The number of measurements of each benchmark.
+
+    Returns:
+        dict[str, dict]: The timing of each benchmark by name, with the kind `micro`.
+    """
+    timings = {}
+    for name in names if names is not None else MICRO_BENCHMARKS:
+        timings[name] = {"kind": "micro", **time_function(MICRO_BENCHMARKS[name](), repeats)}
+    return timings
+
+
+if __name__ == "__main__":
+    """
+    Smoke testing for the micro-benchmarks.
+    Run:
+        python -m mycode.bench.micro
+    """
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_names():
+        return list(MICRO_BENCHMARKS)
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_benchmarks(names):
+        # Every program has both specifications, and every benchmark can be called
+        assert sum(name.endswith("_specification") for name in names) == 2 * len(ABB2FULL_MAPPING)
+        for name in names:
+            MICRO_BENCHMARKS[name]()()
+
+    def unit_test_run(names):
+        timings = run_micro_benchmarks(names[:2], repeats=2)
+        assert list(timings) == names[:2]
+        assert all(timing["kind"] == "micro" and timing["median"] > 0 for timing in timings.values())
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_names, "function": unit_test_benchmarks},
+        "1": {"input": test_input_names, "function": unit_test_run},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
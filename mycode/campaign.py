@@ -0,0 +1,413 @@
+"""
+This module schedules a replication campaign over programs, RQs and program versions.
+
+A campaign is split into work units, i.e., one program version of one (program, RQ)
+experiment, whose results are saved into their own CSV files. Each unit is charged a
+relative cost estimated from its configuration and the qubit and gate counts of its
+program version, and the units are dispatched longest
+job first onto a pool of worker processes. The workers pull the next unit from the
+shared queue as soon as they become idle, so that the largest units (e.g., the n=6
+WeightedAdder and QuadraticForm versions) start first rather than last.
+"""
+
+import functools
+import importlib
+import json
+import math
+import os
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Literal
+
+import numpy as np
+
+from .config import ABB2FULL_MAPPING
+from .utils import rep_mode_selection, RQ_saving_dir, checkpoint_journal, result_cache, workload_slice, profiling, CheckpointJournal
+
+# Configuration entries that do not multiply the number of test cases
+_NON_CASE_KEYS = {"versions", "qubit_list", "mixed_state_suites"}
+
+
+def _experiment_config(abbreviation: str, rq_num: str) -> dict:
+    full_name = ABB2FULL_MAPPING[abbreviation]
+    return importlib.import_module(f"mycode.testing.{full_name}.config.RQ{rq_num}_config").config_dict
+
+
+def journal_path(abbreviation: str, rq_num: str, rep_mode: Literal["toy", "all"] | None = None) -> str:
+    """
+    Return the checkpoint journal of an experiment, saved next to its CSV files.
+    """
+    full_name = ABB2FULL_MAPPING[abbreviation]
+    return os.path.join(
+        RQ_saving_dir(f"RQ{rq_num}", full_name, rep_mode),
+        f"RQ{rq_num}_{full_name}_journal.jsonl"
+    )
+
+
+def reset_journals(experiments: list[tuple[str, str]], rep_mode: Literal["toy", "all"] | None = None) -> None:
+    """
+    Delete the checkpoint journals of the experiments, so that they start from scratch.
+    """
+    for abbreviation, rq_num in experiments:
+        path = journal_path(abbreviation, rq_num, rep_mode)
+        if os.path.isfile(path):
+            os.remove(path)
+
+
+def merge_journals(
+    experiments: list[tuple[str, str]],
+    sources: list[str],
+    rep_mode: Literal["toy", "all"] | None = None
+) -> int:
+    """
+    Merge the checkpoint journals of the experiments found under the source directories.
+
+    The journals written by the shards of a campaign (e.g., the `data` directories copied
+    from several machines) are searched for by their file names, and their entries are
+    appended to the local journals, except for the work items already recorded. Resuming
+    the experiments afterwards rebuilds the same CSV files as a run without shards.
+
+    Args:
+        experiments (list[tuple[str, str]]): The (program abbreviation, RQ index) pairs.
+        sources (list[str]): The directories to search for the journals recursively.
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+
+    Returns:
+        int: The number of merged work items.
+    """
+    merged = 0
+    for abbreviation, rq_num in experiments:
+        target = journal_path(abbreviation, rq_num, rep_mode)
+        file_name = os.path.basename(target)
+        journal = CheckpointJournal(target)
+        for source in sources:
+            for dir_path, _, file_names in os.walk(source):
+                path = os.path.join(dir_path, file_name)
+                if file_name not in file_names or os.path.abspath(path) == os.path.abspath(target):
+                    continue
+                for entry in CheckpointJournal(path).entries():
+                    if entry["key"] not in journal:
+                        journal.append(entry["key"], entry["item"], entry["records"], entry["elapsed"])
+                        merged += 1
+    return merged
+
+
+def _size_key(key: str) -> int | None:
+    # Per-size entries are keyed by `qubit_num=<n>`, e.g., the weights of WeightedAdder
+    if isinstance(key, str) and key.startswith("qubit_num="):
+        return int(key.split("=", 1)[1])
+    return None
+
+
+def estimate_cost(
+    input_data: dict,
+    complexity: Callable[[int], tuple[int, int]] | None = None
+) -> float:
+    """
+    Estimate the relative cost of running one program version upon an experiment configuration.
+
+    The estimate only serves to order the work units. A test case upon a circuit of w qubits
+    and g gates of the program version is charged g + w gates (i.e., one preparation gate per
+    qubit), each applied to a statevector of 2^w amplitudes. For each program width n (from
+    `qubit_list`, the `qubit_num=n` keys or the mixed-state suites), there are 2^n classical
+    inputs times the entries configured for n, and each mixed-state test case adds its control
+    qubits to the width. Finally, the cost is multiplied by the sizes of the other parameter
+    lists, e.g., `L_list`, `sign_list` or `shots_list`.
+
+    Args:
+        input_data (dict): The configuration of the `toy` or `all` mode of an experiment.
+        complexity (Callable[[int], tuple[int, int]] | None): The numbers of qubits and gates
+            of the program version upon n input qubits, see `version_complexity`. By default,
+            the circuits have n qubits and no gates besides the preparation.
+
+    Returns:
+        float: The relative cost.
+
+    Example:
+        >>> estimate_cost({"versions": ["v1"], "qubit_list": [1, 2], "sign_list": [True, False]})
+        72.0
+    """
+    per_size = [value for value in input_data.values() if isinstance(value, dict) and any(
+        _size_key(key) is not None for key in value
+    )]
+    combos = math.prod(
+        len(value) for key, value in input_data.items()
+        if key not in _NON_CASE_KEYS and isinstance(value, (list, tuple, np.ndarray))
+    )
+
+    suites = list(input_data.get("mixed_state_suites", {}).values())
+    # (number of test cases, number of control qubits) of each mixed-state suite
+    suite_cases = [(len(suite.get("angles", [0])), suite.get("num_control", 0)) for suite in suites] or [(1, 0)]
+
+    if "qubit_list" in input_data:
+        widths = list(input_data["qubit_list"])
+    elif per_size:
+        widths = sorted({_size_key(key) for value in per_size for key in value if _size_key(key) is not None})
+    else:
+        widths = sorted({suite.get("num_target", 1) for suite in suites}) or [1]
+
+    cost = 0.0
+    for n in widths:
+        entries = math.prod(len(value.get(f"qubit_num={n}", [None])) for value in per_size)
+        num_qubits, num_gates = complexity(n) if complexity is not None else (n, 0)
+        for num_cases, num_control in suite_cases:
+            width = num_qubits + num_control
+            cost += entries * num_cases * 2 ** n * (num_gates + width) * 2 ** width
+    return float(combos * cost)
+
+
+@functools.lru_cache(maxsize=None)
+def version_complexity(
+    abbreviation: str,
+    rq_num: str,
+    rep_mode: Literal["toy", "all"] | None,
+    version: str | None,
+    n: int
+) -> tuple[int, int]:
+    """
+    Return the numbers of qubits and gates of a program version upon n input qubits.
+
+    The program version is built once with the first classical inputs of the experiment
+    configuration and fully decomposed, see the `version_complexity` of each program in
+    `mycode/testing/<PROG_FULL>/utils`. Identity has no program versions, and its circuits
+    only hold the state preparation upon n qubits.
+    """
+    if version is None:
+        return n, 0
+    full_name = ABB2FULL_MAPPING[abbreviation]
+    module = importlib.import_module(f"mycode.testing.{full_name}.utils.{abbreviation}_circuit_info")
+    input_data = rep_mode_selection(_experiment_config(abbreviation, rq_num), rep_mode)
+    return module.version_complexity(version, n, input_data)
+
+
+def expand_units(
+    experiments: list[tuple[str, str]],
+    rep_mode: Literal["toy", "all"] | None = None,
+    versions: list[str] | None = None
+) -> list[dict]:
+    """
+    Expand the (program, RQ) experiments into work units of one program version each.
+
+    Args:
+        experiments (list[tuple[str, str]]): The (program abbreviation, RQ index) pairs.
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        versions (list[str] | None): The program versions to keep, all by default. The
+                                     programs without versions are always kept.
+
+    Returns:
+        list[dict]: The units with the keys `program`, `rq`, `version` and `cost`, where
+                    `version` is None for programs without versions (i.e., `id`).
+    """
+    units = []
+    for abbreviation, rq_num in experiments:
+        input_data = rep_mode_selection(_experiment_config(abbreviation, rq_num), rep_mode)
+        for version in input_data.get("versions", [None]):
+            if versions is not None and version is not None and version not in versions:
+                continue
+            cost = estimate_cost(input_data, functools.partial(version_complexity, abbreviation, rq_num, rep_mode, version))
+            units.append({"program": abbreviation, "rq": rq_num, "version": version, "cost": cost})
+    return units
+
+
+def cached(cache_dir: str | None = None, seed: int | None = None):
+    """
+    Return the result cache context of a run, or a null context if neither option is given.
+    """
+    if cache_dir is None and seed is None:
+        return nullcontext()
+    return result_cache(cache_dir, seed)
+
+
+def sliced(workload: dict | None = None):
+    """
+    Return the workload slice context of a run (see `workload_slice`), or a null context if no filter is given.
+    """
+    if not workload:
+        return nullcontext()
+    return workload_slice(**workload)
+
+
+def profiled(
+    abbreviation: str,
+    rq_num: str,
+    rep_mode: Literal["toy", "all"] | None = None,
+    profile: Literal["cpu", "mem"] | None = None,
+    version: str | None = None
+):
+    """
+    Return the profiling context of an experiment or one of its units (see `profiling`), or a null context.
+
+    The reports are saved next to the CSV files of the experiment, e.g., `RQ1_QFT_cpu_profile.txt`,
+    or `RQ1_QFT_v2_cpu_profile.txt` for the unit of a program version.
+    """
+    if profile is None:
+        return nullcontext()
+    full_name = ABB2FULL_MAPPING[abbreviation]
+    name = f"RQ{rq_num}_{full_name}_{version}" if version is not None else f"RQ{rq_num}_{full_name}"
+    return profiling(profile, os.path.join(RQ_saving_dir(f"RQ{rq_num}", full_name, rep_mode), f"{name}_{profile}_profile"))
+
+
+def experiment_options(
+    abbreviation: str,
+    rq_num: str,
+    rep_mode: Literal["toy", "all"] | None = None,
+    versions: list[str] | None = None
+) -> dict | None:
+    """
+    Return the keyword arguments of `run_experiment` selecting the program versions.
+
+    Returns:
+        dict | None: The arguments, which are empty for all the versions or for the programs
+                     without versions, or None if no configured version is selected.
+    """
+    if versions is None:
+        return {}
+    selected_versions = [unit["version"] for unit in expand_units([(abbreviation, rq_num)], rep_mode, versions)]
+    if not selected_versions:
+        return None
+    return {} if selected_versions == [None] else {"versions": selected_versions}
+
+
+def run_unit(
+    unit: dict,
+    rep_mode: Literal["toy", "all"] | None = None,
+    verbose: bool = False,
+    cache_dir: str | None = None,
+    seed: int | None = None,
+    journal=None,
+    workload: dict | None = None,
+    profile: Literal["cpu", "mem"] | None = None
+) -> dict:
+    """
+    Run a work unit in the current process through the journal of its experiment and return it.
+
+    The journal defaults to the journal file of the experiment, see `journal_path`, and
+    the work items outside the workload slice (see `sliced`) are skipped. Given a profile,
+    the unit is profiled, see `profiled`.
+    """
+    full_name = ABB2FULL_MAPPING[unit["program"]]
+    module = importlib.import_module(
+        f"mycode.testing.{full_name}.experiments.{unit['program']}_RQ{unit['rq']}"
+    )
+    if journal is None:
+        journal = journal_path(unit["program"], unit["rq"], rep_mode)
+    profile_context = profiled(unit["program"], unit["rq"], rep_mode, profile, unit["version"])
+    with cached(cache_dir, seed), sliced(workload), checkpoint_journal(journal), profile_context:
+        if unit["version"] is None:
+            module.run_experiment(rep_mode, verbose)
+        else:
+            module.run_experiment(rep_mode, verbose, versions=[unit["version"]])
+    return unit
+
+
+def run_campaign(
+    experiments: list[tuple[str, str]],
+    rep_mode: Literal["toy", "all"] | None = None,
+    verbose: bool = False,
+    jobs: int = 1,
+    cache_dir: str | None = None,
+    seed: int | None = None,
+    versions: list[str] | None = None,
+    workload: dict | None = None,
+    profile: Literal["cpu", "mem"] | None = None
+) -> None:
+    """
+    Run the experiments as work units upon a pool of worker processes, longest job first.
+
+    The units are submitted in descending order of their estimated costs, and each idle
+    worker takes the next unit from the shared queue, so that the load is balanced
+    dynamically. A worker process is reused across units, sharing its imports and caches.
+
+    Args:
+        experiments (list[tuple[str, str]]): The (program abbreviation, RQ index) pairs.
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        verbose (bool): Whether to print detailed progress information.
+        jobs (int): The number of worker processes.
+        cache_dir (str | None): The result cache shared by the workers, see `mycode/utils/result_cache.py`.
+        seed (int | None): The seed of the work items, see `mycode/utils/result_cache.py`.
+        versions (list[str] | None): The program versions to run, all by default.
+        workload (dict | None): The filters of the work items, see `sliced`.
+        profile (Literal["cpu", "mem"] | None): Profile each unit within its worker, see `profiled`.
+
+    Raises:
+        RuntimeError: If any unit fails, after the other units are finished.
+    """
+    units = sorted(expand_units(experiments, rep_mode, versions), key=lambda unit: unit["cost"], reverse=True)
+    failures = []
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {executor.submit(run_unit, unit, rep_mode, verbose, cache_dir, seed, None, workload, profile): unit for unit in units}
+        for future in as_completed(futures):
+            unit = futures[future]
+            name = f"{ABB2FULL_MAPPING[unit['program']]}-RQ{unit['rq']}-{unit['version'] or 'all'}"
+            try:
+                future.result()
+                print(f"Unit {name} is done!")
+            except Exception as e:
+                print(f"Unit {name} failed: {e!r}")
+                failures.append(name)
+    if failures:
+        raise RuntimeError(f"{len(failures)} work units failed: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the campaign scheduler.
+    Run:
+        python -m mycode.campaign
+    """
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_experiments():
+        return [("id", "1"), ("adder", "1"), ("adder", "2"), ("quad", "3")]
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_estimate_cost(experiments):
+        # The cost grows with the number of parameters and the width
+        small = estimate_cost({"versions": ["v1"], "qubit_list": [1, 2], "sign_list": [True, False]})
+        assert small == 2 * (2 * 1 * 2 + 4 * 2 * 4)
+        assert estimate_cost({"qubit_list": [1, 2, 3]}) > estimate_cost({"qubit_list": [1, 2]})
+        # The per-size entries and the control qubits of suites are charged
+        sized = {"weight_dict": {"qubit_num=2": [[1, 1], [0, 1]]}}
+        assert estimate_cost(sized) == 2 * 4 * 2 * 4
+        suites = {"mixed_state_suites": {"T": {"num_target": 2, "num_control": 1, "angles": {"a": 0, "b": 0}}}}
+        assert estimate_cost(suites) == 2 * 4 * 3 * 8
+        # The qubits and gates of the program version are charged
+        assert estimate_cost({"qubit_list": [2]}, lambda n: (n + 1, 10)) == 4 * 13 * 8
+
+    def unit_test_expand_units(experiments):
+        units = expand_units(experiments, "all")
+        # Identity is one unit, and the others have one unit per version
+        assert [unit["version"] for unit in units if unit["program"] == "id"] == [None]
+        assert len(units) == 1 + 3 * 6
+        # The full sweep of QuadraticForm RQ3 outweighs the Identity RQ1
+        costs = {(unit["program"], unit["rq"]): unit["cost"] for unit in units}
+        assert costs[("quad", "3")] > costs[("id", "1")] > 0
+        assert all(unit["cost"] > 0 for unit in expand_units(experiments, "toy"))
+        # The versions of the same configuration differ by their gate counts
+        assert len({unit["cost"] for unit in units if unit["program"] == "adder" and unit["rq"] == "1"}) > 1
+        assert version_complexity("qft", "1", "all", "v1", 3)[1] > version_complexity("qft", "1", "all", "v1", 2)[1] > 0
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_experiments, "function": unit_test_estimate_cost},
+        "1": {"input": test_input_experiments, "function": unit_test_expand_units},
+    }
+
+    for id, execution_dict in executed_test.items():
+        print(f"test_id={id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
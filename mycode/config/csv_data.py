@@ -1,46 +1,84 @@
+# The stages of the test cases timed by `mycode/utils/stage_timing.py`, in the order they usually occur
+TIMING_STAGES = [
+    "input",            # Generating the classical inputs and invalid outcomes
+    "build",            # Building the preparations and the program under test
+    "transpile",        # Transpiling the circuits for the simulator
+    "simulate",         # Simulating the circuits (including the prefix snapshots)
+    "parse",            # Converting the counts into samples or probabilities
+    "specification",    # Computing the expected distributions
+    "sampling",         # Sampling the expected distributions
+    "oracle"            # Running the statistical test
+]
+STAGE_HEADERS = [f'ave_time({stage})' for stage in TIMING_STAGES]
+# The resources sampled by `mycode/utils/resource_sampling.py`, keyed by the headers
+RESOURCE_KEYS = {
+    'peak_rss(MB)': "peak_rss_mb",
+    'ave_cpu(%)': "ave_cpu_percent",
+    'max_threads': "max_threads",
+    'max_width': "max_width",
+    'statevector(MB)': "statevector_mb",
+    'density_matrix(MB)': "density_matrix_mb"
+}
+RESOURCE_HEADERS = list(RESOURCE_KEYS)
+
 HEADER_DICT = {
-    "RQ1": ['n', '# test_cases', 'ave_time(entire)', 'ave_time(prepare)'],
-    "RQ2": ['test_suite', 'mixed_pre_mode', '# test_cases', 'ave_time'],
-    "RQ3": ['n','# test_cases', 'ave_fault'],
-    "RQ4": ['test_suite', 'angle_values', '# test_cases', 'ave_fault'],
-    "RQ5": ['shots', 'ave_time', 'ave_fault']
+    "RQ1": ['n', '# test_cases', 'ave_time(entire)', 'ave_time(prepare)'] + STAGE_HEADERS + RESOURCE_HEADERS,
+    "RQ2": ['test_suite', 'mixed_pre_mode', '# test_cases', 'ave_time'] + STAGE_HEADERS + RESOURCE_HEADERS,
+    "RQ3": ['n','# test_cases', 'ave_fault'] + RESOURCE_HEADERS,
+    "RQ4": ['test_suite', 'angle_values', '# test_cases', 'ave_fault'] + RESOURCE_HEADERS,
+    "RQ5": ['shots', 'ave_time'] + STAGE_HEADERS + ['ave_fault'] + RESOURCE_HEADERS
 }
 
 
 def required_data(rq_name, recorded_list: list[dict]) -> list[list]:
+    def stage_times(metadata_dict):
+        # Records journaled before the stages were timed (or the resources sampled) leave the cells empty
+        return [metadata_dict.get(f"ave_{stage}_time") for stage in TIMING_STAGES]
+
+    def resource_peaks(metadata_dict):
+        return [metadata_dict.get(key) for key in RESOURCE_KEYS.values()]
+
     def data_profile(rq_name, metadata_dict):
         if rq_name == "RQ1":
             return [
                 metadata_dict["num_qubits"],
                 metadata_dict["num_test_cases"],
                 metadata_dict["ave_exe_time"],
-                metadata_dict["ave_pre_time"]
+                metadata_dict["ave_pre_time"],
+                *stage_times(metadata_dict),
+                *resource_peaks(metadata_dict)
             ]
         elif rq_name == "RQ2":
             return [
                 metadata_dict["input_name"],
                 metadata_dict["controlling_unit"],
                 metadata_dict["num_test_cases"],
-                metadata_dict["ave_exe_time"]
+                metadata_dict["ave_exe_time"],
+                *stage_times(metadata_dict),
+                *resource_peaks(metadata_dict)
             ]
         elif rq_name == "RQ3":
             return [
                 metadata_dict["num_qubits"],
                 metadata_dict["num_test_cases"],
-                metadata_dict["ave_faults"]
+                metadata_dict["ave_faults"],
+                *resource_peaks(metadata_dict)
             ]
         elif rq_name == "RQ4":
             return [
                 metadata_dict["input_name"],
                 metadata_dict["angle_values"],
                 metadata_dict["num_test_cases"],
-                metadata_dict["ave_faults"]
+                metadata_dict["ave_faults"],
+                *resource_peaks(metadata_dict)
             ]
         elif rq_name == "RQ5":
             return [
                 metadata_dict["num_shots"],
                 metadata_dict["ave_exe_time"],
-                metadata_dict["ave_faults"]
+                *stage_times(metadata_dict),
+                metadata_dict["ave_faults"],
+                *resource_peaks(metadata_dict)
             ]
         else:
             raise ValueError(f"Unknown RQ name: {rq_name}")
@@ -58,11 +58,13 @@ def pure_state_distribution(qubit_num: int, mode: Literal["uniform"]) -> list[fl
 
 def control_qubit_numbers(
     target_num: int,
-    mode: Literal["equal"]
+    mode: Literal["equal", "recycled"]
 ) -> int:
     control_qubit_num_dict = {
         # Equal numbers of control and target qubits (i.e., $m = n$)
-        "equal": target_num
+        "equal": target_num,
+        # A single control qubit recycled via measure-and-reset cycles (i.e., $m = 1$)
+        "recycled": 1
     }
 
     return control_qubit_num_dict[mode]
\ No newline at end of file
@@ -0,0 +1,461 @@
+"""
+This module plans the experiments of a campaign without simulating them, i.e., a dry run.
+
+Each requested experiment is run within ``circuit_plan`` (see
+`mycode/utils/circuit_plan.py`), so that the testing processes build every circuit they
+would execute, while the circuits are only recorded by their widths, gate counts and
+shots. The plan reports the numbers of circuits and shots and the maximum statevector
+width, and estimates the wall time and the peak memory of the real run:
+
++ the wall time is the measured time of the dry run itself (i.e., the circuit
+  construction, the specifications and the oracles) plus the simulation time of each
+  circuit predicted by a cost model `a + b * gates + c * gates * 2^width + d * shots`;
++ the peak memory is the resident memory of the dry run plus the statevector of the
+  widest circuit, i.e., `16 * 2^width` bytes, times a calibrated factor.
+
+The coefficients of the cost model are fitted upon timed simulations of random circuits
+by `calibrate_cost_model` and stored in `mycode/config/cost_model.json`.
+
+The same estimates of the work items (see `mycode/utils/checkpoint_journal.py`) serve to
+select a stratified subset of them under a time budget, see `select_within_budget`.
+"""
+
+import contextlib
+import importlib
+import io
+import json
+import os
+import re
+import time
+from typing import Literal
+
+import numpy as np
+import psutil
+from qiskit import QuantumCircuit
+from scipy.optimize import nnls
+
+from .config import ABB2FULL_MAPPING
+from .campaign import experiment_options, sliced
+from .utils import RQ_saving_dir
+from .utils import circuit_execution
+from .utils import CircuitPlan, circuit_plan
+from .utils import to_json
+
+COST_MODEL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config", "cost_model.json")
+# Bytes per amplitude of a complex statevector
+_AMPLITUDE_BYTES = 16
+
+
+def load_cost_model(path: str = COST_MODEL_PATH) -> dict:
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _random_circuit(width: int, num_gates: int, rng: np.random.Generator) -> QuantumCircuit:
+    qc = QuantumCircuit(width, width)
+    for _ in range(num_gates):
+        if width > 1 and rng.random() < 0.5:
+            control, target = rng.choice(width, size=2, replace=False)
+            qc.cx(int(control), int(target))
+        else:
+            qc.ry(float(rng.uniform(0, np.pi)), int(rng.integers(width)))
+    qc.measure(qc.qubits, qc.clbits)
+    return qc
+
+
+def calibrate_cost_model(
+    widths: list[int] = list(range(2, 17, 2)),
+    gate_factors: list[int] = [1, 8, 64],
+    shots_list: list[int] = [1, 1024],
+    repeats: int = 3,
+    seed: int = 0
+) -> dict:
+    """
+    Fit the cost model upon timed simulations of random circuits.
+
+    For each width w, random circuits of w times each gate factor of CX and RY gates are
+    executed by ``circuit_execution`` with each number of shots, and the fastest of the
+    repeats is kept. The four coefficients of `a + b * gates + c * gates * 2^w + d * shots`,
+    i.e., `base_seconds`, `seconds_per_gate`, `seconds_per_gate_amplitude` and `seconds_per_shot`,
+    are fitted by non-negative least squares, where `b` mostly charges the transpilation. The
+    memory factor is the growth of the resident memory while simulating the widest circuit,
+    relative to the size of its statevector.
+
+    Args:
+        widths (list[int]): The widths of the calibration circuits.
+        gate_factors (list[int]): The numbers of gates per qubit.
+        shots_list (list[int]): The numbers of shots.
+        repeats (int): The number of timed executions per circuit.
+        seed (int): The seed of the random circuits.
+
+    Returns:
+        dict: The coefficients `base_seconds`, `seconds_per_gate`, `seconds_per_gate_amplitude`
+              and `seconds_per_shot`, and the `memory_factor`.
+    """
+    rng = np.random.default_rng(seed)
+    features, times = [], []
+    for width in widths:
+        for factor in gate_factors:
+            qc = _random_circuit(width, width * factor, rng)
+            num_gates = CircuitPlan()._count_gates(qc)
+            for shots in shots_list:
+                elapsed = []
+                for _ in range(repeats):
+                    start_time = time.perf_counter()
+                    circuit_execution(qc, shots)
+                    elapsed.append(time.perf_counter() - start_time)
+                features.append([1.0, num_gates, num_gates * 2.0 ** width, shots])
+                times.append(min(elapsed))
+    coefficients, _ = nnls(np.asarray(features), np.asarray(times))
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    circuit_execution(_random_circuit(max(widths), max(widths), rng), 1)
+    memory_factor = max(1.0, (process.memory_info().rss - rss_before) / (_AMPLITUDE_BYTES * 2 ** max(widths)))
+
+    return {
+        "base_seconds": float(coefficients[0]),
+        "seconds_per_gate": float(coefficients[1]),
+        "seconds_per_gate_amplitude": float(coefficients[2]),
+        "seconds_per_shot": float(coefficients[3]),
+        "memory_factor": float(memory_factor)
+    }
+
+
+def simulation_seconds(circuits: dict[tuple[int, int, int], int], cost_model: dict) -> float:
+    """
+    Estimate the simulation seconds of the circuits, counted by (width, number of gates, shots).
+    """
+    seconds = 0.0
+    for (width, num_gates, shots), count in circuits.items():
+        seconds += count * (
+            cost_model["base_seconds"]
+            + cost_model["seconds_per_gate"] * num_gates
+            + cost_model["seconds_per_gate_amplitude"] * num_gates * 2 ** width
+            + cost_model["seconds_per_shot"] * shots
+        )
+    return seconds
+
+
+def estimate_plan(plan: CircuitPlan, cost_model: dict) -> tuple[float, int]:
+    """
+    Estimate the simulation seconds of the recorded circuits and the statevector bytes of the widest one.
+    """
+    seconds = simulation_seconds(plan.circuits, cost_model)
+    statevector_bytes = int(cost_model["memory_factor"] * _AMPLITUDE_BYTES * 2 ** plan.max_width)
+    return seconds, statevector_bytes
+
+
+def plan_experiments(
+    experiments: list[tuple[str, str]],
+    rep_mode: Literal["toy", "all"] | None = None,
+    versions: list[str] | None = None,
+    workload: dict | None = None,
+    cost_model: dict | None = None,
+    items: list[dict] | None = None
+) -> list[dict]:
+    """
+    Dry-run the experiments and estimate their costs, see the module docstring.
+
+    Args:
+        experiments (list[tuple[str, str]]): The (program abbreviation, RQ index) pairs.
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        versions (list[str] | None): The program versions to run, all the configured ones by default.
+        workload (dict | None): The filters of the work items, see `mycode/utils/workload_slice.py`.
+        cost_model (dict | None): The cost model, loaded from `COST_MODEL_PATH` by default.
+        items (list[dict] | None): If given, the estimates of the work items are appended to it,
+                                   with the keys `program`, `rq`, `version`, `key`, `item`,
+                                   `max_width` and `seconds`.
+
+    Returns:
+        list[dict]: The plan of each experiment with the keys `experiment`, `circuits`,
+                    `shots`, `max_width`, `harness_seconds`, `simulation_seconds` and
+                    `peak_memory_bytes`.
+    """
+    cost_model = cost_model or load_cost_model()
+    process = psutil.Process()
+    rows = []
+    for abbreviation, rq_num in experiments:
+        options = experiment_options(abbreviation, rq_num, rep_mode, versions)
+        if options is None:
+            continue
+        module = importlib.import_module(
+            f"mycode.testing.{ABB2FULL_MAPPING[abbreviation]}.experiments.{abbreviation}_RQ{rq_num}"
+        )
+        start_time = time.perf_counter()
+        # The progress printed by the experiment is irrelevant to the plan
+        with circuit_plan() as plan, sliced(workload), contextlib.redirect_stdout(io.StringIO()):
+            module.run_experiment(rep_mode, False, **options)
+        harness_seconds = time.perf_counter() - start_time
+        estimated_seconds, statevector_bytes = estimate_plan(plan, cost_model)
+        if items is not None:
+            for key, item_plan in plan.items.items():
+                items.append({
+                    "program": abbreviation,
+                    "rq": rq_num,
+                    "version": item_plan["item"]["arguments"].get("program_version"),
+                    "key": key,
+                    "item": item_plan["item"],
+                    "max_width": max((width for width, _, _ in item_plan["circuits"]), default=0),
+                    "seconds": item_plan["seconds"] + simulation_seconds(item_plan["circuits"], cost_model)
+                })
+        rows.append({
+            "experiment": f"{ABB2FULL_MAPPING[abbreviation]}-RQ{rq_num}",
+            "circuits": plan.num_circuits,
+            "shots": plan.num_shots,
+            "max_width": plan.max_width,
+            "harness_seconds": harness_seconds,
+            "simulation_seconds": estimated_seconds,
+            "peak_memory_bytes": process.memory_info().rss + statevector_bytes
+        })
+    return rows
+
+
+def parse_duration(value: str) -> float:
+    """
+    Parse a duration such as `2h`, `90m`, `1h30m` or `45s` (or a number of seconds) into seconds.
+
+    Raises:
+        ValueError: If the duration is invalid or not positive.
+    """
+    value = value.strip().lower()
+    if re.fullmatch(r"\d+(\.\d+)?", value):
+        seconds = float(value)
+    elif re.fullmatch(r"(\d+(\.\d+)?[hms])+", value):
+        units = {"h": 3600, "m": 60, "s": 1}
+        seconds = sum(float(number) * units[unit] for number, unit in re.findall(r"(\d+(?:\.\d+)?)([hms])", value))
+    else:
+        raise ValueError(f"Invalid duration: {value!r}")
+    if seconds <= 0:
+        raise ValueError(f"The duration should be positive: {value!r}")
+    return seconds
+
+
+def select_within_budget(items: list[dict], budget_seconds: float, seed: int = 0) -> list[dict]:
+    """
+    Select a stratified subset of the work items whose estimated seconds fit the budget.
+
+    The items are stratified by (program, RQ, program version). To maximize the coverage
+    of the programs and versions, the cheapest item of every stratum is taken first, from
+    the cheapest stratum on. Then, the strata are visited in rounds, and each round takes
+    one more item drawn at random from each stratum, as long as it fits the remaining
+    budget. Hence, the selected items are a stratified random sample, and the fraction
+    of the items selected in each stratum is its sampling rate.
+
+    Args:
+        items (list[dict]): The estimates of the work items, see `plan_experiments`.
+        budget_seconds (float): The time budget.
+        seed (int): The seed of the random draws.
+
+    Returns:
+        list[dict]: The selected items in their original order.
+    """
+    rng = np.random.default_rng(seed)
+    strata = {}
+    for index, item in enumerate(items):
+        strata.setdefault((item["program"], item["rq"], item["version"]), []).append(index)
+
+    remaining = budget_seconds
+    selected = set()
+    # Cover each stratum by its cheapest item
+    cheapest = sorted((min(indices, key=lambda index: items[index]["seconds"]) for indices in strata.values()),
+                      key=lambda index: items[index]["seconds"])
+    for index in cheapest:
+        if items[index]["seconds"] <= remaining:
+            selected.add(index)
+            remaining -= items[index]["seconds"]
+
+    # Draw the other items at random in rounds over the strata
+    queues = [list(rng.permutation([index for index in indices if index not in selected])) for indices in strata.values()]
+    while any(queues):
+        for queue in queues:
+            while queue:
+                index = queue.pop()
+                if items[index]["seconds"] <= remaining:
+                    selected.add(index)
+                    remaining -= items[index]["seconds"]
+                    break
+    return [item for index, item in enumerate(items) if index in selected]
+
+
+def save_budget_selection(
+    items: list[dict],
+    selected: list[dict],
+    budget_seconds: float,
+    seed: int,
+    rep_mode: Literal["toy", "all"] | None = None
+) -> list[str]:
+    """
+    Record the sampled work items of each experiment next to its CSV files.
+
+    The file `RQ<k>_<Program>_budget.json` lists every work item of the experiment with its
+    estimated seconds and whether it was selected, together with the sampling rate of
+    each program version, so that the partial results remain interpretable.
+
+    Returns:
+        list[str]: The paths of the saved files.
+    """
+    selected_keys = {item["key"] for item in selected}
+    experiments = {}
+    for item in items:
+        experiments.setdefault((item["program"], item["rq"]), []).append(item)
+
+    paths = []
+    for (abbreviation, rq_num), experiment_items in experiments.items():
+        full_name = ABB2FULL_MAPPING[abbreviation]
+        strata = {}
+        for item in experiment_items:
+            stratum = strata.setdefault(str(item["version"]), {"selected": 0, "total": 0})
+            stratum["total"] += 1
+            stratum["selected"] += item["key"] in selected_keys
+        for stratum in strata.values():
+            stratum["sampling_rate"] = stratum["selected"] / stratum["total"]
+
+        save_dir = RQ_saving_dir(f"RQ{rq_num}", full_name, rep_mode)
+        os.makedirs(save_dir, exist_ok=True)
+        path = os.path.join(save_dir, f"RQ{rq_num}_{full_name}_budget.json")
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "budget_seconds": budget_seconds,
+                "seed": seed,
+                "strata": strata,
+                "items": [
+                    {
+                        "key": item["key"],
+                        "item": item["item"],
+                        "estimated_seconds": item["seconds"],
+                        "selected": item["key"] in selected_keys
+                    }
+                    for item in experiment_items
+                ]
+            }, file, indent=4, default=to_json)
+        paths.append(path)
+    return paths
+
+
+def _format_seconds(seconds: float) -> str:
+    hours, remainder = divmod(int(round(seconds)), 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s"
+
+
+def format_plan(rows: list[dict], jobs: int = 1) -> str:
+    """
+    Format the plans of the experiments as a table with a total row.
+
+    The total wall time is divided by the number of worker processes, which assumes that
+    the work units are balanced (see `mycode/campaign.py`).
+    """
+    header = f"{'Experiment':<32}{'Circuits':>12}{'Shots':>16}{'Width':>7}{'Wall time':>14}{'Peak memory':>14}"
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        lines.append(
+            f"{row['experiment']:<32}{row['circuits']:>12,}{row['shots']:>16,}{row['max_width']:>7}"
+            f"{_format_seconds(row['harness_seconds'] + row['simulation_seconds']):>14}"
+            f"{row['peak_memory_bytes'] / 2 ** 20:>11.0f} MB"
+        )
+    lines.append("-" * len(header))
+    total_seconds = sum(row["harness_seconds"] + row["simulation_seconds"] for row in rows) / jobs
+    lines.append(
+        f"{f'Total ({jobs} jobs)':<32}{sum(row['circuits'] for row in rows):>12,}"
+        f"{sum(row['shots'] for row in rows):>16,}{max((row['max_width'] for row in rows), default=0):>7}"
+        f"{_format_seconds(total_seconds):>14}"
+        f"{max((row['peak_memory_bytes'] for row in rows), default=0) / 2 ** 20:>11.0f} MB"
+    )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the planner, or calibration of the cost model.
+    Run:
+        python -m mycode.planner
+        python -m mycode.planner --calibrate
+    """
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Run the unit tests of the planner, or calibrate its cost model.")
+    parser.add_argument("--calibrate", action="store_true",
+                        help=f"Fit the cost model upon timed simulations and save it at `{COST_MODEL_PATH}`.")
+    args = parser.parse_args()
+
+    if args.calibrate:
+        cost_model = calibrate_cost_model()
+        with open(COST_MODEL_PATH, "w", encoding="utf-8") as file:
+            json.dump(cost_model, file, indent=4)
+            file.write("\n")
+        print(f"The cost model is saved at {COST_MODEL_PATH}")
+        sys.exit(0)
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_experiments():
+        return [("qft", "1"), ("comp", "2")]
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_estimate_plan(experiments):
+        cost_model = {"base_seconds": 1.0, "seconds_per_gate": 0.0, "seconds_per_gate_amplitude": 0.5,
+                      "seconds_per_shot": 0.25, "memory_factor": 2.0}
+        plan = CircuitPlan()
+        plan.circuits.update({(2, 3, 4): 2, (3, 1, 0): 1})
+        seconds, statevector_bytes = estimate_plan(plan, cost_model)
+        assert seconds == 2 * (1 + 0.5 * 3 * 4 + 0.25 * 4) + (1 + 0.5 * 8)
+        assert statevector_bytes == 2 * 16 * 8
+
+    def unit_test_plan_experiments(experiments):
+        rows = plan_experiments(experiments, "toy")
+        assert [row["experiment"] for row in rows] == ["QFT-RQ1", "IntegerComparator-RQ2"]
+        assert all(row["circuits"] > 0 and row["shots"] > 0 and row["max_width"] >= 2 for row in rows)
+        # The slices shrink the plan, and nothing is simulated or saved
+        items = []
+        sliced_rows = plan_experiments(experiments[1:], "toy", workload={"suites": ["T0"]}, items=items)
+        assert 0 < sliced_rows[0]["circuits"] < rows[1]["circuits"]
+        # The work items are estimated one by one
+        assert items and all(item["rq"] == "2" and item["seconds"] > 0 for item in items)
+        assert "Total (2 jobs)" in format_plan(rows, jobs=2)
+
+    def unit_test_budget(experiments):
+        assert parse_duration("2h") == 7200 and parse_duration("1h30m") == 5400 and parse_duration("45") == 45
+        for invalid in ["", "2d", "0s", "h"]:
+            try:
+                parse_duration(invalid)
+                assert False
+            except ValueError:
+                pass
+        items = [
+            {"program": program, "rq": "1", "version": version, "key": f"{program}{version}{index}", "seconds": seconds}
+            for program, version, seconds in [("qft", "v1", 1.0), ("qft", "v2", 5.0), ("comp", "v1", 2.0)]
+            for index in range(4)
+        ]
+        # Every stratum is covered before any stratum gets a second item
+        selected = select_within_budget(items, 8.0)
+        assert {(item["program"], item["version"]) for item in selected} == {("qft", "v1"), ("qft", "v2"), ("comp", "v1")}
+        assert sum(item["seconds"] for item in selected) <= 8.0
+        assert len(select_within_budget(items, 100.0)) == len(items)
+        assert select_within_budget(items, 0.5) == []
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_experiments, "function": unit_test_estimate_plan},
+        "1": {"input": test_input_experiments, "function": unit_test_plan_experiments},
+        "2": {"input": test_input_experiments, "function": unit_test_budget},
+    }
+
+    for id, execution_dict in executed_test.items():
+        print(f"test_id={id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
@@ -1,12 +1,135 @@
 import argparse
-import subprocess
+import importlib
 import os
 import sys
+from typing import Callable, Literal
 
 # Import ABB2FULL_MAPPING from config
 # This mapping translates program abbreviations (e.g., "id") 
 # into their corresponding full names (e.g., "Identity").
 from .config import ABB2FULL_MAPPING
+from .campaign import run_campaign, journal_path, reset_journals, merge_journals, experiment_options, cached, sliced, profiled
+from .work_queue import DEFAULT_QUEUE_PATH, submit_campaign, run_worker
+from .planner import plan_experiments, format_plan, parse_duration, select_within_budget, save_budget_selection
+from .utils import checkpoint_journal, parse_int_ranges, parse_shard, PROFILE_MODES
+from .utils.result_cache import DEFAULT_CACHE_DIR
+
+RQ_INDICES = ["1", "2", "3", "4", "5"]
+
+
+def experiment_module_name(abbreviation: str, rq_num: str) -> str:
+    """
+    Return the module of the experiment, e.g., `mycode.testing.Identity.experiments.id_RQ1`.
+    """
+    full_name = ABB2FULL_MAPPING[abbreviation]
+    return f"mycode.testing.{full_name}.experiments.{abbreviation}_RQ{rq_num}"
+
+
+def experiment_exists(abbreviation: str, rq_num: str) -> bool:
+    """
+    Check whether the experiment file of the program and the RQ exists.
+    """
+    script_path = os.path.join(
+        os.path.dirname(__file__),
+        "testing",
+        ABB2FULL_MAPPING[abbreviation],
+        "experiments",
+        f"{abbreviation}_RQ{rq_num}.py"
+    )
+    return os.path.isfile(script_path)
+
+
+def expand_experiments(programs: list[str], rq_nums: list[str], skip_missing: bool = False) -> list[tuple[str, str]]:
+    """
+    Expand the programs and RQs into the (program, RQ) pairs to run, program by program.
+
+    Args:
+        programs (list[str]): The abbreviations of the programs.
+        rq_nums (list[str]): The indices of the RQs.
+        skip_missing (bool): Whether to skip the pairs without an experiment file, 
+                             e.g., RQ3 of `id`, instead of raising an error.
+
+    Returns:
+        list[tuple[str, str]]: The (program abbreviation, RQ index) pairs.
+
+    Raises:
+        ValueError: If a pair has no experiment file and `skip_missing` is False.
+
+    Example:
+        >>> expand_experiments(["id", "comp"], ["2", "3"], skip_missing=True)
+        [('id', '2'), ('comp', '2'), ('comp', '3')]
+    """
+    experiments, missing = [], []
+    for abbreviation in programs:
+        for rq_num in rq_nums:
+            if experiment_exists(abbreviation, rq_num):
+                experiments.append((abbreviation, rq_num))
+            else:
+                missing.append(f"{abbreviation}_RQ{rq_num}")
+    if missing and not skip_missing:
+        raise ValueError(f"The experiments {', '.join(missing)} do not exist.")
+    return experiments
+
+
+def run_experiments(
+    experiments: list[tuple[str, str]],
+    rep_mode: Literal["toy", "all"] | None = None,
+    verbose: bool = False,
+    cache_dir: str | None = None,
+    seed: int | None = None,
+    versions: list[str] | None = None,
+    workload: dict | None = None,
+    profile: Literal["cpu", "mem"] | None = None
+) -> None:
+    """
+    Run the experiments one after another within the current process.
+
+    Each experiment module is imported once and its `run_experiment` is called, so 
+    that the imports of Qiskit and the program versions, the simulator backend and 
+    the caches (e.g., the prefix snapshots and the cached control-state preparations) 
+    are shared by all the experiments. The completed work items are recorded in the 
+    checkpoint journal of each experiment, see `mycode/utils/checkpoint_journal.py`.
+    Given a cache directory, the work items completed by any earlier run, RQ or
+    script with the same sources and parameters are reused, see `mycode/utils/result_cache.py`.
+
+    Args:
+        experiments (list[tuple[str, str]]): The (program abbreviation, RQ index) pairs.
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        verbose (bool): Whether to print detailed progress information.
+        cache_dir (str | None): The result cache directory, or None to disable the cache.
+        seed (int | None): The seed of the work items, or None to leave them unseeded.
+        versions (list[str] | None): The program versions to run, all the configured ones by default.
+        workload (dict | None): The filters of the work items, see `mycode/utils/workload_slice.py`.
+        profile (Literal["cpu", "mem"] | None): Profile each experiment by cProfile or tracemalloc,
+                                                see `mycode/utils/profiling.py`.
+    """
+    for abbreviation, rq_num in experiments:
+        options = experiment_options(abbreviation, rq_num, rep_mode, versions)
+        if options is None:
+            continue
+        print(f"===== {ABB2FULL_MAPPING[abbreviation]} RQ{rq_num} =====")
+        module = importlib.import_module(experiment_module_name(abbreviation, rq_num))
+        journal = journal_path(abbreviation, rq_num, rep_mode)
+        profile_context = profiled(abbreviation, rq_num, rep_mode, profile)
+        with cached(cache_dir, seed), sliced(workload), checkpoint_journal(journal), profile_context:
+            module.run_experiment(rep_mode, verbose, **options)
+
+
+def _comma_list(choices: list[str]) -> Callable[[str], list[str]]:
+    """
+    Build an argparse type that parses `all` or a comma-separated list of choices.
+    """
+    def parse(value: str) -> list[str]:
+        if value == "all":
+            return list(choices)
+        items = [item.strip() for item in value.split(",") if item.strip()]
+        invalid = [item for item in items if item not in choices]
+        if not items or invalid:
+            raise argparse.ArgumentTypeError(
+                f"invalid choice: {value!r} (choose `all` or a comma-separated list from {', '.join(choices)})"
+            )
+        return list(dict.fromkeys(items))
+    return parse
 
 
 def main():
@@ -21,7 +144,7 @@ def main():
     parser = argparse.ArgumentParser(
         description=(
             """
-            Run an experiment corresponding to a specific Research Question (RQ).
+            Run the experiments corresponding to specific Research Questions (RQs).
             Note that the program Identity (i.e., id) supports RQ1 and RQ2 only.
             """
         ),
@@ -29,34 +152,37 @@ def main():
         """
         Example usage: `python -m mycode.run --program comp --rq 2 --mode toy`, 
         which intends to run RQ2 of IntegerComparator upon the `toy` model.
+        Use `--program all --rq all` to run all the experiments in one process.
+        Use `--queue` to submit them into a shared store instead, and `--worker` to run them on each node.
         """
     )
 
     # Build help text showing all valid program abbreviations and their full names
     help_text = "\n".join([f"`{key}` corresponds to `{val}`, " for key, val in ABB2FULL_MAPPING.items()])
 
-    # Argument: program abbreviation (e.g., "id")
+    # Argument: program abbreviations (e.g., "id", "id,comp" or "all")
     parser.add_argument(
         '--program',
-        type=str,
-        required=True,
+        type=_comma_list(list(ABB2FULL_MAPPING.keys())),
+        default=None,
         help=f"""
-            The abbreviation of the target program, i.e.,
+            The abbreviation of the target program, a comma-separated list of them, 
+            or `all` for all the programs, i.e.,
             {help_text}
-        """,
-        choices=list(ABB2FULL_MAPPING.keys())
+        """
     )
 
-    # Argument: research question number
+    # Argument: research question numbers
     parser.add_argument(
         '--rq',
         help="""
-            The target research question from 1 to 5, e.g., use `--rq 3` for RQ3.
-            However, we should note that: for program `id`, only `--rq 1` and `--rq 2` are vaild.
+            The target research question from 1 to 5, e.g., use `--rq 3` for RQ3, 
+            a comma-separated list such as `--rq 1,2`, or `--rq all`.
+            However, we should note that: for program `id`, only `--rq 1` and `--rq 2` are vaild,
+            and the other RQs of `id` are skipped when several experiments are requested.
         """,
-        required=True,
-        choices=["1", "2", "3", "4", "5"],
-        type=str
+        default=None,
+        type=_comma_list(RQ_INDICES)
     )
 
     # Argument: replication mode (optional)
@@ -71,52 +197,220 @@ def main():
     # Argument: print the progress information
     parser.add_argument("--verbose", action="store_true",
                         help="Print detailed progress information.")
+
+    # Argument: number of worker processes (optional)
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        help="""
+            The number of worker processes. With more than one worker, the experiments are 
+            split into program versions and scheduled longest job first, see `mycode/campaign.py`.
+        """,
+        default=1
+    )
+
+    # Argument: resume the experiments from their checkpoint journals
+    parser.add_argument("--resume", action="store_true",
+                        help="Skip the work items completed by a previous run and rebuild the CSV files.")
+
+    # Argument: reuse the results across runs through a content-addressed cache (optional)
+    parser.add_argument(
+        '--cache',
+        type=str,
+        nargs='?',
+        const=DEFAULT_CACHE_DIR,
+        help=f"""
+            Reuse the work items completed by any earlier run with the same program sources, 
+            parameters and seed, stored in the given directory or `{os.path.basename(DEFAULT_CACHE_DIR)}/` by default.
+        """,
+        default=None
+    )
+
+    # Argument: seed of the random number generators (optional)
+    parser.add_argument(
+        '--seed',
+        type=int,
+        help="Seed each work item (i.e., NumPy and the simulator), so that its results are reproducible.",
+        default=None
+    )
     
+    # Argument: submit the experiments into a shared work queue (optional)
+    parser.add_argument(
+        '--queue',
+        type=str,
+        nargs='?',
+        const=DEFAULT_QUEUE_PATH,
+        help=f"""
+            The SQLite store of a distributed campaign, `{os.path.basename(DEFAULT_QUEUE_PATH)}` by default, 
+            placed on a filesystem shared by the nodes. With `--program` and `--rq`, the experiments are 
+            submitted as work units without running them, see `mycode/work_queue.py`. With `--budget`, 
+            each unit only runs its work items selected within the budget.
+        """,
+        default=None
+    )
+
+    # Argument: run as a worker of the work queue (optional)
+    parser.add_argument("--worker", action="store_true",
+                        help="Lease and run the work units of the queue until none is left.")
+
+    # Argument: lease timeout of the workers (optional)
+    parser.add_argument(
+        '--lease-timeout',
+        type=float,
+        help="The seconds after which the unit of an unresponsive worker is retried by another worker.",
+        default=600.0
+    )
+
+    # Arguments: slices of the workload (optional)
+    parser.add_argument(
+        '--versions',
+        type=lambda value: [item.strip() for item in value.split(",") if item.strip()],
+        help="The program versions to run, e.g., `v1,v3`. The programs without versions (i.e., `id`) are kept.",
+        default=None
+    )
+    parser.add_argument(
+        '--n',
+        type=parse_int_ranges,
+        help="The input sizes (i.e., numbers of target qubits) to run, e.g., `4-6` or `2,4`.",
+        default=None
+    )
+    parser.add_argument(
+        '--suites',
+        type=lambda value: [item.strip() for item in value.split(",") if item.strip()],
+        help="The mixed-state test suites to run by their saving names, e.g., `T1,T4`.",
+        default=None
+    )
+    parser.add_argument(
+        '--shots',
+        type=parse_int_ranges,
+        help="The numbers of shots to run, e.g., `8,1024`.",
+        default=None
+    )
+    parser.add_argument(
+        '--shard',
+        type=parse_shard,
+        help="""
+            Run the i-th of N disjoint shards of the work items, e.g., `0/4`, 
+            selected by a stable hash of each work item.
+        """,
+        default=None
+    )
+
+    # Argument: merge the journals of the slices or shards (optional)
+    parser.add_argument(
+        '--merge',
+        type=str,
+        nargs='+',
+        help="""
+            Merge the checkpoint journals found under the given directories (e.g., the `data` 
+            directories of several shards) and rebuild the CSV files of the experiments from them.
+        """,
+        default=None
+    )
+
+    # Argument: plan the experiments without running them (optional)
+    parser.add_argument("--dry-run", action="store_true",
+                        help="""
+                            Build every circuit of the experiments without simulating them, and report the 
+                            numbers of circuits and shots, the maximum width, and the estimated wall time and 
+                            peak memory, see `mycode/planner.py`.
+                        """)
+
+    # Argument: time budget of a representative subset (optional)
+    parser.add_argument(
+        '--budget',
+        type=parse_duration,
+        help="""
+            The time budget, e.g., `2h` or `1h30m`. The work items are estimated by a dry run, and a 
+            stratified subset covering the programs and versions within the budget is run. The sampled 
+            items are recorded in `RQ<RQ_IDX>_<PROG_FULL>_budget.json` next to the CSV files.
+        """,
+        default=None
+    )
+
+    # Argument: profile the experiments (optional)
+    parser.add_argument(
+        '--profile',
+        choices=PROFILE_MODES,
+        help="""
+            Profile each experiment (or each work unit with `--jobs` or `--worker`) by cProfile (`cpu`) 
+            or tracemalloc (`mem`), and save the profile and the top hotspots or allocation sites as 
+            `RQ<RQ_IDX>_<PROG_FULL>_<PROFILE>_profile.txt` next to the CSV files.
+        """,
+        default=None
+    )
+
     args = parser.parse_args()
-    abbreviation = args.program
-    rq_num = args.rq
-    full_name = ABB2FULL_MAPPING[abbreviation]
     rep_mode = args.mode
     verbose = args.verbose
 
-    # -------------------------------
-    # Step 2: Construct the module name for the experiment
-    # -------------------------------
-    # Instead of running a script file directly, we run the experiment as a Python module
-    # This ensures relative imports inside the experiment file work correctly.
-    module_name = f"mycode.testing.{full_name}.experiments.{abbreviation}_RQ{rq_num}"
+    # A worker takes its experiments from the queue rather than the arguments
+    if args.worker:
+        queue_path = args.queue or DEFAULT_QUEUE_PATH
+        completed = run_worker(queue_path, None, verbose, args.cache, args.lease_timeout, profile=args.profile)
+        print(f"Worker finished {completed} work units of {queue_path}.")
+        return
+    if args.program is None or args.rq is None:
+        parser.error("the arguments --program and --rq are required unless --worker is given")
 
     # -------------------------------
-    # Step 3: Verify that the experiment file exists
+    # Step 2: Expand and verify the experiments to run
     # -------------------------------
-    script_path = os.path.join(
-        os.path.dirname(__file__),
-        "testing",
-        full_name,
-        "experiments",
-        f"{abbreviation}_RQ{rq_num}.py"
-    )
-    if not os.path.isfile(script_path):
-        print(f"Error: Script {script_path} does not exist.", file=sys.stderr)
+    # Missing experiments (e.g., RQ3 of `id`) are errors only when a single one is requested
+    skip_missing = len(args.program) * len(args.rq) > 1
+    try:
+        experiments = expand_experiments(args.program, args.rq, skip_missing)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # -------------------------------
-    # Step 4: Build the execution command
-    # -------------------------------
-    cmd = [sys.executable, "-m", module_name]
-    if rep_mode is not None:
-        cmd.extend(["--mode", rep_mode])
-    if verbose:
-        cmd.append("--verbose")
+    workload = {
+        name: getattr(args, name) for name in ["n", "suites", "shots", "shard"]
+        if getattr(args, name) is not None
+    }
+    # The units of a distributed campaign run all their work items, or those selected for a budget
+    if args.queue is not None and workload:
+        parser.error("the arguments --n, --suites, --shots and --shard cannot be used with --queue")
+
+    # A dry run only reports the plan
+    if args.dry_run:
+        print(format_plan(plan_experiments(experiments, rep_mode, args.versions, workload), args.jobs))
+        return
+
+    # Only the stratified subset of the work items within the budget is run
+    selected = None
+    if args.budget is not None:
+        items = []
+        plan_experiments(experiments, rep_mode, args.versions, workload, items=items)
+        selected = select_within_budget(items, args.budget * args.jobs, args.seed or 0)
+        save_budget_selection(items, selected, args.budget, args.seed or 0, rep_mode)
+        print(f"Selected {len(selected)} of {len(items)} work items within the budget "
+              f"(estimated {sum(item['seconds'] for item in selected) / args.jobs:.0f} s).")
+        workload = dict(workload, items=[item["key"] for item in selected])
+
+    # The experiments of a distributed campaign are only submitted
+    if args.queue is not None:
+        submitted = submit_campaign(args.queue, experiments, rep_mode, args.seed, args.versions, selected)
+        print(f"Submitted {submitted} new work units into {args.queue}.")
+        return
+
+    # The merged journals are resumed, so that only the missing work items are executed
+    if args.merge is not None:
+        merged = merge_journals(experiments, args.merge, rep_mode)
+        print(f"Merged {merged} work items from {', '.join(args.merge)}.")
+
+    # Without resuming, the journals of previous runs are discarded
+    if not args.resume and args.merge is None:
+        reset_journals(experiments, rep_mode)
 
     # -------------------------------
-    # Step 5: Run the target experiment
+    # Step 3: Run the target experiments within this process or upon a worker pool
     # -------------------------------
-    try:
-        subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"Execution failed: {e}", file=sys.stderr)
-        sys.exit(e.returncode)
+    # The experiments are imported as modules, so that relative imports inside work correctly.
+    if args.jobs > 1:
+        run_campaign(experiments, rep_mode, verbose, args.jobs, args.cache, args.seed, args.versions, workload, args.profile)
+    else:
+        run_experiments(experiments, rep_mode, verbose, args.cache, args.seed, args.versions, workload, args.profile)
 
 
 if __name__ == '__main__':
@@ -43,29 +43,26 @@ def _RQ_running_MSTCs(
     return required_data(_RQ_NAME, recorded_list)
 
  
-if __name__ == '__main__':
-    import argparse
-    from ..config.RQ1_config import config_dict
+def run_experiment(rep_mode: Literal["toy", "all"] | None = None, verbose: bool = False) -> None:
+    """
+    Run the experiment over all the program versions and save the results.
 
-    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
-    parser.add_argument(
-        '--mode',
-        type=str,
-        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
-        choices=["toy", "all"],
-        default=None
-    )
-    parser.add_argument("--verbose", action="store_true",
-                        help="Print detailed progress information.")
-    args = parser.parse_args()
+    It is called by `python -m` upon this module and by `mycode.run`, so that several 
+    experiments can share one process.
+
+    Args:
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        verbose (bool): Whether to print detailed progress information.
+    """
+    from ..config.RQ1_config import config_dict
 
 
-    input_data = rep_mode_selection(config_dict, args.mode)
+    input_data = rep_mode_selection(config_dict, rep_mode)
     
-    save_dir = RQ_saving_dir(_RQ_NAME, program_name, args.mode)
+    save_dir = RQ_saving_dir(_RQ_NAME, program_name, rep_mode)
     
     # Execute the test processes
-    recorded_result = _RQ_running_PSTCs(input_data["qubit_list"], exe_repeats, verbose=args.verbose)
+    recorded_result = _RQ_running_PSTCs(input_data["qubit_list"], exe_repeats, verbose=verbose)
     csv_saving(
         _RQ_NAME, 
         program_name, 
@@ -81,7 +78,7 @@ if __name__ == '__main__':
             input_data["qubit_list"], 
             control_mode,  # type: ignore 
             exe_repeats,
-            verbose=args.verbose
+            verbose=verbose
         )
         csv_saving(
             _RQ_NAME, 
@@ -93,4 +90,22 @@ if __name__ == '__main__':
             recorded_result
         )
 
-    print(f"{program_name}-{_RQ_NAME} done!")
\ No newline at end of file
+    print(f"{program_name}-{_RQ_NAME} done!")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
+    parser.add_argument(
+        '--mode',
+        type=str,
+        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
+        choices=["toy", "all"],
+        default=None
+    )
+    parser.add_argument("--verbose", action="store_true",
+                        help="Print detailed progress information.")
+    args = parser.parse_args()
+
+    run_experiment(args.mode, args.verbose)
@@ -1,7 +1,11 @@
+from ....utils.stage_timing import timed_stage
+
+@timed_stage("specification")
 def PSTC_specification(n: int, number: int) -> list[int]:
     exp_probs = [0] * (2 ** n)
     exp_probs[number] = 1
     return exp_probs
 
+@timed_stage("specification")
 def MSTC_specification(input_probs: list[float]) -> list[float]:
     return input_probs
\ No newline at end of file
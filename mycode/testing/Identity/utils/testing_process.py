@@ -1,25 +1,41 @@
 import numpy as np
 import os
-import time
+import math, time
 from typing import Literal
 
 from qiskit import QuantumCircuit
 
 from ....utils import (
-    generate_numbers,
+    journaled,
+    stage_snapshot,
+    stage_averages,
+    resource_snapshot,
+    resource_usage,
+    iter_numbers,
     outputdict2samps, 
     circuit_execution, 
+    prefix_snapshot,
+    batch_circuit_execution,
     OPO_UTest,
+    expected_samples,
     repeat_until_success,
-    generate_invalid_numbers,
+    fused_repeat_until_success,
+    post_selected_sampling,
+    generate_invalid_masks,
     bit_controlled_preparation_1MS,
     qubit_controlled_preparation_1MS,
+    bit_recycled_preparation_1MS,
+    qubit_recycled_preparation_1MS,
     bit_controlled_preparation_2MS,
     qubit_controlled_preparation_2MS,
+    bit_controlled_preparation_kMS,
+    qubit_controlled_preparation_kMS,
     bit_controlled_preparation_MPS,
     qubit_controlled_preparation_MPS,
-    separable_control_state_preparation,
-    entangled_control_state_preparation,
+    fused_preparation_2MS,
+    fused_preparation_MPS,
+    cached_control_state_preparation,
+    control_state_probs,
 )
 
 from ....config import (
@@ -35,6 +51,7 @@ from ..config import candidate_initial_states
 current_dir = os.path.dirname(__file__)
 config_dir = os.path.join(os.path.dirname(current_dir), "config")
 
+@journaled
 def testing_process_PSTCs(
     n_list: list[int],
     shots: int,  
@@ -47,31 +64,27 @@ def testing_process_PSTCs(
         if verbose:
             print(f"Executing PSTCs. Test cases: n = {str(n)}.")  
 
-        # Generate all possible initial classical states for testing    
-        initial_states_list = generate_numbers(
-            n, 
-            len(candidate_initial_states)
-        )
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         
-        start_time = time.time()
         pre_time = 0                        # Record cumulative time spent on state preparation
         total_failures = 0                  # Count total number of failed tests
         for _ in range(repeats):
             test_cases = 0
-            for initial_states in initial_states_list:
+            # The binary digits of the i-th number stand for i itself
+            for number, initial_states in enumerate(iter_numbers(n, len(candidate_initial_states))):
                 test_cases += 1
-                # Convert list of binary digits to decimal number
-                number = int(''.join(map(str, initial_states)), 2)
                 # Reverse the bit order for Qiskit convention
                 initial_states = initial_states[::-1]
                 qc = QuantumCircuit(n, n)
 
                 # State preparation
-                pre_start_time = time.time()
+                pre_start_time = time.perf_counter()
                 for index, val in enumerate(initial_states):
                     if candidate_initial_states[val] == 1:
                         qc.x(index)      
-                pre_end_time = time.time()
+                pre_end_time = time.perf_counter()
                 pre_time += pre_end_time - pre_start_time
 
                 qc.measure(qc.qubits[:],qc.clbits[:])
@@ -84,7 +97,7 @@ def testing_process_PSTCs(
                 
                 # Generate the samples that follow the expected probability distribution
                 exp_probs = PSTC_specification(n, number)
-                exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                 # derive the test result by nonparametric hypothesis test
                 test_result = OPO_UTest(exp_samps, test_samps) 
@@ -92,18 +105,21 @@ def testing_process_PSTCs(
                 if test_result == 'fail':
                     total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({
             "num_qubits": n,
             "num_shots": shots,
             "num_test_cases": test_cases,
             "ave_faults": total_failures / test_cases / repeats,
             "ave_exe_time": dura_time / repeats, 
-            "ave_pre_time": pre_time / repeats
+            "ave_pre_time": pre_time / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
         })
     
     return recorded_result
 
+@journaled
 def testing_process_MSTCs(
     n_list: list[int], 
     pre_mode: Literal["bits", "qubits"],
@@ -111,7 +127,7 @@ def testing_process_MSTCs(
     repeats: int,
     verbose: bool,
     pure_state_dist: Literal["uniform"] = "uniform",
-    num_controls: Literal["equal"] = "equal"
+    num_controls: Literal["equal", "recycled"] = "equal"
 ) -> list[dict]:
 
     recorded_result = [] 
@@ -121,7 +137,9 @@ def testing_process_MSTCs(
         # Define the uniform distribution for the ensemble
         pure_states_distribution = pure_state_distribution(n, pure_state_dist)
 
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         pre_time = 0                                  # Record time for state preparation
         total_failures = 0
 
@@ -130,15 +148,22 @@ def testing_process_MSTCs(
             qc = QuantumCircuit(n + m, n)
             
             # Prepare the control state
-            pre_start_time = time.time() 
-            qc.h(qc.qubits[:m])
-            
-            # Mixed state preparation
-            if pre_mode == 'bits':
-                qc = bit_controlled_preparation_1MS(n, m, qc)
-            elif pre_mode == 'qubits':
-                qc = qubit_controlled_preparation_1MS(n, m, qc)
-            pre_end_time = time.time()
+            pre_start_time = time.perf_counter() 
+            if m < n:
+                # Recycle the control qubits via measure-and-reset cycles
+                if pre_mode == 'bits':
+                    qc = bit_recycled_preparation_1MS(n, m, qc)
+                elif pre_mode == 'qubits':
+                    qc = qubit_recycled_preparation_1MS(n, m, qc)
+            else:
+                qc.h(qc.qubits[:m])
+
+                # Mixed state preparation
+                if pre_mode == 'bits':
+                    qc = bit_controlled_preparation_1MS(n, m, qc)
+                elif pre_mode == 'qubits':
+                    qc = qubit_controlled_preparation_1MS(n, m, qc)
+            pre_end_time = time.perf_counter()
             pre_time += pre_end_time - pre_start_time                              
             qc.measure(qc.qubits[m:],qc.clbits[:])
 
@@ -150,7 +175,7 @@ def testing_process_MSTCs(
             
             # Generate the samples that follow the expected probability distribution
             exp_probs = MSTC_specification(pure_states_distribution)
-            exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+            exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
             # Derive the test result by nonparametric hypothesis test
             test_result = OPO_UTest(exp_samps, test_samps)
@@ -158,18 +183,21 @@ def testing_process_MSTCs(
             if test_result == 'fail':
                 total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({
             "num_qubits": n,
             "num_shots": shots,
             "num_test_cases": 1,
             "ave_faults": total_failures / repeats,
             "ave_exe_time": dura_time / repeats, 
-            "ave_pre_time": pre_time / repeats
+            "ave_pre_time": pre_time / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
         })
 
     return recorded_result
 
+@journaled
 def testing_process_MSTCs_1MS(
     inputs_list: list, 
     mixed_pre_mode: Literal["bits", "qubits"],
@@ -192,18 +220,20 @@ def testing_process_MSTCs_1MS(
         angle_list = list(inputs["angles"].values())[0]
         pure_states_distribution = list(inputs["probs"].values())[0]
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
  
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 1
             qc = QuantumCircuit(n + m, n)
 
             con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
-            if con_pre_mode == 'sep':
-                qc_con = separable_control_state_preparation(angle_list)
-            elif con_pre_mode == 'ent':
-                qc_con = entangled_control_state_preparation(angle_list)
+            qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
             
             qc.append(qc_con, qc.qubits[:m]) # type: ignore
 
@@ -212,27 +242,29 @@ def testing_process_MSTCs_1MS(
             elif mixed_pre_mode == 'qubits':
                 qc = qubit_controlled_preparation_1MS(n, m, qc) 
                 
+            # Start from the saved state of the prepared prefix
+            if use_prefix_snapshot:
+                qc = prefix_snapshot(qc)
+
             # Append the tested quantum subroutine (quantum program) 
             qc.measure(qc.qubits[m:], qc.clbits[:])
             
             # Execute the program and derive the outputs
-            dict_counts = circuit_execution(qc, shots)
+            dict_counts = circuit_execution(qc, shots, defer_measurement)
 
             # Obtain the samples (measurement results) of the tested program
-            test_samps = []
-            for (key, value) in dict_counts.items():
-                test_samps += [key] * value
+            test_samps = outputdict2samps(dict_counts)
             
             # Generate the samples that follow the expected probability distribution
             exp_probs = MSTC_specification(pure_states_distribution)
-            exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+            exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
             # Derive the test result by nonparametric hypothesis test
             test_result = OPO_UTest(exp_samps, test_samps)
             if test_result == 'fail':
                 total_failures += 1
                             
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({            
             "input_name": input_name,
             "angle_values": str(angle_list),
@@ -240,10 +272,13 @@ def testing_process_MSTCs_1MS(
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
 
+@journaled
 def testing_process_MSTCs_2MS(    
     inputs_list: list, 
     mixed_pre_mode: Literal["bits", "qubits"], 
@@ -266,11 +301,18 @@ def testing_process_MSTCs_2MS(
         angle_lists = list(inputs["angles"].values())
         pure_states_distributions = list(inputs["probs"].values())
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+        # Fusing the two halves requires the same control state for both of them
+        use_fused = inputs.get("fused", False) and all(angles == angle_lists[0] for angles in angle_lists)
     
         # Return the indices from zero to num_test_cases - 1
         MSB_val_list = list(range(len(angle_lists)))
 
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
@@ -286,10 +328,7 @@ def testing_process_MSTCs_2MS(
                     qc.x(m + n - 1)
 
                 con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
-                if con_pre_mode == 'sep':
-                    qc_con = separable_control_state_preparation(angle_list)
-                elif con_pre_mode == 'ent':
-                    qc_con = entangled_control_state_preparation(angle_list)
+                qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
                 
                 qc.append(qc_con, qc.qubits[:m]) # type: ignore
 
@@ -298,20 +337,29 @@ def testing_process_MSTCs_2MS(
                 elif mixed_pre_mode == 'qubits':
                     qc = qubit_controlled_preparation_2MS(n, m, qc) 
                     
+                # Start from the saved state of the prepared prefix
+                if use_prefix_snapshot:
+                    qc = prefix_snapshot(qc)
+
                 # Append the tested quantum subroutine (quantum program) 
                 qc.measure(qc.qubits[m:],qc.clbits[:])
                 
                 # Execute the program and derive the outputs
-                dict_counts = circuit_execution(qc, shots)
+                if not use_fused:
+                    dict_counts = circuit_execution(qc, shots, defer_measurement)
+                elif MSB_val == 0:
+                    # Execute both halves at once, selecting the most significant qubit by a qubit in |+⟩
+                    fused_counts = fused_repeat_until_success(fused_preparation_2MS(n, m, qc), shots, [], defer_measurement)
+                    dict_counts = fused_counts[0]
+                else:
+                    dict_counts = fused_counts[1]
 
                 # Obtain the samples (measurement results) of the tested program
-                test_samps = []
-                for (key, value) in dict_counts.items():
-                    test_samps += [key] * value
+                test_samps = outputdict2samps(dict_counts)
                 
                 # Generate the samples that follow the expected probability distribution
                 exp_probs = MSTC_specification(pure_states_distribution)
-                exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                 # Derive the test result by nonparametric hypothesis test
                 test_result = OPO_UTest(exp_samps, test_samps)
@@ -319,7 +367,7 @@ def testing_process_MSTCs_2MS(
                 if test_result == 'fail':
                     total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({
             "input_name": input_name,
             "angle_values": str(angle_lists[0]),
@@ -327,10 +375,109 @@ def testing_process_MSTCs_2MS(
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
 
+@journaled
+def testing_process_MSTCs_kMS(    
+    inputs_list: list, 
+    mixed_pre_mode: Literal["bits", "qubits"], 
+    shots: int,
+    repeats: int,
+    verbose: bool
+) -> list[dict]:
+
+    recorded_result = []      
+    for verbose_idx, inputs in enumerate(inputs_list):
+        if verbose:
+            print(
+                f"Executing MSTCs with the k mixed state mode." 
+                f"Test inputs {verbose_idx + 1} / {len(inputs_list)},"
+                f"Control mode: {mixed_pre_mode}."
+            )
+
+        # Assign values to variables
+        n, m = inputs["num_target"], inputs["num_control"]
+        angle_lists = list(inputs["angles"].values())
+        pure_states_distributions = list(inputs["probs"].values())
+        input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+    
+        # Split the input domain on the top k qubits into 2^k mixed states
+        k = int(math.log2(len(angle_lists)))
+        top_val_list = list(range(len(angle_lists)))
+
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
+        total_failures = 0
+        for _ in range(repeats):
+            test_cases = 0
+            qc_list, exp_probs_list = [], []
+            for top_val in top_val_list:
+                test_cases += 1
+                angle_list = angle_lists[top_val]
+                pure_states_distribution = pure_states_distributions[top_val]
+
+                qc = QuantumCircuit(n + m, n)
+                
+                con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
+                qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
+                
+                qc.append(qc_con, qc.qubits[:m]) # type: ignore
+
+                if mixed_pre_mode == 'bits':
+                    qc = bit_controlled_preparation_kMS(n, m, k, top_val, qc)
+                elif mixed_pre_mode == 'qubits':
+                    qc = qubit_controlled_preparation_kMS(n, m, k, top_val, qc) 
+                    
+                # Start from the saved state of the prepared prefix
+                if use_prefix_snapshot:
+                    qc = prefix_snapshot(qc)
+
+                # Append the tested quantum subroutine (quantum program) 
+                qc.measure(qc.qubits[m:],qc.clbits[:])
+                
+                # Derive the expected probability distribution
+                exp_probs = MSTC_specification(pure_states_distribution)
+                qc_list.append(qc)
+                exp_probs_list.append(exp_probs)
+
+            # Execute all the 2^k circuits in one batch and derive the outputs
+            dict_counts_list = batch_circuit_execution(qc_list, shots, defer_measurement)
+            for qc, dict_counts, exp_probs in zip(qc_list, dict_counts_list, exp_probs_list):
+                # Obtain the samples (measurement results) of the tested program
+                test_samps = outputdict2samps(dict_counts)
+                
+                # Generate the samples that follow the expected probability distribution
+                exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
+
+                # Derive the test result by nonparametric hypothesis test
+                test_result = OPO_UTest(exp_samps, test_samps)
+                    
+                if test_result == 'fail':
+                    total_failures += 1
+
+        dura_time = time.perf_counter() - start_time
+        recorded_result.append({
+            "input_name": input_name,
+            "angle_values": str(angle_lists[0]),
+            "num_shots": shots, 
+            "controlling_unit": mixed_pre_mode,
+            "num_test_cases": test_cases, 
+            "ave_exe_time": dura_time / repeats,
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
+        })
+    return recorded_result
+
+@journaled
 def testing_process_MSTCs_MPS(
     inputs_list: list, 
     mixed_pre_mode: Literal["bits", "qubits"],
@@ -358,9 +505,16 @@ def testing_process_MSTCs_MPS(
         angle_list = list(inputs["angles"].values())[0]
         pure_states_distribution = list(inputs["probs"].values())[0]
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+        use_fused = inputs.get("fused", False)
+        exact_post_selection = inputs.get("exact_post_selection", False)
 
         # Cover all the classical states            
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
@@ -371,10 +525,7 @@ def testing_process_MSTCs_MPS(
                     
                     # Prepare the control state
                     con_pre_mode = 'sep' if n == len(angle_list) else 'ent'
-                    if con_pre_mode == 'sep':
-                        qc_con = separable_control_state_preparation(angle_list)
-                    elif con_pre_mode == 'ent':
-                        qc_con = entangled_control_state_preparation(angle_list)
+                    qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
                     
                     qc.append(qc_con, qc.qubits[:m]) # type: ignore
                     
@@ -390,43 +541,53 @@ def testing_process_MSTCs_MPS(
 
                 # Execute the program and derive the outputs
                 if temp_state == 'mixed':
+                    # Start from the saved state of the prepared prefix
+                    if use_prefix_snapshot:
+                        qc = prefix_snapshot(qc)
                     qc.measure(qc.qubits[m:], qc.clbits[-n:])
                     # Remove the unexpected value until the valid values meets
                     # the required number of samples  
                     invalid_con_list = [int('1' * m, 2)]
-                    invalid_num_list = generate_invalid_numbers(qc.num_qubits, m, invalid_con_list)
-                    dict_counts = repeat_until_success(qc, shots, invalid_num_list)
+                    invalid_mask_list = generate_invalid_masks(m, invalid_con_list)
+                    # The control state |1...1⟩ is rejected, whose probability follows from the angles
+                    acceptance_prob = 1 - control_state_probs(angle_list, con_pre_mode)[0, -1]
+                    if use_fused:
+                        # Execute the pure state at once, selected by a qubit in |+⟩
+                        dict_counts, fused_pure_counts = fused_repeat_until_success(
+                            fused_preparation_MPS(n, m, qc), shots, invalid_mask_list, defer_measurement, acceptance_prob
+                        )
+                    elif exact_post_selection:
+                        # Sample from the exact output distribution conditioned on the valid control values
+                        dict_counts = post_selected_sampling(qc, shots, invalid_mask_list)
+                    else:
+                        dict_counts = repeat_until_success(qc, shots, invalid_mask_list, defer_measurement, acceptance_prob)
                 elif temp_state == 'pure':
                     qc.measure(qc.qubits[:], qc.clbits[:])
-                    dict_counts = circuit_execution(qc, shots)
+                    if use_fused:
+                        # Remove the output of control qubits (low m bits) of the fused execution
+                        dict_counts = fused_pure_counts >> m
+                    else:
+                        dict_counts = circuit_execution(qc, shots, defer_measurement)
 
                 # Obtain the samples (measurement results) of the tested program
-                test_samps = []
-                for (key, value) in dict_counts.items():
-                    if temp_state == 'mixed':   # remove the output of control qubits (low m bits)
-                        test_samps += [key >> m] * value
-                    else:
-                        test_samps += [key] * value
+                # Remove the output of control qubits (low m bits) of the mixed state
+                test_samps = outputdict2samps(dict_counts >> m if temp_state == 'mixed' else dict_counts)
                 
                 # Generate the samples that follow the expected probability distribution
                 if temp_state == "mixed":
                     exp_probs = MSTC_specification(pure_states_distribution)
                     # Discard the results from the control qubits
-                    exp_samps = list(
-                        np.random.choice(
-                            range(2 ** (qc.num_clbits - m)), 
-                            size=shots, 
-                            p=exp_probs
-                        )
+                    exp_samps = expected_samples(
+                        range(2 ** (qc.num_clbits - m)), 
+                        size=shots, 
+                        p=exp_probs
                     )
                 elif temp_state == "pure":
                     exp_probs = PSTC_specification(n, 2 ** n - 1)
-                    exp_samps = list(
-                        np.random.choice(
-                            range(2 ** (qc.num_clbits)), 
-                            size=shots, 
-                            p=exp_probs
-                        )
+                    exp_samps = expected_samples(
+                        range(2 ** (qc.num_clbits)), 
+                        size=shots, 
+                        p=exp_probs
                     )               
                                     
                 # Derive the test result by nonparametric hypothesis test
@@ -435,13 +596,15 @@ def testing_process_MSTCs_MPS(
                 if test_result == 'fail':
                     total_failures += 1
                             
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({            
             "input_name": input_name,
             "num_shots": shots, 
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
\ No newline at end of file
@@ -90,26 +90,25 @@ def _RQ_running_MSTC_core(
 _RQ_running_MSTCs_1MS = partial(_RQ_running_MSTC_core, process_func=testing_process_MSTCs_1MS)
 _RQ_running_MSTCs_2MS = partial(_RQ_running_MSTC_core, process_func=testing_process_MSTCs_2MS)
 
-if __name__ == '__main__':
-    import argparse
-    from ..config.RQ5_config import config_dict
+def run_experiment(
+    rep_mode: Literal["toy", "all"] | None = None,
+    verbose: bool = False,
+    versions: list[str] | None = None
+) -> None:
+    """
+    Run the experiment over the program versions and save the results.
 
-    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
-    parser.add_argument(
-        '--mode',
-        type=str,
-        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
-        choices=["toy", "all"],
-        default=None
-    )
-    parser.add_argument(
-        "--verbose", 
-        action="store_true",
-        help="Print detailed progress information."
-    )
-    args = parser.parse_args()
+    It is called by `python -m` upon this module and by `mycode.run`, so that several 
+    experiments can share one process.
 
-    input_data = rep_mode_selection(config_dict, args.mode)
+    Args:
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        verbose (bool): Whether to print detailed progress information.
+        versions (list[str] | None): The program versions to run, all the configured ones by default.
+    """
+    from ..config.RQ5_config import config_dict
+
+    input_data = rep_mode_selection(config_dict, rep_mode)
 
     exe_dict = {
         "PSTC": {"function": _RQ_running_PSTCs}, 
@@ -123,9 +122,10 @@ if __name__ == '__main__':
         }           
     }
 
-    save_dir = RQ_saving_dir(_RQ_NAME, program_name, args.mode)
+    save_dir = RQ_saving_dir(_RQ_NAME, program_name, rep_mode)
     # Execute the test processes
-    for program_version in input_data["versions"]:
+    program_versions = input_data["versions"] if versions is None else versions
+    for program_version in program_versions:
         print(f"Buggy mutant: {program_version}")
         for task_name, current_exe in exe_dict.items():
             n_list = input_data["qubit_list"]
@@ -141,7 +141,7 @@ if __name__ == '__main__':
                     sign_list,
                     shot_list,
                     exe_repeats,
-                    verbose=args.verbose
+                    verbose=verbose
                 )
             else:
                 input_states = current_exe["mixed_states"]
@@ -153,10 +153,31 @@ if __name__ == '__main__':
                     "qubits",
                     shot_list,
                     exe_repeats,
-                    verbose=args.verbose
+                    verbose=verbose
                 )
 
             # Save the data
             csv_saving(_RQ_NAME, program_name, program_version, save_dir, header, task_name, recorded_data)
 
-    print(f"{program_name}-{_RQ_NAME} done!")
\ No newline at end of file
+    print(f"{program_name}-{_RQ_NAME} done!")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
+    parser.add_argument(
+        '--mode',
+        type=str,
+        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
+        choices=["toy", "all"],
+        default=None
+    )
+    parser.add_argument(
+        "--verbose", 
+        action="store_true",
+        help="Print detailed progress information."
+    )
+    args = parser.parse_args()
+
+    run_experiment(args.mode, args.verbose)
@@ -5,6 +5,8 @@ the number of qubits (# Qubits), the number of basic gates (# Gates), and
 the circuit depth (Depths) shown in Table 3 of our TOSEM paper.
 
 The results will be directly printed in the terminal.
+Besides, `version_complexity` counts the qubits and gates of a single
+configuration, which serve the cost estimates of `mycode/campaign.py`.
 """
 
 import os
@@ -59,6 +61,19 @@ def _circuit_complexity_info(program_version: str, n_list: list[int], classical_
     }.items():
         print(f"#{name} : [{min(values)}, {max(values)}]")
     
+def version_complexity(program_version: str, n: int, input_data: dict) -> tuple[int, int]:
+    """
+    Return the numbers of qubits and gates of a program version upon n input qubits,
+    built with the first classical inputs of an experiment configuration.
+    """
+    qc = QuantumCircuit(2 * n, n)
+    func = get_target_version(version_dict, program_version)
+    qc.append(func(n, input_data["L_list"][0], geq=input_data["sign_list"][0]), qc.qubits)
+
+    # Obtain the circuit being fully decomposed
+    dec_qc = full_circuit_decomposition(qc)
+    return qubit_count(dec_qc), gate_count(dec_qc)
+
 if __name__ == '__main__':
     qubit_nums = set()
     classical_inputs = set()
@@ -9,7 +9,10 @@ vectors and density operators. The implementation is straightforward,
 making it useful for verifying the functionality of quantum programs.
 """
 
+from ....utils.stage_timing import timed_stage
 
+
+@timed_stage("specification")
 def PSTC_specification(n: int, number: int, L: int, sign: bool) -> list[float]:
     exp_probs = [0] * (2 ** n)
     if sign == True:
@@ -18,6 +21,7 @@ def PSTC_specification(n: int, number: int, L: int, sign: bool) -> list[float]:
         exp_probs[int(number < L)] = 1
     return exp_probs
 
+@timed_stage("specification")
 def MSTC_specification(numbers: list[int], probs: list[float], L: int, sign: bool) -> list[float]:
     exp_probs = [0.0] * (len(numbers))    # [p(0), p(1)]
     for number in numbers:
@@ -7,22 +7,39 @@ from itertools import product
 from qiskit import QuantumCircuit
 
 from ....utils import (
-    generate_numbers,
+    journaled,
+    timed_stage,
+    stage_snapshot,
+    stage_averages,
+    resource_snapshot,
+    resource_usage,
+    iter_numbers,
     outputdict2samps, 
     import_versions,
     get_target_version, 
     circuit_execution, 
+    prefix_snapshot,
+    batch_circuit_execution,
     OPO_UTest,
+    expected_samples,
     repeat_until_success,
-    generate_invalid_numbers,
+    fused_repeat_until_success,
+    post_selected_sampling,
+    generate_invalid_masks,
     bit_controlled_preparation_1MS,
     qubit_controlled_preparation_1MS,
+    bit_recycled_preparation_1MS,
+    qubit_recycled_preparation_1MS,
     bit_controlled_preparation_2MS,
     qubit_controlled_preparation_2MS,
+    bit_controlled_preparation_kMS,
+    qubit_controlled_preparation_kMS,
     bit_controlled_preparation_MPS,
     qubit_controlled_preparation_MPS,
-    separable_control_state_preparation,
-    entangled_control_state_preparation,
+    fused_preparation_2MS,
+    fused_preparation_MPS,
+    cached_control_state_preparation,
+    control_state_probs,
 )
 
 from ....config import pure_state_distribution, control_qubit_numbers
@@ -40,6 +57,7 @@ config_dir = os.path.join(os.path.dirname(current_dir), "config")
 # Import the program versions under the same directory
 version_dict = import_versions(program_name, version_dir)
 
+@journaled
 def testing_process_PSTCs(
     program_version: str, 
     n_list: list[int], 
@@ -53,30 +71,32 @@ def testing_process_PSTCs(
     for n in n_list:
         if verbose:
             print(f"Executing PSTCs. Test cases: n = {str(n)}.")             
-        initial_states_list = generate_numbers(n, len(candidate_initial_states))
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         num_classical_inputs = len(L_list) * len(sign_list)
-        start_time = time.time()
         pre_time = 0                        # Record time for state preparation
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
             for L, sign in product(L_list, sign_list):
-                for initial_states in initial_states_list:
+                # The binary digits of the i-th number stand for i itself
+                for number, initial_states in enumerate(iter_numbers(n, len(candidate_initial_states))):
                     test_cases += 1
-                    number = int(''.join(map(str, initial_states)), 2)
                     qc = QuantumCircuit(2 * n, n)
 
-                    pre_start_time = time.time()
+                    pre_start_time = time.perf_counter()
                     initial_states = initial_states[::-1]
                     for index, val in enumerate(initial_states):
                         if candidate_initial_states[val] == 1:
                             qc.x(index)
-                    pre_end_time = time.time()
+                    pre_end_time = time.perf_counter()
                     pre_time += pre_end_time - pre_start_time
 
                     # Append the tested quantum subroutine (quantum program) 
                     func = get_target_version(version_dict, program_version)
-                    qc_test = func(n, L, geq=sign)
+                    with timed_stage("build"):
+                        qc_test = func(n, L, geq=sign)
 
                     qc.append(qc_test, qc.qubits)
                     qc.measure(qc.qubits[n:],qc.clbits[:])
@@ -89,7 +109,7 @@ def testing_process_PSTCs(
                     
                     # Generate the samples that follow the expected probability distribution
                     exp_probs = PSTC_specification(n, number, L, sign)
-                    exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                    exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                     # Derive the test result by nonparametric hypothesis test
                     test_result = OPO_UTest(exp_samps, test_samps)
@@ -97,18 +117,21 @@ def testing_process_PSTCs(
                     if test_result == 'fail':
                         total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({
             "num_qubits": n,
             "num_shots": shots,
             "num_test_cases": test_cases,
             "ave_faults": total_failures / test_cases / repeats,
             "ave_exe_time": dura_time / num_classical_inputs / repeats, 
-            "ave_pre_time": pre_time / num_classical_inputs / repeats
+            "ave_pre_time": pre_time / num_classical_inputs / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
         })
   
     return recorded_result
 
+@journaled
 def testing_process_MSTCs(
     program_version: str, 
     n_list: list[int], 
@@ -119,7 +142,7 @@ def testing_process_MSTCs(
     repeats: int,
     verbose: bool,
     pure_state_dist: Literal["uniform"] = "uniform",
-    num_controls: Literal["equal"] = "equal"
+    num_controls: Literal["equal", "recycled"] = "equal"
 ) -> list[dict]:
     
     recorded_result = []      
@@ -133,7 +156,9 @@ def testing_process_MSTCs(
         scope_of_numbers = list(range(2 ** n))
         
         num_classical_inputs = len(L_list) * len(sign_list)
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         pre_time = 0                                 # Record time for state preparation
         m = control_qubit_numbers(n, num_controls)   # Determine the number of the control qubits.
@@ -143,22 +168,30 @@ def testing_process_MSTCs(
                 test_cases += 1
                 qc = QuantumCircuit(2 * n + m, n)
 
-                pre_start_time = time.time()
+                pre_start_time = time.perf_counter()
 
                 # Prepare the control state
-                qc.h(qc.qubits[:m])
-                
-                # Mixed state preparation
-                if pre_mode == 'bits':
-                    qc = bit_controlled_preparation_1MS(n, m, qc)
-                elif pre_mode == 'qubits':
-                    qc = qubit_controlled_preparation_1MS(n, m, qc)
-                pre_end_time = time.time()
+                if m < n:
+                    # Recycle the control qubits via measure-and-reset cycles
+                    if pre_mode == 'bits':
+                        qc = bit_recycled_preparation_1MS(n, m, qc)
+                    elif pre_mode == 'qubits':
+                        qc = qubit_recycled_preparation_1MS(n, m, qc)
+                else:
+                    qc.h(qc.qubits[:m])
+
+                    # Mixed state preparation
+                    if pre_mode == 'bits':
+                        qc = bit_controlled_preparation_1MS(n, m, qc)
+                    elif pre_mode == 'qubits':
+                        qc = qubit_controlled_preparation_1MS(n, m, qc)
+                pre_end_time = time.perf_counter()
                 pre_time += pre_end_time - pre_start_time                    
 
                 # Append the tested quantum subroutine (quantum program) 
                 func = get_target_version(version_dict, program_version)
-                qc_test = func(n, L, geq=sign)
+                with timed_stage("build"):
+                    qc_test = func(n, L, geq=sign)
 
                 qc.append(qc_test, qc.qubits[m:])
                 qc.measure(qc.qubits[n + m:],qc.clbits[:])
@@ -171,7 +204,7 @@ def testing_process_MSTCs(
                 
                 # Generate the samples that follow the expected probability distribution
                 exp_probs = MSTC_specification(scope_of_numbers, pure_states_distribution, L, sign)
-                exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                 # Derive the test result by nonparametric hypothesis test
                 test_result = OPO_UTest(exp_samps, test_samps)
@@ -179,18 +212,21 @@ def testing_process_MSTCs(
                 if test_result == 'fail':
                     total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({
             "num_qubits": n,
             "num_shots": shots,
             "num_test_cases": test_cases,
             "ave_faults": total_failures / test_cases / repeats,
             "ave_exe_time": dura_time / num_classical_inputs / repeats, 
-            "ave_pre_time": pre_time / num_classical_inputs / repeats
+            "ave_pre_time": pre_time / num_classical_inputs / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
         })
  
     return recorded_result
 
+@journaled
 def testing_process_MSTCs_1MS(
     program_version: str, 
     L_list: list[int], 
@@ -216,12 +252,17 @@ def testing_process_MSTCs_1MS(
         angle_list = list(inputs["angles"].values())[0]
         pure_states_distribution = list(inputs["probs"].values())[0]
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
 
         # Cover all the classical states            
         scope_of_numbers = list(range(2 ** n))
 
         num_classical_inputs = len(L_list) * len(sign_list)
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
@@ -230,10 +271,7 @@ def testing_process_MSTCs_1MS(
                 qc = QuantumCircuit(2 * n + m, n)
 
                 con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
-                if con_pre_mode == 'sep':
-                    qc_con = separable_control_state_preparation(angle_list)
-                elif con_pre_mode == 'ent':
-                    qc_con = entangled_control_state_preparation(angle_list)
+                qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
                 
                 qc.append(qc_con, qc.qubits[:m]) # type: ignore
 
@@ -244,26 +282,31 @@ def testing_process_MSTCs_1MS(
                     
                 # Append the tested quantum subroutine (quantum program) 
                 func = get_target_version(version_dict, program_version)
-                qc_test = func(n, L, geq=sign)
+                with timed_stage("build"):
+                    qc_test = func(n, L, geq=sign)
+
+                # Start from the saved state of the prepared prefix
+                if use_prefix_snapshot:
+                    qc = prefix_snapshot(qc)
                 qc.append(qc_test, qc.qubits[m:])
                 qc.measure(qc.qubits[m + n:],qc.clbits[:])
                 
                 # Execute the program and derive the outputs
-                dict_counts = circuit_execution(qc, shots)
+                dict_counts = circuit_execution(qc, shots, defer_measurement)
 
                 # Obtain the samples (measurement results) of the tested program
                 test_samps = outputdict2samps(dict_counts)
                 
                 # Generate the samples that follow the expected probability distribution
                 exp_probs = MSTC_specification(scope_of_numbers, pure_states_distribution, L, sign)
-                exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                 # Derive the test result by nonparametric hypothesis test
                 test_result = OPO_UTest(exp_samps, test_samps)
                 if test_result == 'fail':
                     total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({            
             "input_name": input_name,
             "angle_values": str(angle_list),
@@ -271,10 +314,13 @@ def testing_process_MSTCs_1MS(
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / num_classical_inputs / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
 
+@journaled
 def testing_process_MSTCs_2MS(
     program_version: str, 
     L_list: list[int], 
@@ -300,6 +346,11 @@ def testing_process_MSTCs_2MS(
         angle_lists = list(inputs["angles"].values())
         pure_state_distributions = list(inputs["probs"].values())
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+        # Fusing the two halves requires the same control state for both of them
+        use_fused = inputs.get("fused", False) and all(angles == angle_lists[0] for angles in angle_lists)
 
         # Cover all the classical states            
         scope_of_numbers = list(range(2 ** n))
@@ -308,7 +359,9 @@ def testing_process_MSTCs_2MS(
         MSB_val_list = list(range(len(angle_lists)))
 
         num_classical_inputs = len(L_list) * len(sign_list)
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
@@ -326,10 +379,7 @@ def testing_process_MSTCs_2MS(
                         qc.x(m + n - 1)
 
                     con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
-                    if con_pre_mode == 'sep':
-                        qc_con = separable_control_state_preparation(angle_list)
-                    elif con_pre_mode == 'ent':
-                        qc_con = entangled_control_state_preparation(angle_list)
+                    qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
                     
                     qc.append(qc_con, qc.qubits[:m]) # type: ignore
 
@@ -340,27 +390,146 @@ def testing_process_MSTCs_2MS(
                         
                     # Append the tested quantum subroutine (quantum program) 
                     func = get_target_version(version_dict, program_version)
-                    qc_test = func(n, L, geq=sign)
+                    with timed_stage("build"):
+                        qc_test = func(n, L, geq=sign)
 
+                    # Start from the saved state of the prepared prefix
+                    if use_prefix_snapshot:
+                        qc = prefix_snapshot(qc)
                     qc.append(qc_test, qc.qubits[m:])
                     qc.measure(qc.qubits[m + n:],qc.clbits[:])
                     
                     # Execute the program and derive the outputs
-                    dict_counts = circuit_execution(qc, shots)
+                    if not use_fused:
+                        dict_counts = circuit_execution(qc, shots, defer_measurement)
+                    elif MSB_val == 0:
+                        # Execute both halves at once, selecting the most significant qubit by a qubit in |+⟩
+                        fused_counts = fused_repeat_until_success(fused_preparation_2MS(n, m, qc), shots, [], defer_measurement)
+                        dict_counts = fused_counts[0]
+                    else:
+                        dict_counts = fused_counts[1]
 
                     # Obtain the samples (measurement results) of the tested program
                     test_samps = outputdict2samps(dict_counts)
                     
                     # Generate the samples that follow the expected probability distribution
                     exp_probs = MSTC_specification(scope_of_numbers, pure_state_distribution, L, sign)
-                    exp_samps = list(np.random.choice(range(2 ** qc.num_clbits), size=shots, p=exp_probs))
+                    exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
+
+                    # Derive the test result by nonparametric hypothesis test
+                    test_result = OPO_UTest(exp_samps, test_samps)
+                    if test_result == 'fail':
+                        total_failures += 1
+
+        dura_time = time.perf_counter() - start_time
+        recorded_result.append({            
+            "input_name": input_name,
+            "angle_values": str(angle_lists[0]),
+            "num_shots": shots, 
+            "controlling_unit": mixed_pre_mode,
+            "num_test_cases": test_cases, 
+            "ave_exe_time": dura_time / num_classical_inputs / repeats,
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
+        })
+    return recorded_result
+
+@journaled
+def testing_process_MSTCs_kMS(
+    program_version: str, 
+    L_list: list[int], 
+    sign_list: list[bool], 
+    inputs_list: list, 
+    mixed_pre_mode: Literal["bits", "qubits"], 
+    shots: int,
+    repeats: int,
+    verbose: bool
+) -> list[dict]:
+
+    recorded_result = []      
+    for verbose_idx, inputs in enumerate(inputs_list):
+        if verbose:
+            print(
+                f"Executing MSTCs with the k mixed state mode." 
+                f"Test inputs {verbose_idx + 1} / {len(inputs_list)},"
+                f"Control mode: {mixed_pre_mode}."
+            )
+
+        # Assign values to variables
+        n, m = inputs["num_target"], inputs["num_control"]
+        angle_lists = list(inputs["angles"].values())
+        pure_state_distributions = list(inputs["probs"].values())
+        input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+
+        # Cover all the classical states            
+        scope_of_numbers = list(range(2 ** n))
+        
+        # Split the input domain on the top k qubits into 2^k mixed states
+        k = int(math.log2(len(angle_lists)))
+        top_val_list = list(range(len(angle_lists)))
+
+        num_classical_inputs = len(L_list) * len(sign_list)
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
+        total_failures = 0
+        for _ in range(repeats):
+            test_cases = 0
+            for L, sign in product(L_list, sign_list):
+                qc_list, exp_probs_list = [], []
+                for top_val in top_val_list:
+                    test_cases += 1
+                    angle_list = angle_lists[top_val]
+
+                    pure_state_distribution = pure_state_distributions[top_val]
+
+                    qc = QuantumCircuit(2 * n + m, n)
+                    
+                    con_pre_mode = 'sep' if m == len(angle_list) else 'ent'
+                    qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
+                    
+                    qc.append(qc_con, qc.qubits[:m]) # type: ignore
+
+                    if mixed_pre_mode == 'bits':
+                        qc = bit_controlled_preparation_kMS(n, m, k, top_val, qc)
+                    elif mixed_pre_mode == 'qubits':
+                        qc = qubit_controlled_preparation_kMS(n, m, k, top_val, qc) 
+                        
+                    # Append the tested quantum subroutine (quantum program) 
+                    func = get_target_version(version_dict, program_version)
+                    with timed_stage("build"):
+                        qc_test = func(n, L, geq=sign)
+
+                    # Start from the saved state of the prepared prefix
+                    if use_prefix_snapshot:
+                        qc = prefix_snapshot(qc)
+                    qc.append(qc_test, qc.qubits[m:])
+                    qc.measure(qc.qubits[m + n:],qc.clbits[:])
+                    
+                    # Derive the expected probability distribution
+                    exp_probs = MSTC_specification(scope_of_numbers, pure_state_distribution, L, sign)
+                    qc_list.append(qc)
+                    exp_probs_list.append(exp_probs)
+
+                # Execute all the 2^k circuits in one batch and derive the outputs
+                dict_counts_list = batch_circuit_execution(qc_list, shots, defer_measurement)
+                for qc, dict_counts, exp_probs in zip(qc_list, dict_counts_list, exp_probs_list):
+                    # Obtain the samples (measurement results) of the tested program
+                    test_samps = outputdict2samps(dict_counts)
+                    
+                    # Generate the samples that follow the expected probability distribution
+                    exp_samps = expected_samples(range(2 ** qc.num_clbits), size=shots, p=exp_probs)
 
                     # Derive the test result by nonparametric hypothesis test
                     test_result = OPO_UTest(exp_samps, test_samps)
                     if test_result == 'fail':
                         total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({            
             "input_name": input_name,
             "angle_values": str(angle_lists[0]),
@@ -368,10 +537,13 @@ def testing_process_MSTCs_2MS(
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / num_classical_inputs / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
 
+@journaled
 def testing_process_MSTCs_MPS(    
     program_version: str, 
     L_list: list[int], 
@@ -403,12 +575,19 @@ def testing_process_MSTCs_MPS(
         angle_list = list(inputs["angles"].values())[0]
         pure_states_distribution = list(inputs["probs"].values())[0]
         input_name = inputs["saving_name"]
+        ent_synthesis = inputs.get("ent_synthesis", "multi_controlled")
+        defer_measurement = inputs.get("defer_measurement", False)
+        use_prefix_snapshot = inputs.get("prefix_snapshot", False)
+        use_fused = inputs.get("fused", False)
+        exact_post_selection = inputs.get("exact_post_selection", False)
 
         # Cover all the classical states                        
         scope_of_numbers = list(range(2 ** n))
         
         num_classical_inputs = len(L_list) * len(sign_list)
-        start_time = time.time()
+        start_time = time.perf_counter()
+        stage_start = stage_snapshot()
+        resource_start = resource_snapshot()
         total_failures = 0
         for _ in range(repeats):
             test_cases = 0
@@ -419,10 +598,7 @@ def testing_process_MSTCs_MPS(
                         qc = QuantumCircuit(2 * n + m, n + m)
                         # Prepare the control state
                         con_pre_mode = 'sep' if n == len(angle_list) else 'ent'
-                        if con_pre_mode == 'sep':
-                            qc_con = separable_control_state_preparation(angle_list)
-                        elif con_pre_mode == 'ent':
-                            qc_con = entangled_control_state_preparation(angle_list)
+                        qc_con = cached_control_state_preparation(con_pre_mode, tuple(angle_list), ent_synthesis, transpiled=True)
                         qc.append(qc_con, qc.qubits[:m]) # type: ignore
                         # Connect the control and target qubits
                         if mixed_pre_mode == 'bits':
@@ -435,60 +611,75 @@ def testing_process_MSTCs_MPS(
                         
                     # Append the tested quantum subroutine (quantum program) 
                     func = get_target_version(version_dict, program_version)
-                    qc_test = func(n, L, geq=sign)
+                    with timed_stage("build"):
+                        qc_test = func(n, L, geq=sign)
 
                     # Execute the program and derive the outputs
                     if temp_state == 'mixed':
+                        # Start from the saved state of the prepared prefix
+                        if use_prefix_snapshot:
+                            qc = prefix_snapshot(qc)
                         qc.append(qc_test, qc.qubits[m:])
                         qc.measure(qc.qubits[n + m:], qc.clbits[-n:])
                         # Remove the unexpected value until the valid values meets
                         # the required number of samples  
                         invalid_con_list = [int('1' * m, 2)]
-                        invalid_num_list = generate_invalid_numbers(qc.num_qubits, m, invalid_con_list)
-                        dict_counts = repeat_until_success(qc, shots, invalid_num_list)
+                        invalid_mask_list = generate_invalid_masks(m, invalid_con_list)
+                        # The control state |1...1⟩ is rejected, whose probability follows from the angles
+                        acceptance_prob = 1 - control_state_probs(angle_list, con_pre_mode)[0, -1]
+                        if use_fused:
+                            # Execute the pure state at once, selected by a qubit in |+⟩
+                            dict_counts, fused_pure_counts = fused_repeat_until_success(
+                                fused_preparation_MPS(n, m, qc), shots, invalid_mask_list, defer_measurement, acceptance_prob
+                            )
+                        elif exact_post_selection:
+                            # Sample from the exact output distribution conditioned on the valid control values
+                            dict_counts = post_selected_sampling(qc, shots, invalid_mask_list)
+                        else:
+                            dict_counts = repeat_until_success(qc, shots, invalid_mask_list, defer_measurement, acceptance_prob)
                     elif temp_state == 'pure':
                         qc.append(qc_test, qc.qubits[:])
                         qc.measure(qc.qubits[n:], qc.clbits[:])
-                        dict_counts = circuit_execution(qc, shots)
+                        if use_fused:
+                            # Remove the output of control qubits (low m bits) of the fused execution
+                            dict_counts = fused_pure_counts >> m
+                        else:
+                            dict_counts = circuit_execution(qc, shots, defer_measurement)
 
                     # Obtain the samples (measurement results) of the tested program
-                    test_samps = []
-                    for (key, value) in dict_counts.items():
-                        if temp_state == 'mixed':   # Remove the output of control qubits (low m bits)
-                            test_samps += [key >> m] * value
-                        else:
-                            test_samps += [key] * value
+                    # Remove the output of control qubits (low m bits) of the mixed state
+                    test_samps = outputdict2samps(dict_counts >> m if temp_state == 'mixed' else dict_counts)
                     
                     # Generate the samples that follow the expected probability distribution
                     if temp_state == "mixed":
                         exp_probs = MSTC_specification(scope_of_numbers, pure_states_distribution, L, sign)
-                        exp_samps = list(
-                            np.random.choice(
-                                range(2 ** (qc.num_clbits - m)), 
-                                size=shots, 
-                                p=exp_probs
-                        ))
+                        exp_samps = expected_samples(
+                            range(2 ** (qc.num_clbits - m)), 
+                            size=shots, 
+                            p=exp_probs
+                    )
                     elif temp_state == "pure":
                         exp_probs = PSTC_specification(n, 2 ** n - 1, L, sign)
-                        exp_samps = list(
-                            np.random.choice(
-                                range(2 ** (qc.num_clbits)), 
-                                size=shots, 
-                                p=exp_probs
-                        ))               
+                        exp_samps = expected_samples(
+                            range(2 ** (qc.num_clbits)), 
+                            size=shots, 
+                            p=exp_probs
+                    )               
                                         
                     # Derive the test result by nonparametric hypothesis test
                     test_result = OPO_UTest(exp_samps, test_samps)
                     if test_result == 'fail':
                         total_failures += 1
 
-        dura_time = time.time() - start_time
+        dura_time = time.perf_counter() - start_time
         recorded_result.append({            
             "input_name": input_name,
             "num_shots": shots, 
             "controlling_unit": mixed_pre_mode,
             "num_test_cases": test_cases, 
             "ave_exe_time": dura_time / num_classical_inputs / repeats,
-            "ave_faults": total_failures / test_cases / repeats
+            "ave_faults": total_failures / test_cases / repeats,
+            **stage_averages(stage_start, num_classical_inputs * repeats),
+            **resource_usage(resource_start)
         })
     return recorded_result
\ No newline at end of file
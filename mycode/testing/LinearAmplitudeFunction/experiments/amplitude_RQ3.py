@@ -69,31 +69,31 @@ def _RQ_running_MSTCs(
     return required_data(_RQ_NAME, recorded_list)
 
 
-if __name__ == '__main__':
-    import argparse
-    from ..config.RQ3_config import config_dict
+def run_experiment(
+    rep_mode: Literal["toy", "all"] | None = None,
+    verbose: bool = False,
+    versions: list[str] | None = None
+) -> None:
+    """
+    Run the experiment over the program versions and save the results.
 
-    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
-    parser.add_argument(
-        '--mode',
-        type=str,
-        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
-        choices=["toy", "all"],
-        default=None
-    )
-    parser.add_argument(
-        "--verbose", 
-        action="store_true",
-        help="Print detailed progress information."
-    )
-    args = parser.parse_args()
+    It is called by `python -m` upon this module and by `mycode.run`, so that several 
+    experiments can share one process.
 
-    input_data = rep_mode_selection(config_dict, args.mode)
+    Args:
+        rep_mode (Literal["toy", "all"] | None): The replication mode, `all` by default.
+        verbose (bool): Whether to print detailed progress information.
+        versions (list[str] | None): The program versions to run, all the configured ones by default.
+    """
+    from ..config.RQ3_config import config_dict
 
-    save_dir = RQ_saving_dir(_RQ_NAME, program_name, args.mode)
+    input_data = rep_mode_selection(config_dict, rep_mode)
+
+    save_dir = RQ_saving_dir(_RQ_NAME, program_name, rep_mode)
     exe_dict = {"PSTC": _RQ_running_PSTCs, "MSTC":_RQ_running_MSTCs}
     # Execute the test processes
-    for program_version in input_data["versions"]:
+    program_versions = input_data["versions"] if versions is None else versions
+    for program_version in program_versions:
         print(f"Buggy mutant: {program_version}")
         for task_name, exe_function in exe_dict.items():
             if task_name == "PSTC":
@@ -105,7 +105,7 @@ if __name__ == '__main__':
                     input_data["domain_list"],
                     input_data["image_list"],
                     exe_repeats,
-                    verbose=args.verbose
+                    verbose=verbose
                 )            
             elif task_name == "MSTC":
                 recorded_data = exe_function(
@@ -117,7 +117,7 @@ if __name__ == '__main__':
                     input_data["image_list"],   
                     "qubits",
                     exe_repeats,
-                    verbose=args.verbose
+                    verbose=verbose
                 )
 
             csv_saving(
@@ -131,3 +131,24 @@ if __name__ == '__main__':
             )
     
     print(f"{program_name}-{_RQ_NAME} done!")
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description=f"adder_{_RQ_NAME}_experiment")
+    parser.add_argument(
+        '--mode',
+        type=str,
+        help="Replication mode, either `toy` for a small subset of test suites or `all` for all the test cases.",
+        choices=["toy", "all"],
+        default=None
+    )
+    parser.add_argument(
+        "--verbose", 
+        action="store_true",
+        help="Print detailed progress information."
+    )
+    args = parser.parse_args()
+
+    run_experiment(args.mode, args.verbose)
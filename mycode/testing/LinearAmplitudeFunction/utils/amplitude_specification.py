@@ -11,7 +11,9 @@ making it useful for verifying the functionality of quantum programs.
 
 import math
 import numpy as np
+from ....utils.stage_timing import timed_stage
 
+@timed_stage("specification")
 def PSTC_specification(
     n: int, 
     number: int, 
@@ -30,6 +32,7 @@ def PSTC_specification(
     exp_probs = [res_vec[0] ** 2, res_vec[1] ** 2]
     return exp_probs
 
+@timed_stage("specification")
 def MSTC_specification(
     n: int, 
     numbers: list[int],
@@ -6,6 +6,7 @@ from .testing_process import (
     testing_process_MSTCs,
     testing_process_MSTCs_1MS,
     testing_process_MSTCs_2MS,
+    testing_process_MSTCs_kMS,
     testing_process_MSTCs_MPS
 )
 
@@ -16,5 +17,6 @@ __all__ = [
     "testing_process_MSTCs",
     "testing_process_MSTCs_1MS",
     "testing_process_MSTCs_2MS",
+    "testing_process_MSTCs_kMS",
     "testing_process_MSTCs_MPS"
 ]
\ No newline at end of file
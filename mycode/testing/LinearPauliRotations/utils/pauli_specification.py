@@ -10,7 +10,9 @@ making it useful for verifying the functionality of quantum programs.
 """
 
 import math
+from ....utils.stage_timing import timed_stage
 
+@timed_stage("specification")
 def PSTC_specification(
     number: int, 
     slope: float, 
@@ -22,6 +24,7 @@ def PSTC_specification(
     exp_probs[1] = math.sin(a * number + b) ** 2
     return exp_probs
 
+@timed_stage("specification")
 def MSTC_specification(
     numbers: list[int], 
     input_probs: list[float], 
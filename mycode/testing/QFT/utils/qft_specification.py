@@ -11,7 +11,9 @@ making it useful for verifying the functionality of quantum programs.
 
 import numpy as np
 import math, cmath
+from ....utils.stage_timing import timed_stage
 
+@timed_stage("specification")
 def PSTC_specification(n: int, number: int, if_swap: bool) -> list[float]:
     for index in range(n):
         theta = 2 * math.pi * number / (2 ** (index + 1))
@@ -26,6 +28,7 @@ def PSTC_specification(n: int, number: int, if_swap: bool) -> list[float]:
     exp_probs = (abs(state_vec) ** 2).tolist()
     return exp_probs
 
+@timed_stage("specification")
 def MSTC_specification(
     numbers: list[int], 
     input_probs: list[float], 
@@ -5,6 +5,8 @@ the number of qubits (# Qubits), the number of basic gates (# Gates), and
 the circuit depth (Depths) shown in Table 3 of our TOSEM paper.
 
 The results will be directly printed in the terminal.
+Besides, `version_complexity` counts the qubits and gates of a single
+configuration, which serve the cost estimates of `mycode/campaign.py`.
 """
 
 import os
@@ -67,6 +69,26 @@ def _circuit_complexity_info(
     }.items():
         print(f"#{name} : [{min(values)}, {max(values)}]")
    
+def version_complexity(program_version: str, n: int, input_data: dict) -> tuple[int, int]:
+    """
+    Return the numbers of qubits and gates of a program version upon n input qubits,
+    built with the first classical inputs of an experiment configuration.
+    """
+    num_out = input_data["num_outs"][0]
+    qc = QuantumCircuit(n + num_out, num_out)
+    func = get_target_version(version_dict, program_version)
+    qc_test = func(
+        num_result_qubits=num_out, 
+        quadratic=input_data["matrix_A"][f"qubit_num={n}"][0], 
+        linear=input_data["vector_B"][f"qubit_num={n}"][0], 
+        offset=input_data["integer_C"][0]
+    )
+    qc.append(qc_test, qc.qubits)
+
+    # Obtain the circuit being fully decomposed
+    dec_qc = full_circuit_decomposition(qc)
+    return qubit_count(dec_qc), gate_count(dec_qc)
+
 if __name__ == '__main__':
     versions = set()
     
@@ -12,7 +12,9 @@ making it useful for verifying the functionality of quantum programs.
 import numpy as np
 
 from typing import Sequence
+from ....utils.stage_timing import timed_stage
 
+@timed_stage("specification")
 def PSTC_specification(
     x: list[int], 
     A: list[list], 
@@ -39,6 +41,7 @@ def PSTC_specification(
     return exp_probs
 
 
+@timed_stage("specification")
 def MSTC_specification(
     input_numbers: list[int],
     n: int, 
@@ -10,7 +10,9 @@ making it useful for verifying the functionality of quantum programs.
 """
 
 import numpy as np
+from ....utils.stage_timing import timed_stage
 
+@timed_stage("specification")
 def PSTC_specification(
     s: int, 
     qubit_vals: list[bool], 
@@ -29,6 +31,7 @@ def PSTC_specification(
     expProbs[expRes] = 1
     return expProbs
 
+@timed_stage("specification")
 def MSTC_specification(
     input_numbers: list[int], 
     input_probs: list[float], 
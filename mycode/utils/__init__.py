@@ -2,52 +2,155 @@
 
 from .data_conversion import (
     generate_numbers, 
+    iter_numbers,
+    generate_number_array,
+    index2bits,
+    bits2index,
+    Counts,
     covered_pure_states, 
     outputdict2samps,
-    outputdict2probs
+    outputdict2probs,
+    to_json
+)
+from .test_oracle import OPO_UTest, expected_samples
+from .circuit_execution import (
+    circuit_execution,
+    is_dynamic_circuit,
+    defer_measurements,
+    prefix_snapshot,
+    batch_circuit_execution,
+    outcome_probabilities
 )
-from .test_oracle import OPO_UTest
-from .circuit_execution import circuit_execution
 from .preparation_circuits import (
     bit_controlled_preparation_1MS, 
     qubit_controlled_preparation_1MS,
+    bit_recycled_preparation_1MS,
+    qubit_recycled_preparation_1MS,
     bit_controlled_preparation_2MS,
     qubit_controlled_preparation_2MS,
+    bit_controlled_preparation_kMS,
+    qubit_controlled_preparation_kMS,
     bit_controlled_preparation_MPS,
     qubit_controlled_preparation_MPS,
+    fused_preparation_2MS,
+    fused_preparation_MPS,
     separable_control_state_preparation,
-    entangled_control_state_preparation
+    entangled_control_state_preparation,
+    multiplexed_control_state_preparation,
+    control_state_preparation,
+    cached_control_state_preparation,
+    controlled_ry_gate
 )
 from .defect_loader import import_versions, get_target_version
-from .csv_saving import csv_saving, RQ_saving_dir
-from .repeat_until_success import repeat_until_success, generate_invalid_numbers
-from .circuit_complexity_measure import full_circuit_decomposition, gate_count, depth_count, qubit_count
+from .csv_saving import csv_saving, RQ_saving_dir, saving_root
+from .repeat_until_success import (
+    repeat_until_success,
+    fused_repeat_until_success,
+    post_selected_sampling,
+    generate_invalid_masks,
+    generate_invalid_numbers
+)
+from .circuit_complexity_measure import (
+    full_circuit_decomposition,
+    gate_count,
+    depth_count,
+    qubit_count,
+    cx_count,
+    complexity_profile
+)
 from .input_loading import rep_mode_selection
+from .checkpoint_journal import CheckpointJournal, checkpoint_journal, journaled
+from .result_cache import ResultCache, result_cache
+from .workload_slice import WorkloadSlice, workload_slice, parse_int_ranges, parse_shard
+from .circuit_plan import CircuitPlan, circuit_plan
+from .stage_timing import STAGES, timed_stage, stage_snapshot, stage_averages
+from .profiling import PROFILE_MODES, profiling
+from .resource_sampling import resource_snapshot, resource_usage, record_width
+from .suite_generation import (
+    separable_control_state_angles,
+    entangled_control_state_angles,
+    control_state_probs,
+    validate_mixed_state_suite,
+    generate_mixed_state_suites
+)
 
 __all__ = [
     "generate_numbers",
+    "iter_numbers",
+    "generate_number_array",
+    "index2bits",
+    "bits2index",
+    "Counts",
     "covered_pure_states",
+    "to_json",
     "outputdict2samps",
     "outputdict2probs",
     "OPO_UTest",
+    "expected_samples",
     "circuit_execution",
+    "is_dynamic_circuit",
+    "defer_measurements",
+    "prefix_snapshot",
+    "batch_circuit_execution",
+    "outcome_probabilities",
     "bit_controlled_preparation_1MS",
     "qubit_controlled_preparation_1MS",
+    "bit_recycled_preparation_1MS",
+    "qubit_recycled_preparation_1MS",
     "import_versions",
     "get_target_version",
     "csv_saving",
     "RQ_saving_dir",
+    "saving_root",
     "separable_control_state_preparation",
     "entangled_control_state_preparation",
+    "multiplexed_control_state_preparation",
+    "control_state_preparation",
+    "cached_control_state_preparation",
+    "controlled_ry_gate",
     "bit_controlled_preparation_2MS",
     "qubit_controlled_preparation_2MS",
+    "bit_controlled_preparation_kMS",
+    "qubit_controlled_preparation_kMS",
     "bit_controlled_preparation_MPS",
     "qubit_controlled_preparation_MPS",
+    "fused_preparation_2MS",
+    "fused_preparation_MPS",
     "repeat_until_success",
+    "fused_repeat_until_success",
+    "post_selected_sampling",
+    "generate_invalid_masks",
     "generate_invalid_numbers",
     "full_circuit_decomposition",
     "gate_count",
     "depth_count",
     "qubit_count",
-    "rep_mode_selection"
+    "cx_count",
+    "complexity_profile",
+    "rep_mode_selection",
+    "CheckpointJournal",
+    "checkpoint_journal",
+    "journaled",
+    "ResultCache",
+    "result_cache",
+    "WorkloadSlice",
+    "workload_slice",
+    "parse_int_ranges",
+    "parse_shard",
+    "CircuitPlan",
+    "circuit_plan",
+    "STAGES",
+    "timed_stage",
+    "stage_snapshot",
+    "stage_averages",
+    "PROFILE_MODES",
+    "profiling",
+    "resource_snapshot",
+    "resource_usage",
+    "record_width",
+    "separable_control_state_angles",
+    "entangled_control_state_angles",
+    "control_state_probs",
+    "validate_mixed_state_suite",
+    "generate_mixed_state_suites"
 ]
@@ -0,0 +1,281 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import numpy as np
+
+from .data_conversion import to_json
+from .result_cache import active_result_cache
+from .workload_slice import active_workload_slice
+from .circuit_plan import active_circuit_plan
+
+# The journal used by the testing processes decorated with `journaled`, if any
+_active_journal = None
+
+# Arguments that are split into one work item per element, i.e., the outermost loops
+SPLIT_ARGUMENTS = ("n_list", "inputs_list")
+# Arguments that do not affect the results
+IGNORED_ARGUMENTS = ("verbose",)
+
+
+class CheckpointJournal:
+    """
+    An append-only journal of completed work items in the JSON Lines format.
+
+    Each line holds the key and the description of a work item, its recorded results
+    (i.e., the dictionaries returned by a testing process, including the fault counts
+    and the execution times) and its elapsed time. Lines are flushed to the disk once
+    written, so that a campaign killed at any time loses the current item only. A torn
+    last line is ignored when the journal is loaded.
+
+    Parameters
+    ----------
+    path : str
+        The path of the journal file, created on the first append.
+
+    Example
+    -------
+    >>> journal = CheckpointJournal("RQ1_QFT_journal.jsonl")
+    >>> journal.append("key", {"process": "testing_process_PSTCs"}, [{"ave_faults": 0.0}], 1.5)
+    >>> CheckpointJournal("RQ1_QFT_journal.jsonl").get("key")
+    [{'ave_faults': 0.0}]
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = {entry["key"]: entry["records"] for entry in self.entries()}
+
+    def entries(self) -> Iterator[dict]:
+        """
+        Read the entries of the journal file in order, skipping the torn lines.
+        """
+        if not os.path.isfile(self.path):
+            return
+        with open(self.path, "r", encoding="utf-8") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.records
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def get(self, key: str) -> list[dict] | None:
+        return self.records.get(key)
+
+    def append(self, key: str, item: dict, records: list[dict], elapsed: float) -> None:
+        entry = {"key": key, "item": item, "records": records, "elapsed": elapsed}
+        line = json.dumps(entry, default=to_json) + "\n"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        # Start a new line after a torn last line, so that the entry is not lost with it
+        if os.path.isfile(self.path) and os.path.getsize(self.path) > 0:
+            with open(self.path, "rb") as file:
+                file.seek(-1, os.SEEK_END)
+                if file.read(1) != b"\n":
+                    line = "\n" + line
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+        self.records[key] = json.loads(line.strip())["records"]
+
+
+@contextmanager
+def checkpoint_journal(path: str | CheckpointJournal) -> Iterator[CheckpointJournal]:
+    """
+    Journal the testing processes decorated with `journaled` that are called within.
+
+    The completed work items found in the journal are skipped and their recorded
+    results are returned instead, so that rerunning an interrupted experiment resumes
+    it and rebuilds the same CSV files. Delete the journal to start from scratch.
+
+    Parameters
+    ----------
+    path : str or CheckpointJournal
+        The path of the journal file, or a journal object providing `get` and `append`
+        (e.g., the SQLite store of ``mycode/work_queue.py``).
+
+    Yields
+    ------
+    CheckpointJournal
+        The active journal.
+    """
+    global _active_journal
+    previous_journal = _active_journal
+    _active_journal = CheckpointJournal(path) if isinstance(path, str) else path
+    try:
+        yield _active_journal
+    finally:
+        _active_journal = previous_journal
+
+
+def journaled(process_func: Callable[..., list[dict]]) -> Callable[..., list[dict]]:
+    """
+    Decorate a testing process to run it item by item through the active journal.
+
+    Outside ``checkpoint_journal``, ``result_cache`` and ``workload_slice``, the testing
+    process is called as is. Otherwise, the call is split into work items, one per element
+    of its outermost list (see ``SPLIT_ARGUMENTS``), whose recorded results are concatenated
+    in order. A work item is keyed by the hash of the testing process and its arguments. It
+    is skipped if it is outside the active slice, and is only executed if neither the
+    journal nor the result cache has results for it. During a dry run (see
+    ``circuit_plan``), each item is executed and its circuits are attributed to it.
+
+    Parameters
+    ----------
+    process_func : Callable
+        A testing process returning a list of recorded results.
+
+    Returns
+    -------
+    Callable
+        The decorated testing process.
+    """
+    signature = inspect.signature(process_func)
+    process_name = f"{process_func.__module__}.{process_func.__name__}"
+
+    @functools.wraps(process_func)
+    def wrapper(*args, **kwargs):
+        journal = _active_journal
+        cache = active_result_cache()
+        workload = active_workload_slice()
+        plan = active_circuit_plan()
+        if journal is None and cache is None and workload is None and plan is None:
+            return process_func(*args, **kwargs)
+
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        split_name = next((name for name in SPLIT_ARGUMENTS if name in bound.arguments), None)
+        elements = [[element] for element in bound.arguments[split_name]] if split_name else [None]
+
+        recorded_result = []
+        for element in elements:
+            arguments = dict(bound.arguments)
+            if split_name is not None:
+                arguments[split_name] = element
+            item = {
+                "process": process_name,
+                "arguments": {
+                    name: value for name, value in arguments.items() if name not in IGNORED_ARGUMENTS
+                }
+            }
+            key = hashlib.sha256(
+                json.dumps(item, sort_keys=True, default=to_json).encode("utf-8")
+            ).hexdigest()
+            if workload is not None and not workload.selects(key, item["arguments"]):
+                continue
+            if plan is not None:
+                with plan.item(key, item):
+                    recorded_result += process_func(**arguments)
+                continue
+            records = journal.get(key) if journal is not None else None
+            if records is not None:
+                recorded_result += records
+                continue
+
+            start_time = time.perf_counter()
+            cache_key = cache.key(process_func, item["arguments"]) if cache is not None else None
+            records = cache.get(cache_key) if cache is not None else None
+            if records is None:
+                if cache is not None:
+                    cache.seed_work_item(cache_key)
+                records = process_func(**arguments)
+                if cache is not None:
+                    cache.put(cache_key, item, records)
+            if journal is not None:
+                journal.append(key, item, records, time.perf_counter() - start_time)
+            recorded_result += records
+        return recorded_result
+
+    return wrapper
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the checkpoint journal.
+    Run:
+        python -m mycode.utils.checkpoint_journal
+    """
+    import tempfile
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    calls = []
+
+    @journaled
+    def testing_process_toy(program_version: str, n_list: list[int], shots: int, verbose: bool = False) -> list[dict]:
+        calls.append(list(n_list))
+        return [{"num_qubits": n, "num_shots": shots, "ave_faults": np.float64(n / 10)} for n in n_list]
+
+    def test_input_journal():
+        return os.path.join(tempfile.mkdtemp(), "journal", "RQ1_toy_journal.jsonl")
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_passthrough(path):
+        # Without an active journal, the process is called once as is
+        calls.clear()
+        assert len(testing_process_toy("v1", [1, 2], 8)) == 2
+        assert calls == [[1, 2]]
+        assert not os.path.exists(path)
+
+    def unit_test_resume(path):
+        calls.clear()
+        with checkpoint_journal(path) as journal:
+            first = testing_process_toy("v1", [1, 2], 8)
+            assert len(journal) == 2
+        # Each element of n_list is a work item
+        assert calls == [[1], [2]]
+
+        # The completed items are skipped, and only the new item is executed
+        calls.clear()
+        with checkpoint_journal(path):
+            second = testing_process_toy("v1", [1, 2, 3], 8, verbose=True)
+            testing_process_toy("v2", [1], 8)
+        assert calls == [[3], [1]]
+        assert second[:2] == first and second[2]["num_qubits"] == 3
+
+    def unit_test_torn_line(path):
+        with checkpoint_journal(path):
+            testing_process_toy("v1", [1], 8)
+        # Simulate a campaign killed while writing a line
+        with open(path, "a", encoding="utf-8") as file:
+            file.write('{"key": "torn", "rec')
+        journal = CheckpointJournal(path)
+        assert "torn" not in journal and len(journal) >= 1
+        # The entries appended after the torn line are kept
+        journal.append("next", {}, [], 0.0)
+        assert "next" in CheckpointJournal(path)
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_journal, "function": unit_test_passthrough},
+        "1": {"input": test_input_journal, "function": unit_test_resume},
+        "2": {"input": test_input_journal, "function": unit_test_torn_line},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
@@ -7,12 +7,13 @@ It includes methods to:
 - Compute the depth (longest path of operations).
 - Count the total number of gates.
 - Count the number of qubits.
+- Profile a circuit transpiled into a basis (gates, CNOTs, depth).
 
 These metrics are commonly used in quantum algorithm analysis to evaluate 
 resource requirements and optimize circuit designs.
 """
 
-from qiskit import QuantumCircuit
+from qiskit import QuantumCircuit, transpile
 
 def full_circuit_decomposition(qc: QuantumCircuit) -> QuantumCircuit:
     """
@@ -43,6 +44,36 @@ def gate_count(qc: QuantumCircuit) -> int:
 def qubit_count(qc: QuantumCircuit) -> int:
     return qc.num_qubits
 
+def cx_count(qc: QuantumCircuit) -> int:
+    return qc.count_ops().get("cx", 0)
+
+def complexity_profile(
+    qc: QuantumCircuit,
+    basis_gates: list[str] | None = None
+) -> dict[str, int]:
+    """
+    Summarize the structural complexity of a circuit after transpiling it into a basis.
+
+    Unlike ``full_circuit_decomposition``, multi-controlled gates are synthesized by
+    the transpiler, so that the metrics reflect the circuits actually simulated.
+
+    Args:
+        qc (QuantumCircuit): The quantum circuit to measure.
+        basis_gates (list[str] | None): The target basis, ``["u", "cx"]`` by default.
+
+    Returns:
+        dict[str, int]: The numbers of qubits, gates and CNOTs, and the depth.
+    """
+    if basis_gates is None:
+        basis_gates = ["u", "cx"]
+    transpiled_qc = transpile(qc, basis_gates=basis_gates, optimization_level=0)
+    return {
+        "num_qubits": qubit_count(transpiled_qc),
+        "num_gates": gate_count(transpiled_qc),
+        "num_cx": cx_count(transpiled_qc),
+        "depth": depth_count(transpiled_qc)
+    }
+
 if __name__ == "__main__":
     """
     Unit testing.
@@ -81,6 +112,14 @@ if __name__ == "__main__":
         assert gate_count(decomposed) >= 1
         assert depth_count(decomposed) >= 1
 
+    def integration_test_3(qc):
+        profile = complexity_profile(qc)
+        # A single Hadamard gate is transpiled into one U gate without CNOTs
+        assert profile["num_qubits"] == 1
+        assert profile["num_gates"] == 1
+        assert profile["num_cx"] == 0
+        assert profile["depth"] == 1
+
     # ----------------------------
     # Test execution table
     # ----------------------------
@@ -89,6 +128,7 @@ if __name__ == "__main__":
         "0": {"input": test_input_0, "function": integration_test_0},
         "1": {"input": test_input_0, "function": integration_test_1},
         "2": {"input": test_input_0, "function": integration_test_2},
+        "3": {"input": test_input_0, "function": integration_test_3},
     }
 
     for id, execution_dict in executed_test.items():
@@ -1,10 +1,324 @@
+import numpy as np
 from qiskit import QuantumCircuit, transpile
+from qiskit.circuit import Clbit, ControlFlowOp, ControlledGate
+from qiskit.circuit.library import get_standard_gate_name_mapping
+from qiskit.quantum_info import Statevector
 from qiskit_aer import Aer
+from qiskit_aer.library import SetStatevector
+from .data_conversion import Counts
+from .circuit_plan import active_circuit_plan
+from .stage_timing import timed_stage
+from .resource_sampling import record_width
 
-def circuit_execution(qc: QuantumCircuit, shots: int) -> dict:
+STANDARD_GATE_NAMES = set(get_standard_gate_name_mapping())
+MAX_PREFIX_SNAPSHOTS = 256
+_prefix_snapshots = {}   # Map the structure of a prefix to its final state and measurements
+
+def is_dynamic_circuit(qc: QuantumCircuit) -> bool:
+    """
+    Check whether a quantum circuit contains dynamic operations.
+
+    A circuit is regarded as dynamic if it contains classically conditioned 
+    operations (e.g., ``c_if``), control flow, resets, or any operation applied 
+    to a qubit after the qubit has been measured. For such circuits, the Aer 
+    simulator cannot sample all the shots from a single final state.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The quantum circuit to be checked.
+
+    Returns
+    -------
+    bool
+        ``True`` if the circuit is dynamic, otherwise ``False``.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(2, 1)
+    >>> qc.h(0)
+    >>> qc.measure(0, 0)
+    >>> qc.x(1).c_if(qc.clbits[0], 1)
+    >>> is_dynamic_circuit(qc)
+    True
+    """
+    measured_qubits = set()
+    for instruction in qc.data:
+        operation = instruction.operation
+        if isinstance(operation, ControlFlowOp) or operation.name == "reset":
+            return True
+        if getattr(operation, "condition", None) is not None:
+            return True
+        if operation.name == "measure":
+            measured_qubits.update(instruction.qubits)
+        elif operation.name != "barrier" and measured_qubits.intersection(instruction.qubits):
+            return True
+    return False
+
+def defer_measurements(qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Rewrite a circuit with mid-circuit measurements into an equivalent static circuit.
+
+    Following the principle of deferred measurement, each operation conditioned 
+    on a classical bit is replaced by the same operation controlled by the qubit 
+    measured into that bit, and all the measurements are moved to the end of the 
+    circuit. Measurements whose classical bits are overwritten later are dropped. 
+    For example, the bit-controlled preparations in ``preparation_circuits.py`` 
+    are rewritten into their qubit-controlled counterparts, and the distribution 
+    of the measurement outcomes is unchanged.
+
+    The given circuit is not modified. If the circuit cannot be rewritten, e.g., 
+    a measured qubit is operated again or a condition refers to an unmeasured 
+    classical bit, the original circuit is returned.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The quantum circuit to be rewritten.
+
+    Returns
+    -------
+    QuantumCircuit
+        A circuit without mid-circuit measurements and classical conditions, or 
+        the original circuit if the rewriting is not applicable.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(2, 1)
+    >>> qc.h(0)
+    >>> qc.measure(0, 0)
+    >>> qc.x(1).c_if(qc.clbits[0], 1)
+    >>> print(defer_measurements(qc))
+    Example circuit::
+
+                 ┌───┐     ┌─┐
+            q_0: ┤ H ├──■──┤M├
+                 └───┘┌─┴─┐└╥┘
+            q_1: ─────┤ X ├─╫─
+                      └───┘ ║
+            c: 1/═══════════╩═
+                            0 
+    """
+    deferred_qc = qc.copy_empty_like()
+    pending_measurements = {}   # Map each classical bit to the qubit last measured into it
+    measured_qubits = set()
+    for instruction in qc.data:
+        operation = instruction.operation
+        if operation.name == "measure":
+            pending_measurements[instruction.clbits[0]] = instruction.qubits[0]
+            measured_qubits.add(instruction.qubits[0])
+            continue
+        if operation.name == "barrier":
+            deferred_qc.append(operation, instruction.qubits)
+            continue
+        if (
+            isinstance(operation, ControlFlowOp)
+            or operation.name == "reset"
+            or instruction.clbits
+            or measured_qubits.intersection(instruction.qubits)
+        ):
+            return qc
+
+        condition = getattr(operation, "condition", None)
+        if condition is None:
+            deferred_qc.append(operation, instruction.qubits)
+            continue
+        clbit, value = condition
+        if not isinstance(clbit, Clbit) or clbit not in pending_measurements:
+            return qc
+        # Replace the classical condition with a quantum control on the measured qubit
+        unconditioned_operation = operation.to_mutable()
+        unconditioned_operation.condition = None
+        controlled_operation = unconditioned_operation.control(1, ctrl_state=int(value))
+        deferred_qc.append(controlled_operation, [pending_measurements[clbit], *instruction.qubits])
+
+    for clbit, qubit in pending_measurements.items():
+        deferred_qc.measure(qubit, clbit)
+    return deferred_qc
+
+def _circuit_key(qc: QuantumCircuit) -> tuple:
+    """
+    Summarize the structure of a circuit as a hashable key.
+
+    Composite instructions (e.g., the cached control-state preparations) are keyed 
+    by their definitions, while standard and controlled gates are keyed by their 
+    names, parameters and control states.
+    """
+    def param_key(param):
+        try:
+            hash(param)
+            return param
+        except TypeError:
+            return repr(param)
+
+    key = []
+    for instruction in qc.data:
+        operation = instruction.operation
+        operation_key = (
+            operation.name,
+            tuple(param_key(param) for param in operation.params),
+            getattr(operation, "ctrl_state", None),
+            tuple(qc.find_bit(qubit).index for qubit in instruction.qubits),
+            tuple(qc.find_bit(clbit).index for clbit in instruction.clbits)
+        )
+        if (
+            operation.name not in STANDARD_GATE_NAMES
+            and not isinstance(operation, ControlledGate)
+            and operation.definition is not None
+        ):
+            operation_key += (_circuit_key(operation.definition),)
+        condition = getattr(operation, "condition", None)
+        if condition is not None:
+            operation_key += (qc.find_bit(condition[0]).index, int(condition[1]))
+        key.append(operation_key)
+    return (qc.num_qubits, qc.num_clbits, tuple(key))
+
+def prefix_snapshot(qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Replace the prepared prefix of a circuit with a snapshot of its final state.
+
+    The prefix (e.g., the control-state preparation and the mixed-state coupling 
+    of an MSTC) is simulated once with deferred measurements, and its final 
+    statevector is cached by the structure of the prefix. The returned circuit 
+    initializes all the qubits to the saved state (with the qubits untouched by 
+    the prefix in |0>), followed by the measurements of the prefix. Therefore, 
+    a prefix shared by program versions, parameters and repeats is simulated only 
+    once, and the program under test can be appended to the returned circuit.
+
+    The measured qubits of the prefix should not be operated afterwards, which 
+    holds for the preparations in ``preparation_circuits.py``. If the prefix 
+    cannot be rewritten by ``defer_measurements``, it is returned unchanged.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The prefix to be simulated, defined upon all the qubits and classical bits 
+        of the full circuit.
+
+    Returns
+    -------
+    QuantumCircuit
+        A circuit of the same size that starts from the saved state.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(4, 2)
+    >>> qc.h(0)
+    >>> qc.measure(0, 1)
+    >>> qc.x(2).c_if(qc.clbits[1], 1)
+    >>> qc = prefix_snapshot(qc)     # Starts from (|00⟩ + |101⟩) / sqrt(2)
+    >>> qc.cx(2, 3)                  # Append the program under test
+    """
+    key = _circuit_key(qc)
+    if key not in _prefix_snapshots:
+        deferred_qc = defer_measurements(qc)
+        if is_dynamic_circuit(deferred_qc):
+            return qc
+
+        # Simulate the qubits touched by the prefix only
+        measurements = [
+            (qc.find_bit(instruction.qubits[0]).index, qc.find_bit(instruction.clbits[0]).index)
+            for instruction in deferred_qc.data if instruction.operation.name == "measure"
+        ]
+        unitary_qc = deferred_qc.remove_final_measurements(inplace=False)
+        touched_qubits = [
+            unitary_qc.find_bit(qubit).index
+            for instruction in unitary_qc.data for qubit in instruction.qubits
+        ]
+        num_touched = max(touched_qubits, default=-1) + 1
+        reduced_qc = QuantumCircuit(num_touched, global_phase=unitary_qc.global_phase)
+        for instruction in unitary_qc.data:
+            reduced_qc.append(
+                instruction.operation,
+                [unitary_qc.find_bit(qubit).index for qubit in instruction.qubits]
+            )
+        with timed_stage("simulate"):
+            statevector = Statevector(reduced_qc).data
+
+        if len(_prefix_snapshots) >= MAX_PREFIX_SNAPSHOTS:
+            _prefix_snapshots.pop(next(iter(_prefix_snapshots)))
+        _prefix_snapshots[key] = (statevector, measurements)
+
+    statevector, measurements = _prefix_snapshots[key]
+    full_statevector = np.zeros(2 ** qc.num_qubits, dtype=complex)
+    full_statevector[:len(statevector)] = statevector
+    snapshot_qc = qc.copy_empty_like()
+    snapshot_qc.append(SetStatevector(full_statevector), snapshot_qc.qubits)
+    for qubit_index, clbit_index in measurements:
+        snapshot_qc.measure(qubit_index, clbit_index)
+    return snapshot_qc
+
+def outcome_probabilities(qc: QuantumCircuit) -> np.ndarray:
+    """
+    Compute the exact probabilities of the measurement outcomes of a circuit.
+
+    The circuit is rewritten by ``defer_measurements``, and the probabilities of 
+    the measured qubits are saved from a single statevector simulation instead of 
+    sampling shots. Classical bits that are never measured are always 0.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The quantum circuit with measurement operations.
+
+    Returns
+    -------
+    np.ndarray
+        The probabilities of the 2^num_clbits outcomes, indexed by the integer 
+        keys as returned by ``circuit_execution``.
+
+    Raises
+    ------
+    ValueError
+        If the circuit cannot be rewritten into a static circuit.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(2, 2)
+    >>> qc.ry(1.911, 0)
+    >>> qc.measure(0, 1)
+    >>> outcome_probabilities(qc)
+    array([0.333..., 0.        , 0.666..., 0.        ])
+    """
+    if active_circuit_plan() is not None:
+        return active_circuit_plan().record_probabilities(qc)
+    record_width(qc.num_qubits)
+    deferred_qc = defer_measurements(qc)
+    if is_dynamic_circuit(deferred_qc):
+        raise ValueError("The circuit cannot be rewritten into a static circuit by deferred measurement.")
+
+    # Strip the final measurements and save the probabilities of the measured qubits
+    static_qc = deferred_qc.copy_empty_like()
+    measured_qubits, measured_clbits = [], []
+    for instruction in deferred_qc.data:
+        if instruction.operation.name == "measure":
+            measured_qubits.append(instruction.qubits[0])
+            measured_clbits.append(qc.find_bit(instruction.clbits[0]).index)
+        else:
+            static_qc.append(instruction.operation, instruction.qubits, instruction.clbits)
+    if not measured_qubits:
+        probs = np.zeros(2 ** qc.num_clbits)
+        probs[0] = 1
+        return probs
+    static_qc.save_probabilities(measured_qubits)
+
+    backend = Aer.get_backend('qasm_simulator')
+    with timed_stage("transpile"):
+        executed_circuit = transpile(static_qc, backend)
+    with timed_stage("simulate"):
+        qubit_probs = backend.run(executed_circuit, shots=1).result().data()["probabilities"]
+
+    # Map each outcome of the measured qubits to the integer key of the classical bits
+    indices = np.arange(2 ** len(measured_qubits))
+    keys = np.zeros_like(indices)
+    for position, clbit_index in enumerate(measured_clbits):
+        keys |= ((indices >> position) & 1) << clbit_index
+    return np.bincount(keys, weights=qubit_probs, minlength=2 ** qc.num_clbits)
+
+def circuit_execution(qc: QuantumCircuit, shots: int, defer_measurement: bool = False) -> Counts:
     """
     Execute a quantum circuit on the backend and return the measurement 
-    results as a dictionary.
+    results as ``Counts``.
 
     This function simulates the execution of a quantum circuit on the 
     Qiskit Aer ``qasm_simulator`` backend. The circuit is transpiled 
@@ -12,6 +326,17 @@ def circuit_execution(qc: QuantumCircuit, shots: int) -> dict:
     the resulting measurement outcomes are returned as integer-labeled 
     counts.
 
+    Dynamic circuits (see ``is_dynamic_circuit``) are executed with the 
+    shot-branching of Aer, which branches the simulated state at each 
+    mid-circuit measurement instead of simulating every shot separately.
+
+    The simulator is seeded from the global NumPy generator, so that the 
+    outcomes are reproducible once NumPy is seeded (see ``result_cache.py``). 
+    Within ``circuit_plan``, the circuit is recorded instead of simulated. 
+    The transpilation, simulation and conversion of the counts are timed 
+    as stages of the test case (see ``stage_timing.py``), and the width is 
+    reported to the resource sampler (see ``resource_sampling.py``).
+
     Parameters
     ----------
     qc : QuantumCircuit
@@ -21,19 +346,80 @@ def circuit_execution(qc: QuantumCircuit, shots: int) -> dict:
         Number of repetitions for circuit execution. A larger number 
         of shots yields more accurate probability estimates of the 
         measurement outcomes.
+    defer_measurement : bool, optional
+        Whether to simulate the circuit rewritten by ``defer_measurements``. 
+        The measurement outcomes follow the same distribution, while the 
+        given circuit is kept unchanged for timing and complexity reports.
 
     Returns
     -------
-    dict
-        A dictionary mapping computational basis states (as integers) 
-        to the number of times each state was measured. The keys are 
-        integers representing bitstrings (little-endian convention).
+    Counts
+        A mapping from computational basis states (as integers) to the 
+        number of times each state was measured, backed by an array of 
+        length 2^num_clbits. The keys are integers representing bitstrings 
+        (little-endian convention).
     """
+    if active_circuit_plan() is not None:
+        return active_circuit_plan().record(qc, shots)
+    record_width(qc.num_qubits)
     backend = Aer.get_backend('qasm_simulator')
-    executed_circuit = transpile(qc, backend)
-    count= backend.run(executed_circuit, shots=shots).result().get_counts()
-    dict_counts = count.int_outcomes()
-    return dict_counts
+    if defer_measurement:
+        qc = defer_measurements(qc)
+    run_options = {"shot_branching_enable": True} if is_dynamic_circuit(qc) else {}
+    run_options["seed_simulator"] = int(np.random.randint(2 ** 31))
+    with timed_stage("transpile"):
+        executed_circuit = transpile(qc, backend)
+    with timed_stage("simulate"):
+        count= backend.run(executed_circuit, shots=shots, **run_options).result().get_counts()
+    with timed_stage("parse"):
+        return Counts.from_dict(count.int_outcomes(), qc.num_clbits)
+
+def batch_circuit_execution(
+    qc_list: list[QuantumCircuit],
+    shots: int,
+    defer_measurement: bool = False
+) -> list[Counts]:
+    """
+    Execute a batch of quantum circuits as a single job and return the 
+    measurement results of each circuit.
+
+    Compared with calling ``circuit_execution`` for each circuit, the circuits 
+    are submitted together, so that the simulator can execute them in parallel 
+    and the overhead per job is paid once.
+
+    Parameters
+    ----------
+    qc_list : list[QuantumCircuit]
+        The quantum circuits to be executed.
+    shots : int
+        Number of repetitions for each circuit.
+    defer_measurement : bool, optional
+        Whether to simulate the circuits rewritten by ``defer_measurements``.
+
+    Returns
+    -------
+    list[Counts]
+        The counts of each circuit in the same order as ``qc_list``, with 
+        integer keys as returned by ``circuit_execution``.
+    """
+    if active_circuit_plan() is not None:
+        return [active_circuit_plan().record(qc, shots) for qc in qc_list]
+    record_width(max(qc.num_qubits for qc in qc_list))
+    backend = Aer.get_backend('qasm_simulator')
+    if defer_measurement:
+        qc_list = [defer_measurements(qc) for qc in qc_list]
+    run_options = {"shot_branching_enable": True} if any(map(is_dynamic_circuit, qc_list)) else {}
+    run_options["seed_simulator"] = int(np.random.randint(2 ** 31))
+    # Transpile the circuits one by one, as Aer may derive a reduced basis from a whole list
+    with timed_stage("transpile"):
+        executed_circuits = [transpile(qc, backend) for qc in qc_list]
+    with timed_stage("simulate"):
+        result = backend.run(executed_circuits, shots=shots, **run_options).result()
+    with timed_stage("parse"):
+        return [
+            Counts.from_dict(result.get_counts(index).int_outcomes(), qc.num_clbits)
+            for index, qc in enumerate(qc_list)
+        ]
 
 if __name__ == "__main__":
     """
@@ -54,13 +440,76 @@ if __name__ == "__main__":
         qc.measure(1, 1)     
         return qc
 
+    def test_input_1():
+        # Create a bit-controlled circuit, i.e., bit_controlled_preparation_1MS(n=2, m=2)
+        qc = QuantumCircuit(4, 2)
+        qc.ry(1.911, 0)
+        qc.h(1)
+        for index in range(2, 4):
+            qc.measure(qc.qubits[index - 2], qc.clbits[-1])
+            qc.x(qc.qubits[index]).c_if(qc.clbits[-1], 1)
+        qc.measure(qc.qubits[2:], qc.clbits[:])
+        return qc
+
     # ----------------------------
     # Unit tests 
     # ----------------------------
 
     def unit_test_0(qc, shots):
         dict_counts = circuit_execution(qc, shots)
-        assert isinstance(dict_counts, dict)
+        assert isinstance(dict_counts, Counts)
+        assert dict_counts.num_bits == qc.num_clbits and dict_counts.shots == shots
+        assert set(dict_counts) <= {0, 3}
+
+    def unit_test_1(qc, shots):
+        assert is_dynamic_circuit(qc)
+        deferred_qc = defer_measurements(qc)
+        # The conditioned X gates become CNOTs, and only the final measurements remain
+        assert not is_dynamic_circuit(deferred_qc)
+        assert deferred_qc.count_ops()["cx"] == 2
+        assert deferred_qc.count_ops()["measure"] == 2
+        # The original circuit is kept unchanged
+        assert is_dynamic_circuit(qc)
+
+    def unit_test_2(qc, shots):
+        # Both executions should follow the distribution [1/6, 1/3, 1/6, 1/3]
+        for defer_measurement in [False, True]:
+            dict_counts = circuit_execution(qc, shots, defer_measurement)
+            probs = [dict_counts.get(key, 0) / shots for key in range(4)]
+            assert max(abs(p - q) for p, q in zip(probs, [1/6, 1/3, 1/6, 1/3])) < 0.05
+
+    def unit_test_3(qc, shots):
+        # Split the circuit into the prepared prefix and the final measurements
+        prefix_qc = qc.copy_empty_like()
+        for instruction in qc.data[:-2]:
+            prefix_qc.append(instruction)
+        snapshot_qc = prefix_snapshot(prefix_qc)
+        assert snapshot_qc.count_ops()["set_statevector"] == 1
+        assert not is_dynamic_circuit(snapshot_qc)
+        # The snapshot is reused for the same prefix
+        prefix_snapshot(prefix_qc.copy())
+        assert len(_prefix_snapshots) == 1
+        snapshot_qc.measure(snapshot_qc.qubits[2:], snapshot_qc.clbits[:])
+        dict_counts = circuit_execution(snapshot_qc, shots)
+        probs = [dict_counts.get(key, 0) / shots for key in range(4)]
+        assert max(abs(p - q) for p, q in zip(probs, [1/6, 1/3, 1/6, 1/3])) < 0.05
+
+    def unit_test_4(qc, shots):
+        # A batch returns the counts of each circuit in order
+        dict_counts_list = batch_circuit_execution([test_input_0(), qc], shots)
+        assert len(dict_counts_list) == 2
+        assert set(dict_counts_list[0]) <= {0, 3}
+        probs = [dict_counts_list[1].get(key, 0) / shots for key in range(4)]
+        assert max(abs(p - q) for p, q in zip(probs, [1/6, 1/3, 1/6, 1/3])) < 0.05
+
+    def unit_test_5(qc, shots):
+        # The exact probabilities of the dynamic circuit are [1/6, 1/3, 1/6, 1/3]
+        assert np.allclose(outcome_probabilities(qc), [1/6, 1/3, 1/6, 1/3], atol=1e-3)
+        # The outcomes of an unmeasured classical bit are always 0
+        qc_partial = QuantumCircuit(2, 3)
+        qc_partial.x(1)
+        qc_partial.measure(1, 2)
+        assert np.allclose(outcome_probabilities(qc_partial), np.eye(8)[4])
 
     # ----------------------------
     # Results needing manual check 
@@ -77,6 +526,11 @@ if __name__ == "__main__":
     executed_test = {
         "0": {"input": test_input_0, "shots": 1024, "function": unit_test_0},
         "1": {"input": test_input_0, "shots": 1024, "function": manual_check_0},
+        "2": {"input": test_input_1, "shots": 1024, "function": unit_test_1},
+        "3": {"input": test_input_1, "shots": 10000, "function": unit_test_2},
+        "4": {"input": test_input_1, "shots": 10000, "function": unit_test_3},
+        "5": {"input": test_input_1, "shots": 10000, "function": unit_test_4},
+        "6": {"input": test_input_1, "shots": 10000, "function": unit_test_5},
     }
     for id, execution_dict in executed_test.items():
         print(f"test_id={id}:")
@@ -0,0 +1,214 @@
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator
+
+import numpy as np
+from qiskit import QuantumCircuit
+from qiskit.circuit.library import get_standard_gate_name_mapping
+
+from .data_conversion import Counts
+
+STANDARD_GATE_NAMES = set(get_standard_gate_name_mapping())
+# Instructions that are not charged as gates
+_FREE_INSTRUCTIONS = {"barrier", "measure", "reset", "delay"}
+
+# The plan recording the circuits instead of simulating them, if any
+_active_plan = None
+
+
+def _param_key(param):
+    try:
+        hash(param)
+        return param
+    except TypeError:
+        return repr(param)
+
+
+class CircuitPlan:
+    """
+    A record of the circuits that a dry run would execute, instead of simulating them.
+
+    Each circuit passed to ``circuit_execution``, ``batch_circuit_execution`` or
+    ``outcome_probabilities`` is recorded by its width (i.e., the number of qubits of
+    its statevector), its number of gates (with composite instructions such as the
+    program under test expanded into standard gates) and its shots. The executions
+    return evenly spread counts (or uniform probabilities) instead, so that the
+    testing processes run through, including the repeat-until-success loops. The
+    circuits and the elapsed time of each work item of the testing processes decorated
+    with `journaled` are also recorded per item, see ``item``.
+
+    Example
+    -------
+    >>> plan = CircuitPlan()
+    >>> qc = QuantumCircuit(2, 2)
+    >>> qc.h(0)
+    >>> qc.cx(0, 1)
+    >>> plan.record(qc, 1024)
+    Counts({0: 256, 1: 256, 2: 256, 3: 256})
+    >>> plan.circuits
+    Counter({(2, 2, 1024): 1})
+    """
+
+    def __init__(self):
+        # Map (width, number of gates, shots) to the number of circuits
+        self.circuits = Counter()
+        # Map the key of each work item to its description, circuits and elapsed seconds
+        self.items = {}
+        self._current_item = None
+        self._gate_counts = {}
+
+    @contextmanager
+    def item(self, key: str, item: dict) -> Iterator[dict]:
+        """
+        Attribute the circuits recorded within to a work item.
+        """
+        previous_item = self._current_item
+        self._current_item = self.items.setdefault(key, {"item": item, "circuits": Counter(), "seconds": 0.0})
+        start_time = time.perf_counter()
+        try:
+            yield self._current_item
+        finally:
+            self._current_item["seconds"] += time.perf_counter() - start_time
+            self._current_item = previous_item
+
+    def _add(self, circuit: tuple) -> None:
+        self.circuits[circuit] += 1
+        if self._current_item is not None:
+            self._current_item["circuits"][circuit] += 1
+
+    def _count_gates(self, qc: QuantumCircuit) -> int:
+        num_gates = 0
+        for instruction in qc.data:
+            operation = instruction.operation
+            if operation.name in _FREE_INSTRUCTIONS:
+                continue
+            if operation.name in STANDARD_GATE_NAMES or operation.definition is None:
+                num_gates += 1
+                continue
+            # Composite instructions with the same name, size and parameters share a count
+            key = (
+                operation.name,
+                operation.num_qubits,
+                tuple(_param_key(param) for param in operation.params),
+                getattr(operation, "ctrl_state", None)
+            )
+            if key not in self._gate_counts:
+                self._gate_counts[key] = self._count_gates(operation.definition)
+            num_gates += self._gate_counts[key]
+        return num_gates
+
+    def record(self, qc: QuantumCircuit, shots: int) -> Counts:
+        self._add((qc.num_qubits, self._count_gates(qc), shots))
+        array = np.full(2 ** qc.num_clbits, shots // 2 ** qc.num_clbits, dtype=np.int64)
+        array[:shots % 2 ** qc.num_clbits] += 1
+        return Counts(array)
+
+    def record_probabilities(self, qc: QuantumCircuit) -> np.ndarray:
+        self._add((qc.num_qubits, self._count_gates(qc), 0))
+        return np.full(2 ** qc.num_clbits, 1 / 2 ** qc.num_clbits)
+
+    @property
+    def num_circuits(self) -> int:
+        return sum(self.circuits.values())
+
+    @property
+    def num_shots(self) -> int:
+        return sum(shots * count for (_, _, shots), count in self.circuits.items())
+
+    @property
+    def max_width(self) -> int:
+        return max((width for width, _, _ in self.circuits), default=0)
+
+
+@contextmanager
+def circuit_plan() -> Iterator[CircuitPlan]:
+    """
+    Record the circuits executed within instead of simulating them, and save no results.
+    """
+    global _active_plan
+    previous_plan = _active_plan
+    _active_plan = CircuitPlan()
+    try:
+        yield _active_plan
+    finally:
+        _active_plan = previous_plan
+
+
+def active_circuit_plan() -> CircuitPlan | None:
+    return _active_plan
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the circuit plans.
+    Run:
+        python -m mycode.utils.circuit_plan
+    """
+    from qiskit.circuit.library import QFT
+
+    from .circuit_execution import circuit_execution, outcome_probabilities
+    from .repeat_until_success import repeat_until_success
+    # The executions consult the imported module rather than this script
+    from .circuit_plan import circuit_plan
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_circuit():
+        qc = QuantumCircuit(3, 3)
+        qc.x(0)
+        qc.append(QFT(3), qc.qubits)
+        qc.measure(qc.qubits, qc.clbits)
+        return qc
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_record(qc):
+        with circuit_plan() as plan:
+            counts = circuit_execution(qc, 100)
+            circuit_execution(qc, 100)
+            probs = outcome_probabilities(qc)
+        assert counts.shots == 100 and np.isclose(probs.sum(), 1)
+        # The QFT is expanded into its gates, and the X gate is charged once
+        num_gates = 1 + CircuitPlan()._count_gates(QFT(3).decompose())
+        assert plan.circuits == Counter({(3, num_gates, 100): 2, (3, num_gates, 0): 1})
+        assert plan.num_circuits == 3 and plan.num_shots == 200 and plan.max_width == 3
+
+    def unit_test_items(qc):
+        # The circuits are attributed to the current work item
+        with circuit_plan() as plan:
+            circuit_execution(qc, 10)
+            with plan.item("key", {"process": "toy"}):
+                circuit_execution(qc, 20)
+        assert sum(plan.items["key"]["circuits"].values()) == 1 and plan.num_circuits == 2
+        assert plan.items["key"]["seconds"] > 0
+
+    def unit_test_repeat_until_success(qc):
+        # The repeat-until-success loops terminate upon the evenly spread counts
+        with circuit_plan() as plan:
+            counts = repeat_until_success(qc, 64, [0, 1, 2])
+        assert counts.shots == 64 and plan.num_circuits >= 1
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_circuit, "function": unit_test_record},
+        "1": {"input": test_input_circuit, "function": unit_test_items},
+        "2": {"input": test_input_circuit, "function": unit_test_repeat_until_success},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
@@ -1,4 +1,39 @@
 import csv, os
+from contextlib import contextmanager
+from typing import Iterator
+
+from .circuit_plan import active_circuit_plan
+
+# The directory replacing the repository root of the saved data, if any
+_saving_root = None
+
+@contextmanager
+def saving_root(root_dir: str) -> Iterator[str]:
+    """
+    Save the raw data under another root directory instead of the repository.
+
+    Within this context, ``RQ_saving_dir`` (and therefore the CSV files, the 
+    checkpoint journals and the profiles of the experiments) points to 
+    ``<root_dir>/data(toy)/...`` or ``<root_dir>/data/...``, e.g., so that the 
+    benchmarks (see `mycode/bench`) never overwrite the results of the experiments.
+
+    Parameters
+    ----------
+    root_dir : str
+        The root directory replacing the repository.
+
+    Example
+    -------
+    >>> with saving_root(tempfile.mkdtemp()):
+    ...     run_experiment("toy", False)
+    """
+    global _saving_root
+    previous_root = _saving_root
+    _saving_root = os.path.abspath(root_dir)
+    try:
+        yield _saving_root
+    finally:
+        _saving_root = previous_root
 
 def RQ_saving_dir(
     rq_name: str | int,
@@ -11,7 +46,8 @@ def RQ_saving_dir(
     This function constructs a standardized saving path based on the 
     research question (RQ) identifier, program name, and repetition mode.
     If ``rq_name`` is an integer, it is automatically converted to the 
-    format ``RQ{number}``.
+    format ``RQ{number}``. The repository root is replaced by the directory 
+    of ``saving_root``, if any.
 
     Parameters
     ----------
@@ -31,7 +67,7 @@ def RQ_saving_dir(
     """
     if isinstance(rq_name, int):
         rq_name = f"RQ{rq_name}"
-    root_dir = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+    root_dir = _saving_root or os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
     
     if rep_mode == "toy":
         folder_name = f"data({rep_mode})"
@@ -74,7 +110,8 @@ def csv_saving(
 
     This function ensures the save directory exists, constructs a 
     standardized filename using ``RQ_saving_name``, and writes the given 
-    header and data into the CSV file.
+    header and data into the CSV file. Nothing is saved during a dry run, 
+    i.e., within ``circuit_plan``.
 
     Parameters
     ----------
@@ -97,6 +134,9 @@ def csv_saving(
     -------
     None
     """
+    if active_circuit_plan() is not None:
+        return
+
     # Ensure the save directory exists
     os.makedirs(save_dir, exist_ok=True)
 
@@ -170,6 +210,12 @@ if __name__ == "__main__":
         assert "RQ2" in res
         assert "TestProgram" in res
         assert "data(toy)" in res
+        # The root directory can be replaced, e.g., by the benchmarks
+        tmp_dir = tempfile.mkdtemp()
+        with saving_root(tmp_dir):
+            assert RQ_saving_dir(**args).startswith(os.path.join(tmp_dir, "data(toy)"))
+        assert RQ_saving_dir(**args) == res
+        shutil.rmtree(tmp_dir)
 
     def unit_test_rq_saving_name(args):
         res = RQ_saving_name(**args)
@@ -1,6 +1,14 @@
+import operator
+from collections.abc import Mapping
+from itertools import product
+from typing import Iterator
+
 import numpy as np
+
+from .stage_timing import timed_stage
  
 
+@timed_stage("input")
 def generate_numbers(n: int, m: int) -> list[list]:
     """
     Generate all possible n-digit numbers in base-m representation.
@@ -13,6 +21,10 @@ def generate_numbers(n: int, m: int) -> list[list]:
         list[list[int]]: A list of all n-digit m-ary numbers.
                          Each number is represented as a list of integers.
 
+    Notes:
+        - The numbers are built from `generate_number_array` rather than recursively.
+          Use `iter_numbers` to avoid materializing all m^n numbers.
+
     Example:
         >>> generate_numbers(3, 2)
         [[0, 0, 0],
@@ -24,34 +36,274 @@ def generate_numbers(n: int, m: int) -> list[list]:
          [1, 1, 0],
          [1, 1, 1]]
     """
+    return generate_number_array(n, m).tolist()
+
+
+def iter_numbers(n: int, m: int) -> Iterator[list[int]]:
+    """
+    Lazily iterate over all n-digit numbers in base-m representation.
 
+    Args:
+        n (int): The number of digits.
+        m (int): The base.
+
+    Yields:
+        list[int]: The digits of each number, most significant first, in the same 
+                   order as `generate_numbers`.
+
+    Notes:
+        - Only the building of each number is timed as the `input` stage, not the
+          work done by the caller between two numbers.
+
+    Example:
+        >>> list(iter_numbers(2, 2))
+        [[0, 0], [0, 1], [1, 0], [1, 1]]
+    """
+    numbers = product(range(m), repeat=max(n, 0))
+    while True:
+        with timed_stage("input"):
+            digits = next(numbers, None)
+            number = None if digits is None else list(digits)
+        if number is None:
+            return
+        yield number
+
+
+@timed_stage("input")
+def generate_number_array(n: int, m: int) -> np.ndarray:
+    """
+    Generate all n-digit numbers in base-m representation as a NumPy array.
+
+    Args:
+        n (int): The number of digits.
+        m (int): The base, no more than 256.
+
+    Returns:
+        numpy.ndarray: A (m^n, n) uint8 array, whose i-th row holds the digits of i, 
+                       most significant first, as in `generate_numbers`.
+
+    Example:
+        >>> generate_number_array(2, 3)[:4]
+        array([[0, 0],
+               [0, 1],
+               [0, 2],
+               [1, 0]], dtype=uint8)
+    """
     if n <= 0:
-        return [[]]  # base case: return an empty list when no digits are required
+        return np.zeros((1, 0), dtype=np.uint8)
+    place_values = m ** np.arange(n - 1, -1, -1, dtype=np.int64)
+    return (np.arange(m ** n, dtype=np.int64)[:, None] // place_values % m).astype(np.uint8)
 
-    if n == 1:
-        return [[i] for i in range(m)]  # base case: single-digit m-ary numbers
 
-    # Recursive case:
-    # First, generate all (n-1)-digit m-ary numbers
-    smaller_numbers = generate_numbers(n - 1, m)
+def index2bits(indices: int | np.ndarray, n: int) -> np.ndarray:
+    """
+    Convert integers into their little-endian bit rows, i.e., bit j is the j-th qubit.
 
-    # Then, prepend each possible digit (0..m-1) to the smaller numbers
-    number_list = []
-    for digit in range(m):
-        for smaller_number in smaller_numbers:
-            number_list.append([digit] + smaller_number)
+    Args:
+        indices (int | numpy.ndarray): The integers to convert.
+        n (int): The number of bits.
 
-    return number_list
+    Returns:
+        numpy.ndarray: A uint8 array with shape `indices.shape + (n,)`.
 
+    Example:
+        >>> index2bits([1, 6], 3)
+        array([[1, 0, 0],
+               [0, 1, 1]], dtype=uint8)
+    """
+    indices = np.asarray(indices, dtype=np.int64)
+    return ((indices[..., None] >> np.arange(n)) & 1).astype(np.uint8)
+
+
+def bits2index(bits: np.ndarray) -> np.ndarray:
+    """
+    Convert little-endian bit rows back into integers, i.e., the inverse of `index2bits`.
+
+    Args:
+        bits (numpy.ndarray): An array whose last axis holds the bits, least significant first.
+
+    Returns:
+        numpy.ndarray: The integers with shape `bits.shape[:-1]`.
+
+    Example:
+        >>> bits2index([[1, 0, 0], [0, 1, 1]])
+        array([1, 6])
+    """
+    bits = np.asarray(bits, dtype=np.int64)
+    return bits @ (1 << np.arange(bits.shape[-1], dtype=np.int64))
 
-def outputdict2probs(output_dic: dict[int, int], n: int) -> np.ndarray:
+
+class Counts(Mapping):
+    """
+    Measurement counts stored in a contiguous array indexed by the integer outcomes.
+
+    A `Counts` object is a read-only mapping from the outcomes observed at least once 
+    to their counts, so that it can be used wherever the `int_outcomes()` dictionaries 
+    of Qiskit were used, e.g., `counts.items()` or `counts.get(key, 0)`. Meanwhile, the 
+    conversions into samples or probabilities and the operations below act on the 
+    whole array, without allocating a Python object per shot or per outcome.
+
+    Args:
+        array (array-like): The counts of all the 2^s outcomes of s classical bits, 
+                            where index i is the outcome with bitstring i (little-endian).
+
+    Raises:
+        ValueError: If the length of `array` is not a power of 2.
+
+    Example:
+        >>> counts = Counts.from_dict({0: 2, 3: 1}, 2)
+        >>> counts.array
+        array([2, 0, 0, 1])
+        >>> dict(counts >> 1)   # Discard the least significant bit
+        {0: 2, 1: 1}
+    """
+    __slots__ = ("array",)
+
+    def __init__(self, array: np.ndarray | list[int]):
+        array = np.ascontiguousarray(array, dtype=np.int64)
+        if array.ndim != 1 or array.size == 0 or array.size & (array.size - 1):
+            raise ValueError(f"The counts should be a 1D array of length 2^s, got shape {array.shape}")
+        self.array = array
+
+    @classmethod
+    def from_dict(cls, dict_counts: Mapping[int, int], num_bits: int | None = None) -> "Counts":
+        """
+        Build the counts from a dictionary mapping the integer outcomes to their counts.
+
+        Args:
+            dict_counts (Mapping[int, int]): The counts, e.g., from `int_outcomes()`.
+            num_bits (int | None): The number of classical bits, derived from the 
+                                   largest outcome if None.
+
+        Returns:
+            Counts: The counts of the 2^num_bits outcomes.
+        """
+        keys = np.fromiter(dict_counts.keys(), dtype=np.int64, count=len(dict_counts))
+        values = np.fromiter(dict_counts.values(), dtype=np.int64, count=len(dict_counts))
+        if num_bits is None:
+            num_bits = int(keys.max()).bit_length() if keys.size else 0
+        array = np.zeros(2 ** num_bits, dtype=np.int64)
+        np.add.at(array, keys, values)
+        return cls(array)
+
+    @property
+    def num_bits(self) -> int:
+        return self.array.size.bit_length() - 1
+
+    @property
+    def shots(self) -> int:
+        return int(self.array.sum())
+
+    def __getitem__(self, key: int) -> int:
+        index = operator.index(key)
+        if 0 <= index < self.array.size and self.array[index] > 0:
+            return int(self.array[index])
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(np.flatnonzero(self.array).tolist())
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.array))
+
+    def __repr__(self) -> str:
+        return f"Counts({dict(self.items())})"
+
+    def samples(self) -> np.ndarray:
+        """
+        Expand the counts into the array of raw samples in ascending order.
+        """
+        return np.repeat(np.arange(self.array.size), self.array)
+
+    def probs(self) -> np.ndarray:
+        """
+        Normalize the counts into the probabilities of the 2^s outcomes.
+        """
+        return self.array / self.array.sum()
+
+    def marginal(self, bits: list[int]) -> "Counts":
+        """
+        Keep the given classical bits, where `bits[j]` becomes the j-th bit of the outcomes.
+
+        Args:
+            bits (list[int]): The indices of the kept bits.
+
+        Returns:
+            Counts: The marginal counts of the 2^len(bits) outcomes.
+
+        Example:
+            >>> dict(Counts.from_dict({1: 2, 6: 1}, 3).marginal([2, 0]))
+            {1: 1, 2: 2}
+        """
+        outcomes = np.arange(self.array.size)
+        marginal_outcomes = np.zeros_like(outcomes)
+        for position, bit in enumerate(bits):
+            marginal_outcomes |= ((outcomes >> bit) & 1) << position
+        return Counts(np.bincount(
+            marginal_outcomes, weights=self.array, minlength=2 ** len(bits)
+        ).astype(np.int64))
+
+    def shift(self, num_bits: int) -> "Counts":
+        """
+        Discard the lowest `num_bits` bits, i.e., map each outcome `key` to `key >> num_bits`.
+        """
+        if not 0 <= num_bits <= self.num_bits:
+            raise ValueError(f"Cannot discard {num_bits} bits of {self.num_bits}-bit counts")
+        return Counts(self.array.reshape(-1, 2 ** num_bits).sum(axis=1))
+
+    __rshift__ = shift
+
+    def merge(self, other: "Counts | Mapping[int, int]") -> "Counts":
+        """
+        Add up two counts, e.g., of the executions of the same circuit.
+        """
+        if not isinstance(other, Counts):
+            other = Counts.from_dict(other)
+        array = np.zeros(max(self.array.size, other.array.size), dtype=np.int64)
+        array[:self.array.size] += self.array
+        array[:other.array.size] += other.array
+        return Counts(array)
+
+    __add__ = merge
+
+    def resample(self, shots: int, replace: bool = False) -> "Counts":
+        """
+        Draw `shots` samples from the counts.
+
+        Args:
+            shots (int): The number of samples.
+            replace (bool): Whether to draw with replacement, i.e., from the observed 
+                            frequencies. By default, the samples are drawn without 
+                            replacement, so that they remain independent samples of the 
+                            underlying distribution.
+
+        Returns:
+            Counts: The counts of the drawn samples.
+
+        Raises:
+            ValueError: If more samples than the counts hold are drawn without replacement.
+        """
+        if replace:
+            return Counts(np.random.multinomial(shots, self.probs()))
+        if shots > self.shots:
+            raise ValueError(f"Cannot draw {shots} samples from {self.shots} without replacement")
+        if shots == self.shots:
+            return Counts(self.array.copy())
+        # Seed from the global state, so that np.random.seed still applies
+        rng = np.random.default_rng(np.random.randint(2 ** 32, dtype=np.uint64))
+        return Counts(rng.multivariate_hypergeometric(self.array, shots))
+
+
+@timed_stage("parse")
+def outputdict2probs(output_dic: dict[int, int] | Counts, n: int) -> np.ndarray:
     """
     Convert raw measurement outcomes into a normalized probability distribution.
 
     Args:
-        output_dic (dict[int, int]): 
+        output_dic (dict[int, int] | Counts): 
             Dictionary mapping measurement outcomes (as integers) to their counts.  
             For example, {0: 5, 3: 7} means outcome |00> occurred 5 times, |11> occurred 7 times.
+            A `Counts` of n bits is normalized directly.
         n (int): 
             Number of qubits. Defines the dimension of the Hilbert space (2**n outcomes).
 
@@ -73,37 +325,38 @@ def outputdict2probs(output_dic: dict[int, int], n: int) -> np.ndarray:
         array([0.5, 0. , 0. , 0.5])  # corresponds to |00>, |01>, |10>, |11>
     """
 
-    # Convert Qiskit counts object to dictionary {int_outcome: frequency}
-    total_shots = sum(output_dic.values())
-    prob_dist = np.zeros(2**n, dtype=float)
-    for outcome, count in output_dic.items():
-        prob_dist[outcome] = count / total_shots
+    if isinstance(output_dic, Counts) and output_dic.num_bits == n:
+        return output_dic.probs()
 
-    return prob_dist
+    # Scatter the counts {int_outcome: frequency} into the array
+    counts = Counts.from_dict(output_dic, n).array
+    return counts / counts.sum()
 
-def outputdict2samps(dict_counts: dict[int, int]) -> list[int]:
+@timed_stage("parse")
+def outputdict2samps(dict_counts: dict[int, int] | Counts) -> np.ndarray:
     """
-    Expand a dictionary of outcome counts into a list of raw samples.
+    Expand a dictionary of outcome counts into an array of raw samples.
 
     Args:
-        dict_counts (dict[int, int]):
+        dict_counts (dict[int, int] | Counts):
             A dictionary mapping outcome (as an integer) to the number of times 
             it was observed. Typically derived from Qiskit measurement results.
 
     Returns:
-        list[int]:
-            A flat list of samples, where each outcome is repeated according to its frequency.
+        numpy.ndarray:
+            A flat array of samples, where each outcome is repeated according to its frequency.
 
     Example:
         >>> dict_counts = {0: 2, 3: 1}
         >>> outputdict2samps(dict_counts)
-        [0, 0, 3]
+        array([0, 0, 3])
     """
-    samps = []
+    if isinstance(dict_counts, Counts):
+        return dict_counts.samples()
     # Expand counts: repeat each outcome `value` times
-    for key, value in dict_counts.items():
-        samps += [key] * value
-    return samps
+    keys = np.fromiter(dict_counts.keys(), dtype=np.int64, count=len(dict_counts))
+    values = np.fromiter(dict_counts.values(), dtype=np.int64, count=len(dict_counts))
+    return np.repeat(keys, values)
 
 def covered_pure_states(probs: list[float]) -> list[int]:
     """
@@ -128,6 +381,26 @@ def covered_pure_states(probs: list[float]) -> list[int]:
             covered_states.append(idx)
     return covered_states
 
+def to_json(obj):
+    """
+    Convert an object unsupported by `json` (e.g., NumPy arrays and scalars), to be
+    passed as the `default` of `json.dump` and `json.dumps`.
+
+    Args:
+        obj: The object to convert.
+
+    Returns:
+        The Python counterpart of a NumPy object, or the representation of any other object.
+
+    Example:
+        >>> json.dumps({"angles": np.array([0.5, 1.0])}, default=to_json)
+        '{"angles": [0.5, 1.0]}'
+    """
+    # NumPy arrays and scalars are stored as their Python counterparts
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    return repr(obj)
+
 if __name__ == "__main__":
     """
     Unit / Integration Testing for helper functions.
@@ -151,6 +424,9 @@ if __name__ == "__main__":
 
     def test_input_covered_states():
         return {"probs": [0.0, 0.2, 0.0, 0.8]}
+
+    def test_input_counts():
+        return {"dict": {1: 2, 6: 1, 7: 3}, "num_bits": 3}
     
     # ------------------------
     # Unit Tests
@@ -197,6 +473,53 @@ if __name__ == "__main__":
         covered = covered_pure_states(inp["probs"])
         assert covered == [1, 3]
 
+    def unit_test_number_array(inp):
+        n, m = inp["n"], inp["m"]
+        # The array, lazy and list variants enumerate the same numbers in order
+        for n, m in [(n, m), (3, 3), (0, 2)]:
+            number_array = generate_number_array(n, m)
+            assert number_array.shape == (m ** n, n)
+            assert number_array.dtype == np.uint8
+            assert number_array.tolist() == list(iter_numbers(n, m)) == generate_numbers(n, m)
+
+    def unit_test_index_bits(inp):
+        n = 12
+        indices = np.arange(2 ** n)
+        bits = index2bits(indices, n)
+        assert bits.shape == (2 ** n, n)
+        assert np.array_equal(bits2index(bits), indices)
+        # The reversed rows of generate_number_array are little-endian bit rows
+        assert np.array_equal(bits2index(generate_number_array(n, 2)[:, ::-1]), indices)
+
+    def unit_test_counts(inp):
+        counts = Counts.from_dict(inp["dict"], inp["num_bits"])
+        # The counts behave as the dictionary of the nonzero outcomes
+        assert counts == inp["dict"] and len(counts) == 3
+        assert counts.get(1, 0) == 2 and counts.get(2, 0) == 0 and 2 not in counts
+        assert counts.shots == 6 and counts.num_bits == 3
+        assert np.array_equal(counts.samples(), [1, 1, 6, 7, 7, 7])
+        assert np.allclose(counts.probs(), outputdict2probs(inp["dict"], 3))
+        # Discarding the low bits agrees with mapping each key to key >> 1
+        assert dict(counts >> 1) == {0: 2, 3: 4}
+        assert dict(counts.marginal([1, 2])) == {0: 2, 3: 4}
+        assert dict(counts.marginal([0])) == {1: 5, 0: 1}
+        assert dict(counts + {0: 1}) == {0: 1, 1: 2, 6: 1, 7: 3}
+        # Resampling without replacement keeps a sub-multiset of the samples
+        resampled = counts.resample(4)
+        assert resampled.shots == 4 and np.all(resampled.array <= counts.array)
+        assert counts.resample(100, replace=True).shots == 100
+        try:
+            Counts([1, 2, 3])
+            assert False
+        except ValueError:
+            pass
+
+    def unit_test_to_json(inp):
+        import json
+        # NumPy objects become their Python counterparts, and the others their representations
+        assert json.dumps([np.arange(2), np.int64(3), np.float64(0.5)], default=to_json) == "[[0, 1], 3, 0.5]"
+        assert json.loads(json.dumps({"set": {1}}, default=to_json)) == {"set": "{1}"}
+
     # ------------------------
     # Integration Tests
     # ------------------------
@@ -258,6 +581,22 @@ if __name__ == "__main__":
         "5": {
             "input": lambda: None,
             "function": integration_test_generate_and_check,
+        },
+        "6": {
+            "input": test_input_generate_numbers,
+            "function": unit_test_number_array,
+        },
+        "7": {
+            "input": test_input_generate_numbers,
+            "function": unit_test_index_bits,
+        },
+        "8": {
+            "input": test_input_counts,
+            "function": unit_test_counts,
+        },
+        "9": {
+            "input": lambda: None,
+            "function": unit_test_to_json,
         }
     }
 
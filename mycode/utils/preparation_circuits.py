@@ -1,11 +1,18 @@
 import math
-from qiskit.circuit import QuantumCircuit
-from qiskit.circuit.library import RYGate 
-from qiskit import QuantumCircuit
+from functools import lru_cache
+from typing import Literal
+from qiskit.circuit import QuantumCircuit, QuantumRegister, ClassicalRegister, Instruction, ControlledGate
+from qiskit.circuit.library import RYGate, XGate
+from qiskit.quantum_info import Statevector
+from qiskit import QuantumCircuit, transpile
+from qiskit_aer import Aer
+from qiskit_aer.library import SetStatevector
 import numpy as np
 
 from .circuit_execution import circuit_execution
+from .stage_timing import timed_stage
 
+@timed_stage("build")
 def separable_control_state_preparation(theta_list: list[float]) -> QuantumCircuit:
     """
     Prepare separable (product) control states based on a list of rotation angles.
@@ -95,6 +102,30 @@ def separable_control_state_probs(theta_list: list[float]) -> list[float]:
     output_probs = final_state ** 2
     return output_probs.tolist()
 
+@lru_cache(maxsize=None)
+def controlled_ry_gate(theta: float, num_ctrl_qubits: int) -> ControlledGate:
+    """
+    Return the multi-controlled gate ``RYGate(theta).control(num_ctrl_qubits)``.
+
+    The gates are memoised, so that the definition of a controlled RY gate is 
+    synthesized once and shared by all circuits using the same angle and number 
+    of controls. The returned gate must not be modified in place (e.g., via ``c_if``).
+
+    Parameters
+    ----------
+    theta : float
+        The rotation angle of the RY gate.
+    num_ctrl_qubits : int
+        The number of control qubits.
+
+    Returns
+    -------
+    ControlledGate
+        The controlled RY gate acting on ``num_ctrl_qubits + 1`` qubits.
+    """
+    return RYGate(theta).control(num_ctrl_qubits)
+
+@timed_stage("build")
 def entangled_control_state_preparation(theta_list: list) -> QuantumCircuit:
     """
     Prepare an entangled control state according to the given rotation angles.
@@ -151,15 +182,164 @@ def entangled_control_state_preparation(theta_list: list) -> QuantumCircuit:
                 # If some qubits correspond to '0', apply X gates before/after control
                 if qubit_index_j:
                     qc.x(qubit_index_j)
-                    qc.append(RYGate(theta_list[theta_index]).control(i), qubit_index_i)
+                    qc.append(controlled_ry_gate(theta_list[theta_index], i), qubit_index_i)
                     qc.x(qubit_index_j)
                 else:
-                    qc.append(RYGate(theta_list[theta_index]).control(i), qubit_index_i)
+                    qc.append(controlled_ry_gate(theta_list[theta_index], i), qubit_index_i)
 
                 theta_index += 1
 
     return qc
 
+@timed_stage("build")
+def multiplexed_control_state_preparation(theta_list: list) -> QuantumCircuit:
+    """
+    Prepare the same entangled control state as ``entangled_control_state_preparation``
+    by means of uniformly controlled (multiplexed) RY rotations.
+
+    For the i-th qubit, the 2^i rotations conditioned on the values of the lower
+    i qubits are merged into one multiplexed RY, which is decomposed into 2^i
+    single-qubit RY gates interleaved with 2^i CNOTs visited in Gray-code order.
+    Preparing m control qubits therefore costs 2^m - 2 CNOTs in total, instead of
+    2^m - 1 multi-controlled RY gates wrapped by X gates.
+
+    Parameters
+    ----------
+    theta_list : list[float]
+        A list of (2^m - 1) angles for RY rotation gates, ordered in the same way
+        as for ``entangled_control_state_preparation``, i.e., the angle of the
+        i-th qubit conditioned on the lower qubits being ``j`` (little-endian) is
+        ``theta_list[2^i - 1 + j]``.
+
+    Returns
+    -------
+    QuantumCircuit
+        A quantum circuit that prepares the desired entangled control state.
+
+    Example
+    -------
+    >>> theta_list = [2 * math.pi / 3, math.pi / 6, math.pi / 3]
+    >>> qc = multiplexed_control_state_preparation(theta_list)
+    >>> print(qc)
+
+    Example circuit::
+
+         ┌──────────┐
+    q_0: ┤ Ry(2π/3) ├──■─────────────────■──
+         ├─────────┬┘┌─┴─┐┌───────────┐┌─┴─┐
+    q_1: ┤ Ry(π/4) ├─┤ X ├┤ Ry(-π/12) ├┤ X ├
+         └─────────┘ └───┘└───────────┘└───┘
+    """
+    # Determine the number of control qubits m from the length of theta_list
+    m = int(math.log2(len(theta_list) + 1))
+    qc = QuantumCircuit(m)
+
+    for i in range(m):
+        # Angles of the i-th qubit, indexed by the values of the lower i qubits
+        alphas = np.asarray(theta_list[2**i - 1: 2**(i + 1) - 1], dtype=float)
+        if i == 0:
+            qc.ry(alphas[0], 0)
+            continue
+
+        # Gray codes g_l = l ^ (l >> 1) decide which control flips between rotations
+        gray_codes = [l ^ (l >> 1) for l in range(2**i)]
+
+        # alphas = M @ thetas with M[j, l] = (-1)^{popcount(j & g_l)}, and M^T M = 2^i I
+        signs = np.array([
+            [(-1) ** bin(j & g).count("1") for g in gray_codes]
+            for j in range(2**i)
+        ])
+        thetas = signs.T @ alphas / 2**i
+
+        for l, theta in enumerate(thetas):
+            qc.ry(theta, i)
+            # The control flipped between the l-th and (l+1)-th Gray codes (cyclically)
+            changed_bit = gray_codes[l] ^ gray_codes[(l + 1) % 2**i]
+            qc.cx(changed_bit.bit_length() - 1, i)
+
+    return qc
+
+@timed_stage("build")
+def control_state_preparation(
+    theta_list: list,
+    con_pre_mode: Literal["sep", "ent"],
+    ent_synthesis: Literal["multi_controlled", "multiplexed"] = "multi_controlled"
+) -> QuantumCircuit:
+    """
+    Dispatch the preparation of the control state according to the given modes.
+
+    Parameters
+    ----------
+    theta_list : list[float]
+        Rotation angles of the control state.
+    con_pre_mode : {"sep", "ent"}
+        Prepare a separable (``"sep"``) or an entangled (``"ent"``) control state.
+    ent_synthesis : {"multi_controlled", "multiplexed"}, optional
+        The synthesis of entangled control states, either the multi-controlled RY
+        gates of ``entangled_control_state_preparation`` (default) or the uniformly
+        controlled rotations of ``multiplexed_control_state_preparation``. It is
+        ignored for separable control states.
+
+    Returns
+    -------
+    QuantumCircuit
+        The quantum circuit preparing the control state.
+    """
+    if con_pre_mode == "sep":
+        return separable_control_state_preparation(theta_list)
+    elif con_pre_mode == "ent":
+        if ent_synthesis == "multi_controlled":
+            return entangled_control_state_preparation(theta_list)
+        elif ent_synthesis == "multiplexed":
+            return multiplexed_control_state_preparation(theta_list)
+        raise ValueError(f"Unknown synthesis of entangled control states: {ent_synthesis}")
+    raise ValueError(f"Unknown control state preparation mode: {con_pre_mode}")
+
+@timed_stage("build")
+@lru_cache(maxsize=None)
+def cached_control_state_preparation(
+    con_pre_mode: Literal["sep", "ent"],
+    theta_tuple: tuple[float, ...],
+    ent_synthesis: Literal["multi_controlled", "multiplexed"] = "multi_controlled",
+    transpiled: bool = False
+) -> Instruction:
+    """
+    Memoised factory of control-state preparations keyed by the mode and the angles.
+
+    The angle list of a test suite is fixed, whereas the control state used to be 
+    rebuilt for each classical input and each repeat. This factory builds the 
+    preparation once via ``control_state_preparation`` and returns it as a reusable 
+    instruction. Optionally, the sub-circuit is transpiled for the simulator before
+    being converted, so that the transpilation of each full circuit gets cheaper.
+
+    Parameters
+    ----------
+    con_pre_mode : {"sep", "ent"}
+        Prepare a separable (``"sep"``) or an entangled (``"ent"``) control state.
+    theta_tuple : tuple[float, ...]
+        Rotation angles of the control state (a tuple, so as to be hashable).
+    ent_synthesis : {"multi_controlled", "multiplexed"}, optional
+        The synthesis of entangled control states.
+    transpiled : bool, optional
+        If True, transpile the sub-circuit for the ``qasm_simulator`` backend.
+
+    Returns
+    -------
+    Instruction
+        The instruction preparing the control state on ``m`` qubits. The same object 
+        is returned for the same arguments, so it must not be modified in place.
+
+    Example
+    -------
+    >>> angle_list = [math.pi / 2, math.pi / 2]
+    >>> qc_con = cached_control_state_preparation("sep", tuple(angle_list))
+    >>> qc.append(qc_con, qc.qubits[:2])
+    """
+    qc_con = control_state_preparation(list(theta_tuple), con_pre_mode, ent_synthesis)
+    if transpiled:
+        qc_con = transpile(qc_con, Aer.get_backend('qasm_simulator'))
+    return qc_con.to_instruction()
+
 def circuit_test(qc: QuantumCircuit, shots: int) -> dict:
     """
     Execute a quantum circuit and return the resulting measurement probability distribution.
@@ -201,6 +381,7 @@ def circuit_test(qc: QuantumCircuit, shots: int) -> dict:
 
     return count_dict
 
+@timed_stage("build")
 def bit_controlled_preparation_2MS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
     """
     Prepare a mixed quantum state controlled by classical measurement bits.
@@ -263,6 +444,7 @@ def bit_controlled_preparation_2MS(n: int, m: int, qc: QuantumCircuit) -> Quantu
         qc.x(qc.qubits[index]).c_if(qc.clbits[-1], 1)
     return qc
 
+@timed_stage("build")
 def qubit_controlled_preparation_2MS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
     """
     Prepare a mixed quantum state controlled directly by qubits.
@@ -326,6 +508,161 @@ def qubit_controlled_preparation_2MS(n: int, m: int, qc: QuantumCircuit) -> Quan
         qc.measure(qc.qubits[i], qc.clbits[-1])
     return qc
 
+def top_qubits_preparation_kMS(n: int, m: int, k: int, top_val: int, qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Prepare the top k target qubits in the basis state |top_val⟩.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits, located at qubits m to m + n - 1.
+    m : int
+        Number of control qubits.
+    k : int
+        Number of the top target qubits fixed by ``top_val``.
+    top_val : int
+        Value of the top k target qubits, ranging from 0 to 2^k - 1.
+    qc : QuantumCircuit
+        The quantum circuit to which the X gates will be applied.
+
+    Returns
+    -------
+    QuantumCircuit
+        The input circuit with the top k target qubits prepared.
+    """
+    for bit in range(k):
+        if (top_val >> bit) & 1:
+            qc.x(m + n - k + bit)
+    return qc
+
+@timed_stage("build")
+def bit_controlled_preparation_kMS(n: int, m: int, k: int, top_val: int, qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Prepare one of the 2^k mixed states split on the top k qubits, controlled by 
+    classical measurement bits.
+
+    This function generalizes ``bit_controlled_preparation_2MS``. The input domain 
+    of the `n` target qubits is split into 2^k blocks by the top k qubits, and the 
+    ``top_val``-th mixed state covers the block whose top k qubits equal ``top_val``:
+
+    .. math::
+        ρ_t = 1 / 2^(n-k) * Σ_{j=0}^{2^(n-k)-1} |t·2^(n-k) + j⟩⟨t·2^(n-k) + j|
+
+    where the low n - k target qubits are flipped according to the measurement 
+    outcomes of the control qubits. For k = 1, the two mixed states are the same 
+    as those of the 2MS mode.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits used to construct the mixed state.
+    m : int
+        Number of control qubits, which should be no less than n - k.
+    k : int
+        Number of the top target qubits splitting the input domain.
+    top_val : int
+        Index of the mixed state, i.e., the value of the top k target qubits.
+    qc : QuantumCircuit
+        The quantum circuit to which the controlled mixed-state preparation 
+        will be applied.
+
+    Returns
+    -------
+    QuantumCircuit
+        The input circuit with the additional operations implementing 
+        bit-controlled mixed-state preparation.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(6, 6)  # n=3 target qubits, m=3 control qubits
+    >>> qc = bit_controlled_preparation_kMS(n=3, m=3, k=2, top_val=2, qc=qc)
+    >>> print(qc)
+
+    Example circuit (n=3, m=3, k=2, top_val=2)::
+
+                      ┌─┐
+            q_0: ─────┤M├───────────
+                      └╥┘
+            q_1: ──────╫────────────
+                       ║
+            q_2: ──────╫────────────
+                       ║    ┌───┐
+            q_3: ──────╫────┤ X ├───
+                       ║    └─╥─┘
+            q_4: ──────╫──────╫─────
+                 ┌───┐ ║      ║
+            q_5: ┤ X ├─╫──────╫─────
+                 └───┘ ║ ┌────╨────┐
+            c: 6/══════╩═╡ c_5=0x1 ╞
+                       5 └─────────┘
+    """
+    qc = top_qubits_preparation_kMS(n, m, k, top_val, qc)
+    for index in range(m, n + m - k):
+        qc.measure(qc.qubits[index - m], qc.clbits[-1])
+        qc.x(qc.qubits[index]).c_if(qc.clbits[-1], 1)
+    return qc
+
+@timed_stage("build")
+def qubit_controlled_preparation_kMS(n: int, m: int, k: int, top_val: int, qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Prepare one of the 2^k mixed states split on the top k qubits, controlled 
+    directly by qubits.
+
+    This function generalizes ``qubit_controlled_preparation_2MS`` and prepares the 
+    same mixed states as ``bit_controlled_preparation_kMS`` via CNOT gates.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits used to construct the mixed state.
+    m : int
+        Number of control qubits, which should be no less than n - k.
+    k : int
+        Number of the top target qubits splitting the input domain.
+    top_val : int
+        Index of the mixed state, i.e., the value of the top k target qubits.
+    qc : QuantumCircuit
+        The quantum circuit to which the qubit-controlled mixed-state 
+        preparation will be applied.
+
+    Returns
+    -------
+    QuantumCircuit
+        The input circuit with the additional operations implementing 
+        qubit-controlled mixed-state preparation.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(6, 6)  # n=3 target qubits, m=3 control qubits
+    >>> qc = qubit_controlled_preparation_kMS(n=3, m=3, k=2, top_val=2, qc=qc)
+    >>> print(qc)
+
+    Example circuit (n=3, m=3, k=2, top_val=2)::
+
+                      ┌─┐
+            q_0: ──■──┤M├
+                   │  └╥┘
+            q_1: ──┼───╫─
+                   │   ║
+            q_2: ──┼───╫─
+                 ┌─┴─┐ ║
+            q_3: ┤ X ├─╫─
+                 └───┘ ║
+            q_4: ──────╫─
+                 ┌───┐ ║
+            q_5: ┤ X ├─╫─
+                 └───┘ ║
+            c: 6/══════╩═
+                       5
+    """
+    qc = top_qubits_preparation_kMS(n, m, k, top_val, qc)
+    for index in range(m, n + m - k):
+        qc.cx(qc.qubits[index - m], qc.qubits[index])
+    for i in range(n - k):
+        qc.measure(qc.qubits[i], qc.clbits[-1])
+    return qc
+
+@timed_stage("build")
 def bit_controlled_preparation_1MS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
     """
     Prepare a single mixed quantum state controlled by classical measurement bits.
@@ -383,6 +720,7 @@ def bit_controlled_preparation_1MS(n: int, m: int, qc: QuantumCircuit) -> Quantu
         qc.x(qc.qubits[index]).c_if(qc.clbits[-1], 1)
     return qc
 
+@timed_stage("build")
 def qubit_controlled_preparation_1MS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
     """
     Prepare a mixed state controlled by qubits.
@@ -441,6 +779,151 @@ def qubit_controlled_preparation_1MS(n: int, m: int, qc: QuantumCircuit) -> Quan
     return qc  
 
 # Remember its necessary to record the measurement results of control qubits
+def _recycled_control_state_preparation(
+    qc: QuantumCircuit,
+    control_indices: list[int],
+    target_indices: list[int],
+    theta_list: list[float] | None
+) -> None:
+    """
+    Prepare the control qubits for the target qubits of one recycling cycle.
+    """
+    for control_index, target_index in zip(control_indices, target_indices):
+        if theta_list is None:
+            qc.h(control_index)
+        else:
+            qc.ry(theta_list[target_index], control_index)
+
+@timed_stage("build")
+def bit_recycled_preparation_1MS(
+    n: int,
+    k: int,
+    qc: QuantumCircuit,
+    theta_list: list[float] | None = None
+) -> QuantumCircuit:
+    """
+    Prepare a single mixed state with k control qubits recycled by measurement and reset.
+
+    Unlike ``bit_controlled_preparation_1MS`` that consumes one control qubit per 
+    target qubit, the targets are covered in cycles of k. In each cycle, the control 
+    qubits are prepared, measured, and used to flip the next k target qubits via 
+    classically conditioned X gates, and they are reset before the next cycle. 
+    Therefore, the circuit has k + n rather than 2n qubits for the target qubits, 
+    while the prepared mixture is identical, e.g., for n = 2 and Hadamard controls:
+
+    .. math::
+        ρ = 1/4 * (|0⟩⟨0| + |1⟩⟨1| + |2⟩⟨2| + |3⟩⟨3|)
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits, located at qubits k to k + n - 1.
+    k : int
+        Number of recycled control qubits, located at qubits 0 to k - 1.
+    qc : QuantumCircuit
+        The quantum circuit to which the preparation will be applied. Unlike the 
+        non-recycled preparations, the control states are prepared by this function.
+    theta_list : list[float] | None, optional
+        RY angles of the control qubit for each target qubit, i.e., the separable 
+        control state of ``separable_control_state_preparation``. Hadamard gates 
+        are applied by default.
+
+    Returns
+    -------
+    QuantumCircuit
+        The input circuit with the recycled bit-controlled preparation.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(3, 3)  # n=2 target qubits, k=1 control qubit
+    >>> qc = bit_recycled_preparation_1MS(n=2, k=1, qc=qc)
+    >>> print(qc)
+
+    Example circuit (n=2, k=1)::
+
+                 ┌───┐┌─┐           ┌───┐┌─┐           
+            q_0: ┤ H ├┤M├────|0>────┤ H ├┤M├───────────
+                 └───┘└╥┘   ┌───┐   └───┘└╥┘           
+            q_1: ──────╫────┤ X ├─────────╫────────────
+                       ║    └─╥─┘         ║    ┌───┐   
+            q_2: ──────╫──────╫───────────╫────┤ X ├───
+                       ║      ║           ║    └─╥─┘   
+                       ║ ┌────╨────┐      ║ ┌────╨────┐
+            c: 3/══════╩═╡ c_2=0x1 ╞══════╩═╡ c_2=0x1 ╞
+                       2 └─────────┘      2 └─────────┘
+    """
+    for start in range(0, n, k):
+        if start > 0:
+            qc.reset(qc.qubits[:k])
+        target_indices = list(range(start, min(start + k, n)))
+        control_indices = list(range(len(target_indices)))
+        _recycled_control_state_preparation(qc, control_indices, target_indices, theta_list)
+        for control_index, target_index in zip(control_indices, target_indices):
+            qc.measure(qc.qubits[control_index], qc.clbits[-1])
+            qc.x(qc.qubits[k + target_index]).c_if(qc.clbits[-1], 1)
+    return qc
+
+@timed_stage("build")
+def qubit_recycled_preparation_1MS(
+    n: int,
+    k: int,
+    qc: QuantumCircuit,
+    theta_list: list[float] | None = None
+) -> QuantumCircuit:
+    """
+    Prepare a single mixed state with k control qubits recycled by reset.
+
+    This is the qubit-controlled counterpart of ``bit_recycled_preparation_1MS``. 
+    In each cycle, the control qubits are prepared and entangled with the next k 
+    target qubits via CNOT gates, and then they are reset, which traces them out 
+    and leaves the target qubits in the mixed state.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits, located at qubits k to k + n - 1.
+    k : int
+        Number of recycled control qubits, located at qubits 0 to k - 1.
+    qc : QuantumCircuit
+        The quantum circuit to which the preparation will be applied. Unlike the 
+        non-recycled preparations, the control states are prepared by this function.
+    theta_list : list[float] | None, optional
+        RY angles of the control qubit for each target qubit. Hadamard gates are 
+        applied by default.
+
+    Returns
+    -------
+    QuantumCircuit
+        The input circuit with the recycled qubit-controlled preparation.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(3, 3)  # n=2 target qubits, k=1 control qubit
+    >>> qc = qubit_recycled_preparation_1MS(n=2, k=1, qc=qc)
+    >>> print(qc)
+
+    Example circuit (n=2, k=1)::
+
+                 ┌───┐          ┌───┐     
+            q_0: ┤ H ├──■───|0>─┤ H ├──■──
+                 └───┘┌─┴─┐     └───┘  │  
+            q_1: ─────┤ X ├────────────┼──
+                      └───┘          ┌─┴─┐
+            q_2: ────────────────────┤ X ├
+                                     └───┘
+            c: 3/═════════════════════════
+    """
+    for start in range(0, n, k):
+        if start > 0:
+            qc.reset(qc.qubits[:k])
+        target_indices = list(range(start, min(start + k, n)))
+        control_indices = list(range(len(target_indices)))
+        _recycled_control_state_preparation(qc, control_indices, target_indices, theta_list)
+        for control_index, target_index in zip(control_indices, target_indices):
+            qc.cx(qc.qubits[control_index], qc.qubits[k + target_index])
+    return qc
+
+@timed_stage("build")
 def bit_controlled_preparation_MPS(n, m, qc):
     """
     Prepare a mixed state controlled by classical bits.
@@ -505,6 +988,7 @@ def bit_controlled_preparation_MPS(n, m, qc):
         qc.x(qc.qubits[index]).c_if(qc.clbits[index - m], 1)
     return qc
 
+@timed_stage("build")
 def qubit_controlled_preparation_MPS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
     """
     Prepare a hybrid mixed-and-pure state controlled by qubits.
@@ -569,6 +1053,156 @@ def qubit_controlled_preparation_MPS(n: int, m: int, qc: QuantumCircuit) -> Quan
 
     return qc
 
+def _selector_fused_circuit(qc: QuantumCircuit, target_qubits: list, selector_gates) -> QuantumCircuit:
+    """
+    Add a selector qubit in |+⟩ to a circuit, whose value is measured into an extra 
+    most significant classical bit.
+
+    The gates conditioned on the selector, applied by ``selector_gates(fused_qc, sel)``, 
+    are inserted before the first instruction acting on ``target_qubits``, or right 
+    after the snapshot that replaces the prepared prefix (see ``prefix_snapshot``).
+    """
+    fused_qc = qc.copy_empty_like()
+    selector, selector_bit = QuantumRegister(1, "sel"), ClassicalRegister(1, "sel_c")
+    fused_qc.add_register(selector, selector_bit)
+    inserted = False
+    for instruction in qc.data:
+        operation = instruction.operation
+        if operation.name == "set_statevector":
+            # Extend the saved state rather than resetting the selector
+            statevector = np.kron([1 / math.sqrt(2)] * 2, Statevector(operation.params[0]).data)
+            fused_qc.append(SetStatevector(statevector), fused_qc.qubits)
+            selector_gates(fused_qc, selector[0])
+            inserted = True
+            continue
+        if not inserted and set(instruction.qubits) & set(target_qubits):
+            fused_qc.h(selector[0])
+            selector_gates(fused_qc, selector[0])
+            inserted = True
+        fused_qc.append(operation, instruction.qubits, instruction.clbits)
+    if not inserted:
+        fused_qc.h(selector[0])
+        selector_gates(fused_qc, selector[0])
+    fused_qc.measure(selector[0], selector_bit[0])
+    return fused_qc
+
+@timed_stage("build")
+def fused_preparation_2MS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Fuse the two test cases of the 2MS mode into one circuit.
+
+    The two mixed states of the 2MS mode differ only by an X gate on the most 
+    significant target qubit ``m + n - 1``. Herein, this X gate is controlled by an 
+    additional selector qubit in |+⟩, which is appended as the last qubit and 
+    measured into an additional most significant classical bit. Therefore, the 
+    outcomes with the selector bit equal to 0 (resp. 1) exactly follow the output 
+    distribution of the first (resp. second) mixed state.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits.
+    m : int
+        Number of control qubits.
+    qc : QuantumCircuit
+        The complete circuit of the first mixed state (i.e., without the X gate on 
+        the most significant qubit), including the program and measurements.
+
+    Returns
+    -------
+    QuantumCircuit
+        The fused circuit with one more qubit and one more classical bit.
+
+    Example
+    -------
+    >>> n, m = 2, 1
+    >>> qc = QuantumCircuit(n + m, n)
+    >>> qc.h(0)
+    >>> qc = bit_controlled_preparation_2MS(n, m, qc)
+    >>> qc.measure(qc.qubits[m:], qc.clbits[:])
+    >>> print(fused_preparation_2MS(n, m, qc))
+
+    Example circuit (n=2, m=1)::
+
+                 ┌───┐┌─┐
+            q_0: ┤ H ├┤M├─────────────────────────
+                 └───┘└╥┘        ┌───┐      ┌─┐
+            q_1: ──────╫─────────┤ X ├──────┤M├───
+                       ║ ┌───┐   └─╥─┘      └╥┘┌─┐
+            q_2: ──────╫─┤ X ├─────╫─────────╫─┤M├
+                 ┌───┐ ║ └─┬─┘     ║     ┌─┐ ║ └╥┘
+            sel: ┤ H ├─╫───■───────╫─────┤M├─╫──╫─
+                 └───┘ ║      ┌────╨────┐└╥┘ ║  ║
+            c: 2/══════╩══════╡ c_1=0x1 ╞═╬══╩══╩═
+                       1      └─────────┘ ║  0  1
+        sel_c: 1/═════════════════════════╩═══════
+                                          0
+    """
+    def selector_gates(fused_qc, selector):
+        fused_qc.cx(selector, fused_qc.qubits[m + n - 1])
+    return _selector_fused_circuit(qc, qc.qubits[m:n + m], selector_gates)
+
+@timed_stage("build")
+def fused_preparation_MPS(n: int, m: int, qc: QuantumCircuit) -> QuantumCircuit:
+    """
+    Fuse the mixed and pure test cases of the MPS mode into one circuit.
+
+    An additional selector qubit in |+⟩ is appended as the last qubit and measured 
+    into an additional most significant classical bit. When the selector is 1, each 
+    target qubit whose control qubit is 0 gets flipped before being coupled, so that 
+    all the targets end up in |1⟩, i.e., the pure state |2^n-1⟩. Therefore, the 
+    outcomes with the selector bit equal to 0 follow the mixed state (before the 
+    post-selection on the control qubits), whereas those with the selector bit equal 
+    to 1 follow the pure state regardless of the control qubits.
+
+    Parameters
+    ----------
+    n : int
+        Number of target qubits.
+    m : int
+        Number of control qubits.
+    qc : QuantumCircuit
+        The complete circuit of the mixed state, including the program and 
+        measurements.
+
+    Returns
+    -------
+    QuantumCircuit
+        The fused circuit with one more qubit and one more classical bit.
+
+    Example
+    -------
+    >>> n, m = 2, 2
+    >>> qc = QuantumCircuit(n + m, n + m)
+    >>> qc.h(qc.qubits[:m])
+    >>> qc = qubit_controlled_preparation_MPS(n, m, qc)
+    >>> print(fused_preparation_MPS(n, m, qc))
+
+    Example circuit (n=2, m=2)::
+
+                 ┌───┐                    ┌─┐
+            q_0: ┤ H ├──o─────────■───────┤M├───
+                 ├───┤  │         │       └╥┘┌─┐
+            q_1: ┤ H ├──┼────o────┼────■───╫─┤M├
+                 └───┘┌─┴─┐  │  ┌─┴─┐  │   ║ └╥┘
+            q_2: ─────┤ X ├──┼──┤ X ├──┼───╫──╫─
+                      └─┬─┘┌─┴─┐└───┘┌─┴─┐ ║  ║
+            q_3: ───────┼──┤ X ├─────┤ X ├─╫──╫─
+                 ┌───┐  │  └─┬─┘ ┌─┐ └───┘ ║  ║
+            sel: ┤ H ├──■────■───┤M├───────╫──╫─
+                 └───┘           └╥┘       ║  ║
+            c: 4/═════════════════╬════════╩══╩═
+                                  ║        0  1
+        sel_c: 1/═════════════════╩═════════════
+                                  0
+    """
+    def selector_gates(fused_qc, selector):
+        for index in range(m, n + m):
+            # Flip the target if the selector is 1 and its control qubit is 0
+            fused_qc.append(XGate().control(2, ctrl_state=1), [selector, fused_qc.qubits[index - m], fused_qc.qubits[index]])
+    return _selector_fused_circuit(qc, qc.qubits[m:n + m], selector_gates)
+
+
 if __name__ == "__main__":
     """
     Manual check for all preparation circuits.
@@ -593,6 +1227,101 @@ if __name__ == "__main__":
         qc = QuantumCircuit(n+m, n+m)
         return qc, n, m
 
+    def test_input_multiplexed_circuit():
+        # Random angles of entangled control states with m = 1, ..., 4
+        rng = np.random.default_rng(0)
+        return [list(rng.uniform(0, math.pi, 2**m - 1)) for m in range(1, 5)]
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_multiplexed_circuit(theta_lists, shots):
+        from qiskit.quantum_info import Statevector
+        for theta_list in theta_lists:
+            # Both syntheses should prepare exactly the same entangled control state
+            state_mcry = Statevector(entangled_control_state_preparation(theta_list))
+            state_ucry = Statevector(multiplexed_control_state_preparation(theta_list))
+            assert np.allclose(state_mcry.data, state_ucry.data)
+
+    def unit_test_cached_preparation(theta_lists, shots):
+        from qiskit.quantum_info import Statevector
+        for theta_list in theta_lists:
+            # Repeated requests return the same prebuilt instruction
+            inst = cached_control_state_preparation("ent", tuple(theta_list))
+            assert inst is cached_control_state_preparation("ent", tuple(theta_list))
+            # The pre-transpiled instruction prepares the same state
+            inst_transpiled = cached_control_state_preparation("ent", tuple(theta_list), transpiled=True)
+            state = Statevector(entangled_control_state_preparation(theta_list))
+            assert state.equiv(Statevector(inst_transpiled.definition))
+        # Controlled RY gates are shared rather than re-synthesized
+        assert controlled_ry_gate(theta_lists[1][1], 1) is controlled_ry_gate(theta_lists[1][1], 1)
+
+    def unit_test_recycled_1MS(theta_list, shots):
+        n = len(theta_list)
+        expected_probs = separable_control_state_probs(theta_list)
+        for k in [1, 2]:
+            for recycled_preparation in [bit_recycled_preparation_1MS, qubit_recycled_preparation_1MS]:
+                qc = QuantumCircuit(k + n, n)
+                qc = recycled_preparation(n, k, qc, theta_list)
+                # Only k control qubits are needed for the n target qubits
+                assert qc.num_qubits == k + n
+                qc.measure(qc.qubits[k:], qc.clbits[:])
+                count_dict = circuit_execution(qc, shots * 10)
+                probs = [count_dict.get(key, 0) / (shots * 10) for key in range(2 ** n)]
+                assert np.allclose(probs, expected_probs, atol=0.03)
+
+    def unit_test_kMS(qc_n_m_tuple, shots):
+        from qiskit.quantum_info import Statevector
+        _, n, m = qc_n_m_tuple
+        # The kMS mode with k = 1 prepares the same states as the 2MS mode
+        for kMS_preparation, twoMS_preparation in [
+            (bit_controlled_preparation_kMS, bit_controlled_preparation_2MS),
+            (qubit_controlled_preparation_kMS, qubit_controlled_preparation_2MS)
+        ]:
+            for top_val in range(2):
+                qc_kMS, qc_2MS = QuantumCircuit(n + m, n), QuantumCircuit(n + m, n)
+                qc_kMS.h(qc_kMS.qubits[:m])
+                qc_2MS.h(qc_2MS.qubits[:m])
+                if top_val == 1:
+                    qc_2MS.x(m + n - 1)
+                qc_kMS = kMS_preparation(n, m, 1, top_val, qc_kMS)
+                qc_2MS = twoMS_preparation(n, m, qc_2MS)
+                qc_kMS.measure(qc_kMS.qubits[m:], qc_kMS.clbits[:])
+                qc_2MS.measure(qc_2MS.qubits[m:], qc_2MS.clbits[:])
+                assert set(circuit_execution(qc_kMS, shots)) == set(circuit_execution(qc_2MS, shots))
+        # Each of the 2^k mixed states covers one block of the input domain
+        n, m, k = 3, 1, 2
+        for top_val in range(2 ** k):
+            qc = QuantumCircuit(n + m, n)
+            qc.h(0)
+            qc = qubit_controlled_preparation_kMS(n, m, k, top_val, qc)
+            qc.measure(qc.qubits[m:], qc.clbits[:])
+            assert set(circuit_execution(qc, shots)) == {top_val * 2, top_val * 2 + 1}
+
+    def unit_test_fused(qc_n_m_tuple, shots):
+        from .repeat_until_success import fused_repeat_until_success, generate_invalid_masks
+        _, n, m = qc_n_m_tuple
+        # The two halves of a fused 2MS circuit cover the inputs of the two mixed states
+        for twoMS_preparation in [bit_controlled_preparation_2MS, qubit_controlled_preparation_2MS]:
+            qc = QuantumCircuit(n + m, n)
+            qc.h(qc.qubits[:m])
+            qc = twoMS_preparation(n, m, qc)
+            qc.measure(qc.qubits[m:], qc.clbits[:])
+            counts_0, counts_1 = fused_repeat_until_success(fused_preparation_2MS(n, m, qc), shots, [])
+            assert set(counts_0) == {0, 1} and set(counts_1) == {2, 3}
+            assert sum(counts_0.values()) == sum(counts_1.values()) == shots
+        # The two halves of a fused MPS circuit are the mixed state and the pure state
+        for MPS_preparation in [bit_controlled_preparation_MPS, qubit_controlled_preparation_MPS]:
+            qc = QuantumCircuit(n + m, n + m)
+            qc.h(qc.qubits[:m])
+            qc = MPS_preparation(n, m, qc)
+            qc.measure(qc.qubits[m:], qc.clbits[m:])
+            invalid_list = generate_invalid_masks(m, [2 ** m - 1])
+            counts_mixed, counts_pure = fused_repeat_until_success(fused_preparation_MPS(n, m, qc), shots, invalid_list)
+            assert {key >> m for key in counts_mixed} == {0, 1, 2}
+            assert {key >> m for key in counts_pure} == {2 ** n - 1}
+
     # ----------------------------
     # Manual check functions
     # ----------------------------
@@ -607,6 +1336,15 @@ if __name__ == "__main__":
         print("\n--- Entangled Control Circuit ---")
         print(qc.draw(output='text'))
 
+    def manual_check_multiplexed_circuit(theta_lists, shots):
+        from .circuit_complexity_measure import complexity_profile
+        print("\n--- Multiplexed Control Circuit ---")
+        print(multiplexed_control_state_preparation(theta_lists[1]).draw(output='text'))
+        for theta_list in theta_lists:
+            for synthesis in ["multi_controlled", "multiplexed"]:
+                qc = control_state_preparation(theta_list, "ent", synthesis) # type: ignore
+                print(f"m={qc.num_qubits}, {synthesis}: {complexity_profile(qc)}")
+
     def manual_check_bit_controlled_1MS(qc_n_m_tuple, shots):
         qc, n, m = qc_n_m_tuple
         qc_new = bit_controlled_preparation_1MS(n, m, qc)
@@ -656,6 +1394,12 @@ if __name__ == "__main__":
         "5": {"input": test_input_mixed_states, "shots": shots, "function": manual_check_qubit_controlled_2MS},
         "6": {"input": test_input_mixed_states, "shots": shots, "function": manual_check_bit_controlled_MPS},
         "7": {"input": test_input_mixed_states, "shots": shots, "function": manual_check_qubit_controlled_MPS},
+        "8": {"input": test_input_multiplexed_circuit, "shots": shots, "function": unit_test_multiplexed_circuit},
+        "9": {"input": test_input_multiplexed_circuit, "shots": shots, "function": manual_check_multiplexed_circuit},
+        "10": {"input": test_input_multiplexed_circuit, "shots": shots, "function": unit_test_cached_preparation},
+        "11": {"input": test_input_separable_circuit, "shots": shots, "function": unit_test_recycled_1MS},
+        "12": {"input": test_input_mixed_states, "shots": shots, "function": unit_test_kMS},
+        "13": {"input": test_input_mixed_states, "shots": shots, "function": unit_test_fused},
     }
  
     for id, execution_dict in executed_test.items():
@@ -0,0 +1,208 @@
+import cProfile
+import io
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Iterator, Literal
+
+PROFILE_MODES = ("cpu", "mem")
+# The number of hotspots or allocation sites listed in the reports
+DEFAULT_TOP = 30
+# The frames kept for each allocation traced by tracemalloc, as each frame slows down the tracing
+TRACEBACK_LIMIT = 1
+
+
+def _cpu_report(profiler: cProfile.Profile, top: int) -> str:
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stream.write(f"Total: {stats.total_calls} calls in {stats.total_tt:.3f} s\n")
+    for sort_key in ("cumulative", "tottime"):
+        stream.write(f"\n===== Top {top} functions by {sort_key} time =====\n")
+        stats.sort_stats(sort_key).print_stats(top)
+    return stream.getvalue()
+
+
+def _mem_report(snapshot: tracemalloc.Snapshot, peak: int, top: int) -> str:
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+        tracemalloc.Filter(False, "<unknown>")
+    ])
+    lines = [
+        f"Peak traced memory: {peak / 2 ** 20:.1f} MiB",
+        f"Memory still allocated at the end: {sum(trace.size for trace in snapshot.traces) / 2 ** 20:.1f} MiB",
+        "",
+        f"===== Top {top} allocation sites by size =====",
+    ]
+    statistics = snapshot.statistics("lineno")
+    for index, statistic in enumerate(statistics[:top], start=1):
+        frame = statistic.traceback[0]
+        lines.append(
+            f"#{index}: {frame.filename}:{frame.lineno}: "
+            f"{statistic.size / 2 ** 10:.1f} KiB in {statistic.count} blocks"
+        )
+    if snapshot.traceback_limit <= 1:
+        return "\n".join(lines) + "\n"
+    lines += ["", f"===== Tracebacks of the top {min(top, 5)} allocation sites ====="]
+    for index, statistic in enumerate(snapshot.statistics("traceback")[:min(top, 5)], start=1):
+        lines.append(f"#{index}: {statistic.size / 2 ** 10:.1f} KiB in {statistic.count} blocks")
+        lines += [f"    {line}" for line in statistic.traceback.format(most_recent_first=True)]
+    return "\n".join(lines) + "\n"
+
+
+@contextmanager
+def profiling(
+    mode: Literal["cpu", "mem"],
+    path_prefix: str,
+    top: int = DEFAULT_TOP,
+    traceback_limit: int = TRACEBACK_LIMIT
+) -> Iterator[None]:
+    """
+    Profile the code within by cProfile or tracemalloc and save the reports.
+
+    With `cpu`, the calls are profiled by ``cProfile``. The raw profile is saved as
+    ``<path_prefix>.prof`` (to be loaded by ``pstats`` or viewers such as snakeviz), and
+    the top functions by cumulative and own time as ``<path_prefix>.txt``. With `mem`,
+    the allocations are traced by ``tracemalloc``, and the peak traced memory and the top
+    allocation sites (with their tracebacks if more than one frame is kept) are saved as
+    ``<path_prefix>.txt``. The memory allocated by the simulator itself (i.e., outside
+    the Python allocator) is not traced. The reports are saved even if the code within
+    raises an exception.
+
+    Parameters
+    ----------
+    mode : {"cpu", "mem"}
+        The profiler.
+    path_prefix : str
+        The path of the reports without the extension, e.g., `.../RQ1_QFT_cpu_profile`.
+    top : int, optional
+        The number of functions or allocation sites listed in the report.
+    traceback_limit : int, optional
+        The frames kept for each allocation with `mem`. Keeping 10 frames instead of 1
+        slows down a toy experiment about five times.
+
+    Raises
+    ------
+    ValueError
+        If the mode is unknown.
+
+    Example
+    -------
+    >>> with profiling("cpu", os.path.join(saving_dir, "RQ1_QFT_cpu_profile")):
+    ...     run_experiment("toy", False)
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode: {mode}. Available modes: {list(PROFILE_MODES)}")
+    os.makedirs(os.path.dirname(os.path.abspath(path_prefix)), exist_ok=True)
+    start_time = time.perf_counter()
+
+    def save_report(report: str) -> None:
+        with open(f"{path_prefix}.txt", "w", encoding="utf-8") as file:
+            file.write(f"Profile ({mode}) of {time.perf_counter() - start_time:.3f} s wall time\n\n")
+            file.write(report)
+
+    if mode == "cpu":
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(f"{path_prefix}.prof")
+            save_report(_cpu_report(profiler, top))
+    else:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start(traceback_limit)
+        tracemalloc.reset_peak()
+        try:
+            yield
+        finally:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if not was_tracing:
+                tracemalloc.stop()
+            save_report(_mem_report(snapshot, peak, top))
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the profiling hooks.
+    Run:
+        python -m mycode.utils.profiling
+    """
+    import tempfile
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def hot_function_toy(n):
+        return sum(index ** 2 for index in range(n))
+
+    def allocating_function_toy(n):
+        return [bytearray(1024) for _ in range(n)]
+
+    def test_input_prefix():
+        return os.path.join(tempfile.mkdtemp(), "RQ1", "RQ1_toy_profile")
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_cpu(path_prefix):
+        with profiling("cpu", path_prefix, top=5):
+            hot_function_toy(100000)
+        stats = pstats.Stats(f"{path_prefix}.prof")
+        assert any(function[2] == "hot_function_toy" for function in stats.stats)
+        with open(f"{path_prefix}.txt", encoding="utf-8") as file:
+            assert "hot_function_toy" in file.read()
+
+    def unit_test_mem(path_prefix):
+        with profiling("mem", path_prefix, top=5, traceback_limit=3):
+            kept = allocating_function_toy(2000)
+        with open(f"{path_prefix}.txt", encoding="utf-8") as file:
+            report = file.read()
+        # The allocation site is listed first, and the peak covers about 2 MiB
+        first_site = report.split("#1: ", 1)[1].splitlines()[0]
+        assert "profiling.py" in first_site and len(kept) == 2000
+        assert float(report.split("Peak traced memory: ", 1)[1].split(" ")[0]) >= 1.9
+        assert "Tracebacks" in report and not tracemalloc.is_tracing()
+
+    def unit_test_exception(path_prefix):
+        # The reports are saved even if the profiled code fails
+        try:
+            with profiling("cpu", path_prefix):
+                raise RuntimeError("failed experiment")
+        except RuntimeError:
+            pass
+        assert os.path.isfile(f"{path_prefix}.prof") and os.path.isfile(f"{path_prefix}.txt")
+        try:
+            with profiling("disk", path_prefix):
+                pass
+            assert False
+        except ValueError:
+            pass
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_prefix, "function": unit_test_cpu},
+        "1": {"input": test_input_prefix, "function": unit_test_mem},
+        "2": {"input": test_input_prefix, "function": unit_test_exception},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
@@ -1,10 +1,69 @@
-import random
-import copy
-from collections import defaultdict
+import math
+import numpy as np
 from qiskit import QuantumCircuit
-from .circuit_execution import circuit_execution
+from .circuit_execution import circuit_execution, outcome_probabilities
+from .data_conversion import Counts
+from .stage_timing import timed_stage
 
-def repeat_until_success(qc: QuantumCircuit, shots: int, invalid_list: list[int]) -> dict[int, int]:
+# Number of standard deviations of the valid samples covered by the oversampling
+OVERSAMPLING_SIGMAS = 4
+
+def oversampled_shots(shots: int, acceptance_prob: float) -> int:
+    """
+    Return the number of shots to execute so that at least ``shots`` samples are 
+    accepted with high probability.
+
+    The number of accepted samples is binomial, so the execution is oversampled by 
+    ``OVERSAMPLING_SIGMAS`` standard deviations beyond the expected ``shots / p``.
+
+    Parameters
+    ----------
+    shots : int
+        The number of accepted samples to collect.
+    acceptance_prob : float
+        The probability that a sample is accepted.
+
+    Returns
+    -------
+    int
+        The number of shots to execute.
+
+    Example
+    -------
+    >>> oversampled_shots(1000, 0.75)
+    1418
+    """
+    if not 0 < acceptance_prob <= 1:
+        raise ValueError(f"The acceptance probability should be in (0, 1], got {acceptance_prob}")
+    deviation = OVERSAMPLING_SIGMAS * math.sqrt(shots * (1 - acceptance_prob))
+    return math.ceil((shots + deviation) / acceptance_prob)
+
+def _invalid_outcomes(keys: np.ndarray, invalid_list: list) -> np.ndarray:
+    """
+    Flag the invalid keys, given either explicit outcomes or (mask, value) pairs 
+    such that ``key & mask == value`` (see ``generate_invalid_masks``).
+    """
+    outcomes = [item for item in invalid_list if not isinstance(item, tuple)]
+    invalid = np.isin(keys, np.asarray(outcomes, dtype=np.int64))
+    for mask, value in (item for item in invalid_list if isinstance(item, tuple)):
+        invalid |= (keys & mask) == value
+    return invalid
+
+def _discard_invalid(counts: Counts, invalid_list: list) -> Counts:
+    """
+    Zero the counts of the invalid outcomes, see ``_invalid_outcomes``.
+    """
+    array = counts.array.copy()
+    array[_invalid_outcomes(np.arange(array.size), invalid_list)] = 0
+    return Counts(array)
+
+def repeat_until_success(
+    qc: QuantumCircuit,
+    shots: int,
+    invalid_list: list[int] | list[tuple[int, int]],
+    defer_measurement: bool = False,
+    acceptance_prob: float | None = None
+) -> Counts:
     """
     Execute a quantum circuit repeatedly until all measurement results are valid.
 
@@ -13,20 +72,33 @@ def repeat_until_success(qc: QuantumCircuit, shots: int, invalid_list: list[int]
     result distribution contains only valid outputs, e.g., producing samples that 
     follow a uniform distribution over a specific set of values.
 
+    Each execution is oversampled according to the acceptance probability (see 
+    ``oversampled_shots``), which is either given, e.g., computed from the angles of 
+    the control state, or estimated from the previous executions. Therefore, one 
+    execution usually suffices when ``acceptance_prob`` is given. The valid samples 
+    beyond ``shots`` are discarded at random without replacement.
+
     Parameters
     ----------
     qc : QuantumCircuit
         The quantum circuit to be executed.
     shots : int
         The total number of measurements (shots) to collect.
-    invalid_list : list of int
+    invalid_list : list of int or list of tuple
         List of measurement outcomes (in decimal) that are considered invalid and 
-        should be excluded from the final result.
+        should be excluded from the final result, or (mask, value) pairs matching 
+        the invalid outcomes by ``outcome & mask == value`` (see ``generate_invalid_masks``).
+    defer_measurement : bool, optional
+        Whether to simulate the circuit with deferred measurements, 
+        see ``circuit_execution``.
+    acceptance_prob : float or None, optional
+        The probability that an outcome is valid. If None (default), the first 
+        execution uses ``shots`` shots and the later ones use the observed rate.
 
     Returns
     -------
-    dict
-        A dictionary mapping each valid measurement outcome to its observed count.
+    Counts
+        The observed counts of the valid measurement outcomes.
 
     Example
     -------
@@ -36,53 +108,185 @@ def repeat_until_success(qc: QuantumCircuit, shots: int, invalid_list: list[int]
     >>> qc.measure(qc.qubits[:], qc.clbits[:])
     
     >>> # Collect 1000 valid samples, excluding 3 as invalid
-    >>> final_counts = repeat_until_success(qc, 1000, [3])
+    >>> final_counts = repeat_until_success(qc, 1000, [3], acceptance_prob=0.75)
     >>> print(final_counts)
-    >>> # Possible output: {0: 336, 1: 307, 2: 357}
+    >>> # Possible output: Counts({0: 336, 1: 307, 2: 357})
     """
-    flag = 0  # Indicates the first run
+    valid_counts = Counts(np.zeros(2 ** qc.num_clbits, dtype=np.int64))
+    executed_shots = 0
+    run_shots = shots if acceptance_prob is None else oversampled_shots(shots, acceptance_prob)
     while True:
-        # Execute the circuit and get raw measurement counts
-        dict_counts = circuit_execution(qc, shots)
-        temp_dict_counts = copy.deepcopy(dict_counts)
-
-        # Remove invalid measurement outcomes
-        keys_to_remove = [key for key in temp_dict_counts if key in invalid_list]
-        for key in keys_to_remove:
-            del temp_dict_counts[key]
-
-        if flag == 0:
-            # First run: initialize final_counts with valid outcomes
-            flag = 1
-            final_counts = copy.deepcopy(temp_dict_counts)
-        else:
-            # For subsequent runs, randomly sample the remaining counts to reach total shots
-            samps_list = list(temp_dict_counts.keys())
-            counts_list = list(temp_dict_counts.values())
-            sel_samps = random.choices(samps_list, weights=counts_list, k=remained_samps)
-            
-            sampled_dict = {}
-            # Aggregate counts from selected samples
-            for sample in sel_samps:
-                if sample in sampled_dict:
-                    sampled_dict[sample] += 1
-                else:
-                    sampled_dict[sample] = 1
-
-            # Merge new counts with previously collected valid counts
-            final_counts = defaultdict(int, final_counts)
-            for key, value in sampled_dict.items():
-                final_counts[key] += value
-
-        # Calculate the number of valid samples collected so far
-        temp_samps = sum(final_counts.values())
-        remained_samps = shots - temp_samps
-
-        # If enough valid samples collected, return final counts
-        if remained_samps == 0:
-            return final_counts
+        # Execute the circuit and keep the valid measurement outcomes
+        valid_counts += _discard_invalid(circuit_execution(qc, run_shots, defer_measurement), invalid_list)
+        valid_samps = valid_counts.shots
+        executed_shots += run_shots
+
+        remained_samps = shots - valid_samps
+        if remained_samps <= 0:
+            return valid_counts.resample(shots)
+        # Size the next execution by the observed acceptance rate
+        run_shots = oversampled_shots(remained_samps, max(valid_samps, 1) / executed_shots)
+
+
+def fused_repeat_until_success(
+    qc: QuantumCircuit,
+    shots: int,
+    invalid_list: list[int] | list[tuple[int, int]],
+    defer_measurement: bool = False,
+    acceptance_prob: float | None = None
+) -> tuple[Counts, Counts]:
+    """
+    Execute a fused circuit and split its outcomes into two histograms by the most 
+    significant classical bit, each with exactly ``shots`` valid samples.
+
+    The fused circuit comes from ``fused_preparation_2MS`` or ``fused_preparation_MPS``, 
+    whose selector in |+⟩ is measured into the most significant classical bit. The 
+    circuit is oversampled in the same way as ``repeat_until_success`` until both 
+    halves collect enough valid samples, and then each half is subsampled without 
+    replacement, so that the samples of each half exactly follow the distribution 
+    of executing the corresponding test case alone.
 
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The fused quantum circuit to be executed.
+    shots : int
+        The number of samples to collect for each half.
+    invalid_list : list of int or list of tuple
+        List of measurement outcomes (in decimal, without the selector bit) or (mask, 
+        value) pairs that are considered invalid for the first half, i.e., the 
+        selector bit equal to 0, see ``repeat_until_success``.
+    defer_measurement : bool, optional
+        Whether to simulate the circuit with deferred measurements, 
+        see ``circuit_execution``.
+    acceptance_prob : float or None, optional
+        The probability that an outcome of the first half is valid, 1 by default.
 
+    Returns
+    -------
+    tuple of Counts
+        The counts of the two halves, whose keys exclude the selector bit.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(2, 2)
+    >>> qc.h(qc.qubits[:2])
+    >>> qc.measure(qc.qubits[:], qc.clbits[:])
+    >>> counts_0, counts_1 = fused_repeat_until_success(qc, 1000, [1])
+    >>> print(counts_0, counts_1)
+    >>> # Possible output: Counts({0: 1000}) Counts({0: 491, 1: 509})
+    """
+    half_counts = [Counts(np.zeros(2 ** (qc.num_clbits - 1), dtype=np.int64)) for _ in range(2)]
+    half_samps, executed_shots = np.zeros(2, dtype=np.int64), 0
+    # Each half is selected with the probability 1/2
+    half_probs = np.array([0.5 * (1 if acceptance_prob is None else acceptance_prob), 0.5])
+    run_shots = oversampled_shots(shots, half_probs.min())
+    while True:
+        # The most significant bit splits the array of counts into the two halves
+        halves = circuit_execution(qc, run_shots, defer_measurement).array.reshape(2, -1)
+        half_counts[0] += _discard_invalid(Counts(halves[0]), invalid_list)
+        half_counts[1] += Counts(halves[1])
+        half_samps[:] = [counts.shots for counts in half_counts]
+        executed_shots += run_shots
+
+        remained_samps = shots - half_samps
+        if remained_samps.max() <= 0:
+            break
+        # Size the next execution by the observed rate of valid samples of each half
+        run_shots = max(
+            oversampled_shots(int(remained), max(int(samps), 1) / executed_shots)
+            for remained, samps in zip(remained_samps, half_samps) if remained > 0
+        )
+
+    # Keep exactly the required number of samples for each half
+    return tuple(counts.resample(shots) for counts in half_counts)
+
+
+def post_selected_sampling(
+    qc: QuantumCircuit,
+    shots: int,
+    invalid_list: list[int] | list[tuple[int, int]]
+) -> Counts:
+    """
+    Draw samples from the exact output distribution conditioned on valid outcomes.
+
+    Instead of executing a circuit until enough valid outcomes are collected, 
+    the exact outcome probabilities are computed by ``outcome_probabilities``, the 
+    invalid outcomes are projected out, and ``shots`` samples are drawn from the 
+    renormalized distribution. The samples follow the same distribution as those 
+    of ``repeat_until_success``, whereas the cost is one statevector simulation 
+    regardless of the acceptance probability.
+
+    Parameters
+    ----------
+    qc : QuantumCircuit
+        The quantum circuit with measurement operations.
+    shots : int
+        The number of valid samples to draw.
+    invalid_list : list of int or list of tuple
+        The invalid outcomes or (mask, value) pairs, see ``repeat_until_success``.
+
+    Returns
+    -------
+    Counts
+        The counts of the valid measurement outcomes.
+
+    Raises
+    ------
+    ValueError
+        If all the outcomes are invalid.
+
+    Example
+    -------
+    >>> qc = QuantumCircuit(3, 3)
+    >>> qc.h(qc.qubits[:2])
+    >>> qc.measure(qc.qubits[:], qc.clbits[:])
+    >>> print(post_selected_sampling(qc, 1000, [3]))
+    >>> # Possible output: Counts({0: 329, 1: 338, 2: 333})
+    """
+    probs = outcome_probabilities(qc)
+    probs[_invalid_outcomes(np.arange(len(probs)), invalid_list)] = 0
+    acceptance_prob = probs.sum()
+    if acceptance_prob <= 0:
+        raise ValueError("All the measurement outcomes are invalid.")
+    return Counts(np.random.multinomial(shots, probs / acceptance_prob))
+
+
+@timed_stage("input")
+def generate_invalid_masks(con_bits: int, invalid_con_list: list[int]) -> list[tuple[int, int]]:
+    """
+    Describe the invalid measurement results by the invalid control qubit values.
+
+    Unlike ``generate_invalid_numbers``, the invalid outcomes are not enumerated. 
+    Each invalid control value yields a (mask, value) pair that matches the low 
+    ``con_bits`` bits of an outcome regardless of the other bits, which can be 
+    passed to ``repeat_until_success`` as ``invalid_list``.
+
+    Parameters
+    ----------
+    con_bits : int
+        Number of control qubits, i.e., the low bits of the outcomes.
+    invalid_con_list : list of int
+        List of invalid control qubit values (decimal).
+
+    Returns
+    -------
+    list of tuple
+        List of (mask, value) pairs, one per invalid control value.
+
+    Example
+    -------
+    m = 3  # number of control qubits
+    invalid_con_list = [6, 7]
+    invalid_mask_list = generate_invalid_masks(m, invalid_con_list)
+    print(invalid_mask_list)
+    # Output: [(7, 6), (7, 7)]
+    """
+    mask = (1 << con_bits) - 1
+    return [(mask, invalid_con) for invalid_con in invalid_con_list]
+
+
+@timed_stage("input")
 def generate_invalid_numbers(total_bits: int, con_bits: int, invalid_con_list: list[int]) -> list[int]:
     """
     Generate all possible invalid measurement results given invalid control qubit values.
@@ -128,7 +332,8 @@ def generate_invalid_numbers(total_bits: int, con_bits: int, invalid_con_list: l
 
 if __name__ == "__main__":
     """
-    Unit testing for repeat_until_success and generate_invalid_numbers.
+    Unit testing for repeat_until_success, fused_repeat_until_success, post_selected_sampling, 
+    generate_invalid_masks and generate_invalid_numbers.
     Run:
         python -m mycode.utils.repeat_until_success
     """
@@ -163,7 +368,7 @@ if __name__ == "__main__":
         qc, shots, invalid_list = qc_shots_invalid_tuple
         counts = repeat_until_success(qc, shots, invalid_list)
         # Check type and sum of counts
-        assert isinstance(counts, dict) or isinstance(counts, defaultdict)
+        assert isinstance(counts, Counts)
         total_counts = sum(counts.values())
         assert total_counts == shots
         # Check no invalid outcome present
@@ -179,6 +384,41 @@ if __name__ == "__main__":
         high_bits = total_bits - con_bits
         assert len(invalid_nums) == len(invalid_con_list) * 2**high_bits
 
+    def unit_test_analytic_acceptance(qc_shots_invalid_tuple, shots):
+        qc, shots, invalid_list = qc_shots_invalid_tuple
+        # The oversampling covers the expected number of shots
+        assert oversampled_shots(shots, 0.75) > shots / 0.75
+        assert oversampled_shots(shots, 1) == shots
+        counts = repeat_until_success(qc, shots, invalid_list, acceptance_prob=0.75)
+        assert sum(counts.values()) == shots
+        assert set(counts) <= {0, 1, 2}
+
+    def unit_test_fused_repeat_until_success(qc_shots_invalid_tuple, shots):
+        qc, shots, invalid_list = qc_shots_invalid_tuple
+        # The most significant bit selects the half, and '1' is invalid for the first half
+        counts_0, counts_1 = fused_repeat_until_success(qc, shots, [1])
+        assert sum(counts_0.values()) == sum(counts_1.values()) == shots
+        assert set(counts_0) == {0}
+        assert set(counts_1) <= {0, 1}
+
+    def unit_test_post_selected_sampling(qc_shots_invalid_tuple, shots):
+        qc, shots, invalid_list = qc_shots_invalid_tuple
+        counts = post_selected_sampling(qc, shots * 100, invalid_list)
+        assert sum(counts.values()) == shots * 100
+        # The valid outcomes 0, 1 and 2 are uniformly distributed
+        assert set(counts) == {0, 1, 2}
+        assert all(abs(value / (shots * 100) - 1 / 3) < 0.03 for value in counts.values())
+
+    def unit_test_generate_invalid_masks(input_tuple):
+        total_bits, con_bits, invalid_con_list = input_tuple
+        invalid_masks = generate_invalid_masks(con_bits, invalid_con_list)
+        # The masks flag exactly the enumerated invalid numbers
+        keys = np.arange(2 ** total_bits)
+        invalid_nums = generate_invalid_numbers(total_bits, con_bits, invalid_con_list)
+        assert set(keys[_invalid_outcomes(keys, invalid_masks)]) == set(invalid_nums)
+        # The size of masks does not grow with the total number of bits
+        assert len(generate_invalid_masks(con_bits, invalid_con_list)) == len(invalid_con_list)
+
     # ----------------------------
     # Manual check functions
     # ----------------------------
@@ -204,6 +444,10 @@ if __name__ == "__main__":
         "1": {"input": test_input_repeat_until_success, "shots": shots, "function": manual_check_repeat_until_success},
         "2": {"input": test_input_generate_invalid_numbers, "shots": shots, "function": unit_test_generate_invalid_numbers},
         "3": {"input": test_input_generate_invalid_numbers, "shots": shots, "function": manual_check_generate_invalid_numbers},
+        "4": {"input": test_input_repeat_until_success, "shots": shots, "function": unit_test_fused_repeat_until_success},
+        "5": {"input": test_input_repeat_until_success, "shots": shots, "function": unit_test_analytic_acceptance},
+        "6": {"input": test_input_generate_invalid_numbers, "shots": shots, "function": unit_test_generate_invalid_masks},
+        "7": {"input": test_input_repeat_until_success, "shots": shots, "function": unit_test_post_selected_sampling},
     }
 
     for test_id, execution_dict in executed_test.items():
@@ -213,6 +457,7 @@ if __name__ == "__main__":
             temp_function = execution_dict["function"]
             if temp_function.__name__ in [
                 "unit_test_generate_invalid_numbers",
+                "unit_test_generate_invalid_masks",
                 "manual_check_generate_invalid_numbers"
             ]:
                 temp_function(test_input_val)
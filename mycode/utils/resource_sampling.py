@@ -0,0 +1,227 @@
+import os
+import threading
+import time
+
+import psutil
+
+# The seconds between two samples of the background thread
+SAMPLE_INTERVAL = 0.05
+# The bytes of a complex amplitude (i.e., complex128) of the simulator
+_AMPLITUDE_BYTES = 16
+
+
+class ResourceSampler:
+    """
+    A background sampler of the resources used by the current process.
+
+    While any snapshot is open (see ``open``), a daemon thread samples the resident
+    memory (RSS) and the number of threads of the process every ``interval`` seconds,
+    and keeps their peaks per snapshot. The simulator runs within the process, so that
+    its memory and threads are included. The CPU utilisation is averaged over the
+    snapshot from the CPU times of the process, and may exceed 100% when the simulator
+    runs several threads. The widest circuit executed within the snapshot is reported
+    by ``record_width`` (see ``circuit_execution``), from which the sizes of its
+    statevector and density matrix are derived.
+
+    Parameters
+    ----------
+    interval : float
+        The seconds between two samples.
+
+    Example
+    -------
+    >>> sampler = ResourceSampler()
+    >>> snapshot = sampler.open()
+    >>> sampler.record_width(20)
+    >>> sampler.close(snapshot)["statevector_mb"]
+    16.0
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self._reset()
+
+    def _reset(self) -> None:
+        # Also called in a forked child, where the thread and the process of the parent are stale
+        self._process = psutil.Process()
+        self._snapshots = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def _sample(self) -> None:
+        with self._process.oneshot():
+            rss = self._process.memory_info().rss
+            num_threads = self._process.num_threads()
+        with self._lock:
+            for snapshot in self._snapshots:
+                snapshot["peak_rss"] = max(snapshot["peak_rss"], rss)
+                snapshot["max_threads"] = max(snapshot["max_threads"], num_threads)
+
+    def _run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if not self._snapshots:
+                    self._thread = None
+                    return
+            self._sample()
+
+    def _cpu_seconds(self) -> float:
+        cpu_times = self._process.cpu_times()
+        return cpu_times.user + cpu_times.system
+
+    def open(self) -> dict:
+        snapshot = {
+            "start_time": time.perf_counter(),
+            "start_cpu": self._cpu_seconds(),
+            "peak_rss": 0,
+            "max_threads": 0,
+            "max_width": 0
+        }
+        with self._lock:
+            self._snapshots.append(snapshot)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self._sample()
+        return snapshot
+
+    def close(self, snapshot: dict) -> dict:
+        self._sample()
+        with self._lock:
+            if snapshot in self._snapshots:
+                self._snapshots.remove(snapshot)
+        elapsed = time.perf_counter() - snapshot["start_time"]
+        cpu_seconds = self._cpu_seconds() - snapshot["start_cpu"]
+        width = snapshot["max_width"]
+        return {
+            "peak_rss_mb": snapshot["peak_rss"] / 2 ** 20,
+            "ave_cpu_percent": 100 * cpu_seconds / elapsed if elapsed > 0 else 0.0,
+            "max_threads": snapshot["max_threads"],
+            "max_width": width,
+            "statevector_mb": _AMPLITUDE_BYTES * 2 ** width / 2 ** 20,
+            "density_matrix_mb": _AMPLITUDE_BYTES * 4 ** width / 2 ** 20
+        }
+
+    def record_width(self, num_qubits: int) -> None:
+        with self._lock:
+            for snapshot in self._snapshots:
+                snapshot["max_width"] = max(snapshot["max_width"], num_qubits)
+
+
+# The sampler of the current process
+_sampler = ResourceSampler()
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_sampler._reset)
+
+
+def resource_snapshot() -> dict:
+    """
+    Start sampling the resources, to be passed to ``resource_usage`` later.
+    """
+    return _sampler.open()
+
+
+def resource_usage(snapshot: dict) -> dict:
+    """
+    Stop sampling the resources of a snapshot and return their peaks.
+
+    Parameters
+    ----------
+    snapshot : dict
+        The snapshot returned by ``resource_snapshot`` when the sampling started.
+
+    Returns
+    -------
+    dict
+        The peak RSS in MiB (`peak_rss_mb`), the average CPU utilisation in percent
+        (`ave_cpu_percent`), the maximum number of threads (`max_threads`), the width of the
+        widest circuit executed (`max_width`), and the sizes of its statevector and density
+        matrix in MiB (`statevector_mb` and `density_matrix_mb`).
+
+    Example
+    -------
+    >>> snapshot = resource_snapshot()
+    >>> ...     # Execute the test cases
+    >>> resource_usage(snapshot)
+    {'peak_rss_mb': 231.4, 'ave_cpu_percent': 98.7, 'max_threads': 9, 'max_width': 8, ...}
+    """
+    return _sampler.close(snapshot)
+
+
+def record_width(num_qubits: int) -> None:
+    """
+    Report the width of a circuit to be executed to the open snapshots.
+    """
+    _sampler.record_width(num_qubits)
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the resource sampler.
+    Run:
+        python -m mycode.utils.resource_sampling
+    """
+    import numpy as np
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_size():
+        # An array of 256 MiB
+        return 2 ** 25
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_peak_rss(size):
+        baseline = resource_usage(resource_snapshot())["peak_rss_mb"]
+        snapshot = resource_snapshot()
+        array = np.ones(size)
+        time.sleep(5 * SAMPLE_INTERVAL)
+        del array
+        usage = resource_usage(snapshot)
+        # The freed array is still covered by the peak
+        assert usage["peak_rss_mb"] >= baseline + 200
+        assert usage["max_threads"] >= 2 and usage["ave_cpu_percent"] > 0
+
+    def unit_test_width(size):
+        outer = resource_snapshot()
+        inner = resource_snapshot()
+        record_width(3)
+        inner_usage = resource_usage(inner)
+        record_width(2)
+        outer_usage = resource_usage(outer)
+        assert inner_usage["max_width"] == 3 and outer_usage["max_width"] == 3
+        assert inner_usage["statevector_mb"] * 2 ** 20 == 16 * 8
+        assert inner_usage["density_matrix_mb"] * 2 ** 20 == 16 * 64
+        # The widths executed after closing are not recorded
+        assert resource_usage(resource_snapshot())["max_width"] == 0
+
+    def unit_test_thread(size):
+        # The sampling thread stops once every snapshot is closed
+        resource_usage(resource_snapshot())
+        time.sleep(3 * SAMPLE_INTERVAL)
+        assert _sampler._thread is None
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_size, "function": unit_test_peak_rss},
+        "1": {"input": test_input_size, "function": unit_test_width},
+        "2": {"input": test_input_size, "function": unit_test_thread},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
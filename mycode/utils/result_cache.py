@@ -0,0 +1,288 @@
+import functools
+import hashlib
+import inspect
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import numpy as np
+
+from .data_conversion import to_json
+
+# The default cache directory at the root of the repository, shared by both replication modes
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "result_cache"
+)
+# The shared harness of every testing process, i.e., the utilities (including the test
+# oracle, the preparation circuits and the circuit execution) and the global configurations
+_PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HARNESS_DIRECTORIES = [os.path.join(_PACKAGE_DIR, "utils"), os.path.join(_PACKAGE_DIR, "config")]
+# The cache consulted by the testing processes decorated with `journaled`, if any
+_active_cache = None
+
+
+@functools.lru_cache(maxsize=None)
+def _file_digest(path: str) -> str:
+    with open(path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+@functools.lru_cache(maxsize=None)
+def _directory_digest(directory: str) -> str:
+    digest = hashlib.sha256()
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.endswith(".py"):
+            digest.update(file_name.encode("utf-8"))
+            digest.update(_file_digest(os.path.join(directory, file_name)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def source_digests(process_func: Callable, arguments: dict) -> dict[str, str]:
+    """
+    Hash the sources that determine the results of a testing process.
+
+    These are the modules beside the testing process (i.e., the testing processes and
+    the specifications of the program), the configurations of the program (e.g.,
+    `candidate_initial_states`), the shared harness in ``HARNESS_DIRECTORIES`` (e.g., the
+    preparation circuits, the circuit execution, repeat-until-success and the test
+    oracle), and the module of the program version under test (e.g., `adder_defect4.py`),
+    which is found in the `version_dict` of the testing process module.
+
+    Parameters
+    ----------
+    process_func : Callable
+        The undecorated testing process.
+    arguments : dict
+        The arguments of the call, where `program_version` selects the program version.
+
+    Returns
+    -------
+    dict
+        The SHA-256 digests of the sources, keyed by their roles.
+    """
+    module = sys.modules[process_func.__module__]
+    process_dir = os.path.dirname(os.path.abspath(module.__file__))
+    digests = {
+        "process": _directory_digest(process_dir),
+        "harness": hashlib.sha256("".join(_directory_digest(directory) for directory in HARNESS_DIRECTORIES).encode("utf-8")).hexdigest()
+    }
+    config_dir = os.path.join(os.path.dirname(process_dir), "config")
+    if os.path.isdir(config_dir):
+        digests["config"] = _directory_digest(config_dir)
+    version_class = getattr(module, "version_dict", {}).get(arguments.get("program_version"))
+    if version_class is not None:
+        digests["program"] = _file_digest(inspect.getsourcefile(version_class))
+    return digests
+
+
+class ResultCache:
+    """
+    A content-addressed store of the recorded results of work items.
+
+    Each work item is stored as a JSON file named by the hash of everything its results
+    depend on, i.e., the testing process, its arguments (e.g., the test-case parameters
+    and the shots), the sources of the program version, its specifications and
+    configurations, the shared utilities (including the oracle), and the seed. Therefore, the same work item is simulated only once across
+    RQs, reruns and experiment scripts, and a changed source invalidates it. Files are
+    written atomically, so that workers of a campaign can share the cache directory.
+
+    Parameters
+    ----------
+    root : str or None
+        The cache directory. If None, nothing is stored and only the seeding applies.
+    seed : int or None
+        The seed of the random number generators. If given, each work item seeds NumPy
+        (and hence the simulator, see ``circuit_execution``) from the seed and its key,
+        so that its results are reproducible regardless of the execution order.
+
+    Example
+    -------
+    >>> cache = ResultCache("result_cache", seed=7)
+    >>> key = cache.key(testing_process_PSTCs, {"program_version": "v1", "n_list": [2], "shots": 1024})
+    >>> cache.get(key) is None
+    True
+    """
+
+    def __init__(self, root: str | None, seed: int | None = None):
+        self.root = root
+        self.seed = seed
+
+    def key(self, process_func: Callable, arguments: dict) -> str:
+        content = {
+            "process": f"{process_func.__module__}.{process_func.__name__}",
+            "arguments": arguments,
+            "sources": source_digests(process_func, arguments),
+            "seed": self.seed
+        }
+        return hashlib.sha256(
+            json.dumps(content, sort_keys=True, default=to_json).encode("utf-8")
+        ).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> list[dict] | None:
+        if self.root is None or not os.path.isfile(self._path(key)):
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as file:
+                return json.load(file)["records"]
+        except (json.JSONDecodeError, KeyError):
+            return None
+
+    def put(self, key: str, item: dict, records: list[dict]) -> None:
+        if self.root is None:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write into a temporary file first, so that readers never see a partial file
+        file_descriptor, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as file:
+            json.dump({"item": item, "records": records}, file, default=to_json)
+        os.replace(temp_path, path)
+
+    def seed_work_item(self, key: str) -> None:
+        if self.seed is not None:
+            np.random.seed((int(key[:8], 16) ^ self.seed) % 2 ** 32)
+
+
+@contextmanager
+def result_cache(root: str | None, seed: int | None = None) -> Iterator[ResultCache]:
+    """
+    Reuse the results of the testing processes decorated with `journaled` within.
+
+    Parameters
+    ----------
+    root : str or None
+        The cache directory, see ``ResultCache``.
+    seed : int or None
+        The seed of the work items, see ``ResultCache``.
+
+    Yields
+    ------
+    ResultCache
+        The active cache.
+    """
+    global _active_cache
+    previous_cache = _active_cache
+    _active_cache = ResultCache(root, seed)
+    try:
+        yield _active_cache
+    finally:
+        _active_cache = previous_cache
+
+
+def active_result_cache() -> ResultCache | None:
+    return _active_cache
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the result cache.
+    Run:
+        python -m mycode.utils.result_cache
+    """
+
+    from .checkpoint_journal import journaled
+    # The decorator consults the imported module rather than this script
+    from .result_cache import result_cache
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    calls = []
+
+    @journaled
+    def testing_process_toy(program_version: str, n_list: list[int], shots: int, verbose: bool = False) -> list[dict]:
+        calls.append(list(n_list))
+        return [{"num_qubits": n, "num_shots": shots, "ave_faults": float(np.random.rand())} for n in n_list]
+
+    def test_input_cache():
+        return tempfile.mkdtemp()
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_reuse(root):
+        calls.clear()
+        with result_cache(root):
+            first = testing_process_toy("v1", [1, 2], 8)
+        # The items are reused, even by other calls sharing an element
+        with result_cache(root):
+            second = testing_process_toy("v1", [2, 3], 8)
+        assert calls == [[1], [2], [3]]
+        assert second[0] == first[1]
+        # Different shots are different items
+        with result_cache(root):
+            testing_process_toy("v1", [1], 16)
+        assert calls[-1] == [1]
+
+    def unit_test_seed(root):
+        # The seeded results do not depend on the cache or the other items
+        with result_cache(None, seed=3):
+            first = testing_process_toy("v1", [1, 2], 8)
+        with result_cache(None, seed=3):
+            second = testing_process_toy("v1", [2], 8)
+        assert second[0] == first[1]
+        with result_cache(None, seed=4):
+            third = testing_process_toy("v1", [2], 8)
+        assert third[0] != first[1]
+
+    def unit_test_source_digests(root):
+        from ..testing.QFT.utils import testing_process as qft_process
+        process_func = qft_process.testing_process_PSTCs.__wrapped__
+        digests = source_digests(process_func, {"program_version": "v1"})
+        assert set(digests) == {"process", "harness", "config", "program"}
+        assert digests["program"] != source_digests(process_func, {"program_version": "v2"})["program"]
+
+    def unit_test_harness_digest(root):
+        import shutil
+        global HARNESS_DIRECTORIES
+        from ..testing.QFT.utils import testing_process as qft_process
+        process_func = qft_process.testing_process_PSTCs.__wrapped__
+        cache, arguments = ResultCache(root), {"program_version": "v1", "n_list": [2], "shots": 8}
+        # A changed shared utility (here, a copy of the utilities) invalidates the items
+        previous_directories = HARNESS_DIRECTORIES
+        utils_copy = shutil.copytree(HARNESS_DIRECTORIES[0], os.path.join(root, "utils"),
+                                     ignore=shutil.ignore_patterns("__pycache__"))
+        HARNESS_DIRECTORIES = [utils_copy] + previous_directories[1:]
+        try:
+            first = cache.key(process_func, arguments)
+            path = os.path.join(utils_copy, "repeat_until_success.py")
+            with open(path, "a", encoding="utf-8") as file:
+                file.write("\nOVERSAMPLING_SIGMAS = 5\n")
+            _file_digest.cache_clear()
+            _directory_digest.cache_clear()
+            assert cache.key(process_func, arguments) != first
+        finally:
+            HARNESS_DIRECTORIES = previous_directories
+            _file_digest.cache_clear()
+            _directory_digest.cache_clear()
+        # The unchanged copy has the same digest as the utilities themselves
+        assert cache.key(process_func, arguments) == first
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_cache, "function": unit_test_reuse},
+        "1": {"input": test_input_cache, "function": unit_test_seed},
+        "2": {"input": test_input_cache, "function": unit_test_source_digests},
+        "3": {"input": test_input_cache, "function": unit_test_harness_digest},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
@@ -0,0 +1,156 @@
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from ..config.csv_data import TIMING_STAGES
+
+# The stages of a test case, see `TIMING_STAGES` for their scopes
+STAGES = tuple(TIMING_STAGES)
+
+# The accumulated seconds of each stage since the process started
+_stage_seconds = dict.fromkeys(STAGES, 0.0)
+# The stage being timed, if any, so that the stages nested within it are not counted twice
+_current_stage = None
+
+
+@contextmanager
+def timed_stage(stage: str) -> Iterator[None]:
+    """
+    Add the elapsed time within to a stage of the test cases.
+
+    The time is measured by ``time.perf_counter``. A stage timed within another stage
+    (e.g., a transpilation within a preparation circuit, or a PSTC specification within
+    an MSTC specification) is counted as part of the outer stage only, so that the stages
+    never overlap and their sum does not exceed the execution time. It can also be used
+    as a decorator, as ``contextlib.contextmanager`` objects are.
+
+    Parameters
+    ----------
+    stage : str
+        One of ``STAGES``.
+
+    Example
+    -------
+    >>> @timed_stage("oracle")
+    ... def OPO_UTest(exp_samps, test_samps): ...
+    >>> with timed_stage("transpile"):
+    ...     executed_circuit = transpile(qc, backend)
+    """
+    global _current_stage
+    if stage not in _stage_seconds:
+        raise ValueError(f"Unknown stage: {stage}. Available stages: {list(STAGES)}")
+    if _current_stage is not None:
+        yield
+        return
+    _current_stage = stage
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        _stage_seconds[stage] += time.perf_counter() - start_time
+        _current_stage = None
+
+
+def stage_snapshot() -> dict[str, float]:
+    """
+    Return the accumulated seconds of each stage, to be passed to ``stage_averages`` later.
+    """
+    return dict(_stage_seconds)
+
+
+def stage_averages(snapshot: dict[str, float], num_cases: float) -> dict[str, float]:
+    """
+    Average the seconds spent in each stage since a snapshot.
+
+    Parameters
+    ----------
+    snapshot : dict
+        The accumulated seconds returned by ``stage_snapshot`` when the timing started.
+    num_cases : float
+        The divisor, i.e., the same one as the average execution time of the records.
+
+    Returns
+    -------
+    dict
+        The average seconds keyed by `ave_<stage>_time`, e.g., `ave_simulate_time`.
+
+    Example
+    -------
+    >>> snapshot = stage_snapshot()
+    >>> ...     # Execute the test cases
+    >>> stage_averages(snapshot, num_classical_inputs * repeats)
+    {'ave_input_time': 1.2e-05, 'ave_build_time': 0.0031, ...}
+    """
+    return {
+        f"ave_{stage}_time": (_stage_seconds[stage] - snapshot[stage]) / num_cases
+        for stage in STAGES
+    }
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the stage timing.
+    Run:
+        python -m mycode.utils.stage_timing
+    """
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_stages():
+        return 0.05
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_averages(seconds):
+        snapshot = stage_snapshot()
+        for _ in range(2):
+            with timed_stage("simulate"):
+                time.sleep(seconds)
+        averages = stage_averages(snapshot, 2)
+        assert list(averages) == [f"ave_{stage}_time" for stage in STAGES]
+        assert averages["ave_simulate_time"] >= seconds and averages["ave_oracle_time"] == 0
+
+    def unit_test_nested(seconds):
+        # The nested stages are counted as part of the outer stage only
+        @timed_stage("transpile")
+        def transpile_toy():
+            time.sleep(seconds)
+
+        snapshot = stage_snapshot()
+        with timed_stage("build"):
+            transpile_toy()
+        transpile_toy()
+        averages = stage_averages(snapshot, 1)
+        assert averages["ave_build_time"] >= seconds
+        assert seconds <= averages["ave_transpile_time"] < 2 * seconds
+
+    def unit_test_unknown(seconds):
+        try:
+            with timed_stage("unknown"):
+                pass
+            assert False
+        except ValueError:
+            pass
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_stages, "function": unit_test_averages},
+        "1": {"input": test_input_stages, "function": unit_test_nested},
+        "2": {"input": test_input_stages, "function": unit_test_unknown},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
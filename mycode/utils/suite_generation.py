@@ -0,0 +1,435 @@
+"""
+This module solves the RY angles of control states from target input distributions
+and generates mixed-state test suites in bulk.
+
+It includes methods to:
+- Compute separable control-state angles, i.e., the inverse of
+  ``separable_control_state_probs``.
+- Compute entangled control-state angles via the binary-tree decomposition used by
+  ``entangled_control_state_preparation``.
+- Validate a test suite by checking its ``angles`` against its ``probs``.
+- Emit validated test suites in the schema of ``RQ2_config.py`` and ``RQ4_config.py``.
+
+All the solvers accept a 2D array with one distribution per row, so that thousands
+of suites are handled in one vectorised pass.
+"""
+
+import math
+import numpy as np
+from typing import Literal
+
+
+def separable_control_state_angles(probs: np.ndarray) -> np.ndarray:
+    """
+    Compute the angles of separable control states from their distributions.
+
+    The i-th angle is derived from the marginal probability of the i-th qubit
+    being |1>, i.e., θ_i = 2 * arcsin(sqrt(p_i(1))). The given distributions must
+    be product distributions, which is checked by ``validate_mixed_state_suite``.
+
+    Parameters
+    ----------
+    probs : np.ndarray
+        Distributions over 2^m basis states (little-endian), with shape (2^m,) or
+        (N, 2^m) for N distributions.
+
+    Returns
+    -------
+    np.ndarray
+        The angles with shape (m,) or (N, m).
+
+    Example
+    -------
+    >>> separable_control_state_angles(np.array([0.375, 0.125, 0.375, 0.125]))
+    array([1.04719755, 1.57079633])   # i.e., [π/3, π/2]
+    """
+    probs = np.asarray(probs, dtype=float)
+    rows = np.atleast_2d(probs)
+    m = int(math.log2(rows.shape[1]))
+
+    # Axis 1 + (m - 1 - i) of the reshaped array stands for the i-th qubit
+    tensor = rows.reshape((rows.shape[0],) + (2,) * m)
+    angles = np.empty((rows.shape[0], m))
+    for i in range(m):
+        other_axes = tuple(axis for axis in range(1, m + 1) if axis != m - i)
+        p_one = tensor.sum(axis=other_axes)[:, 1]
+        angles[:, i] = 2 * np.arcsin(np.sqrt(np.clip(p_one, 0, 1)))
+
+    return angles if probs.ndim == 2 else angles[0]
+
+
+def entangled_control_state_angles(probs: np.ndarray) -> np.ndarray:
+    """
+    Compute the angles of entangled control states from their distributions.
+
+    The angles follow the binary tree of ``entangled_control_state_preparation``:
+    the angle of the i-th qubit conditioned on the lower i qubits being ``j`` is
+    stored at index 2^i - 1 + j, and it splits the marginal probability of ``j``
+    into the i-th qubit being |0> or |1>. Any distribution can be prepared in this way.
+
+    Parameters
+    ----------
+    probs : np.ndarray
+        Distributions over 2^m basis states (little-endian), with shape (2^m,) or
+        (N, 2^m) for N distributions.
+
+    Returns
+    -------
+    np.ndarray
+        The angles with shape (2^m - 1,) or (N, 2^m - 1).
+
+    Example
+    -------
+    >>> entangled_control_state_angles(np.array([1/3, 1/3, 1/3, 0]))
+    array([1.23095942, 1.57079633, 0.        ])
+    """
+    probs = np.asarray(probs, dtype=float)
+    rows = np.atleast_2d(probs)
+    m = int(math.log2(rows.shape[1]))
+
+    angle_blocks = []
+    for i in range(m):
+        # Marginal distribution of the lowest (i + 1) qubits
+        marginal = rows.reshape(rows.shape[0], 2 ** (m - i - 1), 2 ** (i + 1)).sum(axis=1)
+        p_zero, p_one = marginal[:, :2**i], marginal[:, 2**i:]
+        # arctan2(0, 0) = 0, i.e., unreachable branches are left unrotated
+        angle_blocks.append(2 * np.arctan2(np.sqrt(np.clip(p_one, 0, None)), np.sqrt(np.clip(p_zero, 0, None))))
+
+    angles = np.concatenate(angle_blocks, axis=1)
+    return angles if probs.ndim == 2 else angles[0]
+
+
+def control_state_probs(angles: np.ndarray, con_pre_mode: Literal["sep", "ent"]) -> np.ndarray:
+    """
+    Compute the distributions of control states prepared with the given angles.
+
+    This is the vectorised counterpart of ``separable_control_state_probs``, which
+    also supports entangled control states.
+
+    Parameters
+    ----------
+    angles : np.ndarray
+        Angles with shape (N, m) for ``"sep"`` or (N, 2^m - 1) for ``"ent"``.
+    con_pre_mode : {"sep", "ent"}
+        Separable or entangled control states.
+
+    Returns
+    -------
+    np.ndarray
+        The distributions over 2^m basis states with shape (N, 2^m).
+    """
+    angles = np.atleast_2d(np.asarray(angles, dtype=float))
+    num_rows = angles.shape[0]
+    if con_pre_mode == "sep":
+        m = angles.shape[1]
+    elif con_pre_mode == "ent":
+        m = int(math.log2(angles.shape[1] + 1))
+    else:
+        raise ValueError(f"Unknown control state preparation mode: {con_pre_mode}")
+
+    probs = np.ones((num_rows, 1))
+    for i in range(m):
+        if con_pre_mode == "sep":
+            theta = angles[:, i:i + 1]
+        else:
+            theta = angles[:, 2**i - 1: 2**(i + 1) - 1]
+        # The new qubit is the most significant one, so it indexes the upper half
+        probs = np.concatenate([probs * np.cos(theta / 2) ** 2, probs * np.sin(theta / 2) ** 2], axis=1)
+    return probs
+
+
+def _input_probs(
+    control_probs: np.ndarray,
+    n: int,
+    m: int,
+    num_mixed_states: int,
+    post_selected: bool
+) -> np.ndarray:
+    """
+    Map the distributions of control states to those of the n-qubit test inputs.
+
+    With 2^k mixed states, the lowest (n - k) control qubits are copied onto the
+    lowest target qubits, while the top k target qubits are fixed. For the hybrid
+    mixed-pure states, the control value 2^m - 1 is rejected by post-selection.
+
+    Returns an array with shape (num_mixed_states, N, 2^n).
+    """
+    control_probs = np.array(control_probs, dtype=float)
+    if post_selected:
+        control_probs[:, -1] = 0
+        control_probs /= control_probs.sum(axis=1, keepdims=True)
+
+    num_low = n - int(math.log2(num_mixed_states))
+    low_probs = control_probs.reshape(control_probs.shape[0], 2 ** (m - num_low), 2 ** num_low).sum(axis=1)
+
+    input_probs = np.zeros((num_mixed_states, control_probs.shape[0], 2 ** n))
+    for top_val in range(num_mixed_states):
+        input_probs[top_val, :, top_val * 2**num_low: (top_val + 1) * 2**num_low] = low_probs
+    return input_probs
+
+
+def validate_mixed_state_suite(suite: dict, post_selected: bool = False, atol: float = 1e-3) -> None:
+    """
+    Check that the ``angles`` of a test suite prepare the given ``probs``.
+
+    The number of mixed states is the number of entries in ``angles``, e.g., one for
+    the 1MS mode and two for the 2MS mode, where the i-th entry covers the i-th
+    block of the input domain. The control state is separable if ``num_control``
+    angles are given, and entangled otherwise.
+
+    Parameters
+    ----------
+    suite : dict
+        A test suite with the keys ``num_target``, ``num_control``, ``angles``,
+        ``probs`` and ``saving_name``.
+    post_selected : bool, optional
+        Whether the suite is used by the hybrid mixed-pure mode, where the control
+        value 2^m - 1 is rejected.
+    atol : float, optional
+        Absolute tolerance of the probabilities, which accounts for rounded angles
+        such as 1.911.
+
+    Raises
+    ------
+    ValueError
+        If the suite is malformed or its angles do not prepare its probabilities.
+    """
+    n, m = suite["num_target"], suite["num_control"]
+    name = suite.get("saving_name", "")
+    angle_lists = list(suite["angles"].values())
+    prob_lists = list(suite["probs"].values())
+    num_mixed_states = len(angle_lists)
+
+    if len(prob_lists) != num_mixed_states:
+        raise ValueError(f"Suite {name}: {num_mixed_states} angle lists but {len(prob_lists)} probability lists.")
+    if num_mixed_states & (num_mixed_states - 1) or num_mixed_states > 2**n:
+        raise ValueError(f"Suite {name}: the number of mixed states must be a power of two up to 2^n.")
+    if m < n - int(math.log2(num_mixed_states)):
+        raise ValueError(f"Suite {name}: {m} control qubits cannot cover the mixed target qubits.")
+
+    for angle_list in angle_lists:
+        if len(angle_list) not in (m, 2**m - 1):
+            raise ValueError(f"Suite {name}: expected {m} or {2**m - 1} angles, got {len(angle_list)}.")
+
+    for top_val, (angle_list, prob_list) in enumerate(zip(angle_lists, prob_lists)):
+        if len(prob_list) != 2**n:
+            raise ValueError(f"Suite {name}: expected {2**n} probabilities, got {len(prob_list)}.")
+        con_pre_mode = "sep" if len(angle_list) == m else "ent"
+        control_probs = control_state_probs(np.array([angle_list]), con_pre_mode)
+        prepared_probs = _input_probs(control_probs, n, m, num_mixed_states, post_selected)[top_val, 0]
+        if not np.allclose(prepared_probs, prob_list, atol=atol):
+            raise ValueError(
+                f"Suite {name}: angles {list(angle_list)} prepare {prepared_probs.tolist()}, "
+                f"which mismatches probs {list(prob_list)}."
+            )
+
+
+def generate_mixed_state_suites(
+    target_probs: np.ndarray,
+    n: int,
+    num_mixed_states: Literal[1, 2],
+    con_pre_mode: Literal["sep", "ent"],
+    m: int | None = None,
+    name_prefix: str = "G",
+    start_index: int = 0,
+    atol: float = 1e-9
+) -> dict[str, dict]:
+    """
+    Generate validated mixed-state test suites from target distributions in bulk.
+
+    Each row of ``target_probs`` is the distribution over the mixed (lowest) target
+    qubits, i.e., n qubits for the 1MS mode and n - 1 qubits for the 2MS mode, where
+    the most significant qubit is fixed to 0 and 1 respectively. The control state is
+    extended uniformly over the ``m`` control qubits, and the angles of all the rows
+    are solved in one vectorised pass.
+
+    Parameters
+    ----------
+    target_probs : np.ndarray
+        Target distributions with shape (N, 2^(n - k)), where 2^k = num_mixed_states.
+    n : int
+        Number of target qubits.
+    num_mixed_states : {1, 2}
+        One mixed state (1MS) or two mixed states split on the top qubit (2MS).
+    con_pre_mode : {"sep", "ent"}
+        Solve separable or entangled control states. Separable control states can
+        only realize product distributions.
+    m : int, optional
+        Number of control qubits, which defaults to the number of mixed qubits.
+    name_prefix : str, optional
+        Prefix of the saving names, e.g., ``"G"`` yields ``"G0"``, ``"G1"``, ...
+    start_index : int, optional
+        Index of the first generated suite.
+    atol : float, optional
+        Absolute tolerance used to validate the generated suites.
+
+    Returns
+    -------
+    dict[str, dict]
+        Test suites keyed by ``test_suite_<index>``, in the same schema as the
+        ``mixed_state_suites`` of ``RQ2_config.py`` and ``RQ4_config.py``.
+
+    Raises
+    ------
+    ValueError
+        If the targets are not distributions, or cannot be prepared by the chosen
+        control states.
+
+    Example
+    -------
+    >>> suites = generate_mixed_state_suites(np.array([[0.25, 0.75]]), 2, 2, "sep")
+    >>> suites["test_suite_0"]["angles"]
+    {'G0-1': [2.0943951023931957], 'G0-2': [2.0943951023931957]}
+    """
+    target_probs = np.atleast_2d(np.asarray(target_probs, dtype=float))
+    num_low = n - int(math.log2(num_mixed_states))
+    if target_probs.shape[1] != 2**num_low:
+        raise ValueError(f"Expected distributions over {2**num_low} states, got {target_probs.shape[1]}.")
+    if np.any(target_probs < -atol) or not np.allclose(target_probs.sum(axis=1), 1, atol=1e-6):
+        raise ValueError("Each row of target_probs must be a probability distribution.")
+    if m is None:
+        m = num_low
+    if m < num_low:
+        raise ValueError(f"{m} control qubits cannot cover {num_low} mixed target qubits.")
+
+    # Extend the targets uniformly over the unused (most significant) control qubits
+    control_probs = np.kron(np.full(2 ** (m - num_low), 1 / 2 ** (m - num_low)), target_probs)
+    if con_pre_mode == "sep":
+        angles = separable_control_state_angles(control_probs)
+    elif con_pre_mode == "ent":
+        angles = entangled_control_state_angles(control_probs)
+    else:
+        raise ValueError(f"Unknown control state preparation mode: {con_pre_mode}")
+
+    # Vectorised validation of all the suites at once
+    prepared_probs = _input_probs(control_state_probs(angles, con_pre_mode), n, m, num_mixed_states, False)
+    expected_probs = _input_probs(control_probs, n, m, num_mixed_states, False)
+    mismatched = np.flatnonzero(~np.all(np.isclose(prepared_probs, expected_probs, atol=atol), axis=(0, 2)))
+    if mismatched.size > 0:
+        raise ValueError(
+            f"Rows {mismatched.tolist()} of target_probs cannot be prepared by '{con_pre_mode}' control states."
+        )
+
+    suites = {}
+    for row, angle_row in enumerate(angles):
+        index = start_index + row
+        name = f"{name_prefix}{index}"
+        angle_list = angle_row.tolist()
+        suites[f"test_suite_{index}"] = {
+            "num_target": n,
+            "num_control": m,
+            "angles": {f"{name}-{k + 1}": list(angle_list) for k in range(num_mixed_states)},
+            "probs": {f"{name}-{k + 1}": expected_probs[k, row].tolist() for k in range(num_mixed_states)},
+            "saving_name": name
+        }
+    return suites
+
+
+if __name__ == "__main__":
+    """
+    Unit / Integration Testing for the angle solvers and the suite generator.
+    Run:
+        python -m mycode.utils.suite_generation
+    """
+    import importlib
+    import time
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_one_third_split():
+        # The hand-computed angle 1.911 of T4/T5 in RQ2 splits a qubit into 1/3 and 2/3
+        return np.array([1/6, 1/3, 1/6, 1/3])
+
+    def test_input_random_distributions():
+        rng = np.random.default_rng(0)
+        return rng.dirichlet(np.ones(8), size=1000)
+
+    def test_input_config_suites():
+        from ..config import ABB2FULL_MAPPING
+        suites = []
+        for program_name in ABB2FULL_MAPPING.values():
+            for rq_name in ["RQ2", "RQ4"]:
+                try:
+                    config = importlib.import_module(f"mycode.testing.{program_name}.config.{rq_name}_config")
+                except ModuleNotFoundError:
+                    continue
+                for mode in ["all", "toy"]:
+                    suites += list(config.config_dict[mode]["mixed_state_suites"].items())
+        return suites
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_separable_angles(probs):
+        angles = separable_control_state_angles(probs)
+        assert np.allclose(angles, [1.9106, math.pi / 2], atol=1e-4)
+
+    def unit_test_entangled_angles(probs):
+        angles = entangled_control_state_angles(probs)
+        assert np.allclose(angles, [1.9106, math.pi / 2, math.pi / 2], atol=1e-4)
+        # Unreachable branches are left unrotated, e.g., T6_ent in RQ2
+        assert np.allclose(entangled_control_state_angles([1/3, 1/3, 1/3, 0]), [1.231, math.pi / 2, 0], atol=1e-3)
+
+    def unit_test_round_trip(probs):
+        # Entangled control states can prepare arbitrary distributions
+        angles = entangled_control_state_angles(probs)
+        assert angles.shape == (probs.shape[0], 7)
+        assert np.allclose(control_state_probs(angles, "ent"), probs)
+        # Separable control states reproduce the products of the marginals
+        product_probs = control_state_probs(separable_control_state_angles(probs), "sep")
+        assert np.allclose(control_state_probs(separable_control_state_angles(product_probs), "sep"), product_probs)
+
+    def unit_test_infeasible_separable(probs):
+        try:
+            generate_mixed_state_suites(probs[:2], 3, 1, "sep")
+        except ValueError:
+            return
+        raise AssertionError("Correlated distributions should not be prepared by separable control states.")
+
+    # ----------------------------
+    # Integration tests
+    # ----------------------------
+
+    def integration_test_config_suites(suites):
+        # The hand-written angles and probs of every configured suite should agree
+        for key, suite in suites:
+            validate_mixed_state_suite(suite, post_selected=key.startswith("test_suite_6_"))
+
+    def integration_test_bulk_generation(probs):
+        start_time = time.time()
+        suites_2MS = generate_mixed_state_suites(probs[:, :2] / probs[:, :2].sum(axis=1, keepdims=True), 2, 2, "ent")
+        suites_1MS = generate_mixed_state_suites(probs[:, :4] / probs[:, :4].sum(axis=1, keepdims=True), 2, 1, "ent", m=3)
+        print(f"Generated {len(suites_2MS) + len(suites_1MS)} suites in {time.time() - start_time:.3f}s")
+        assert len(suites_2MS) == len(suites_1MS) == probs.shape[0]
+        for suite in list(suites_2MS.values())[:50] + list(suites_1MS.values())[:50]:
+            validate_mixed_state_suite(suite, atol=1e-9)
+        # The generated suites follow the existing schema
+        suite = suites_2MS["test_suite_0"]
+        assert set(suite.keys()) == {"num_target", "num_control", "angles", "probs", "saving_name"}
+        assert list(suite["angles"].keys()) == ["G0-1", "G0-2"]
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_one_third_split, "function": unit_test_separable_angles},
+        "1": {"input": test_input_one_third_split, "function": unit_test_entangled_angles},
+        "2": {"input": test_input_random_distributions, "function": unit_test_round_trip},
+        "3": {"input": test_input_random_distributions, "function": unit_test_infeasible_separable},
+        "4": {"input": test_input_config_suites, "function": integration_test_config_suites},
+        "5": {"input": test_input_random_distributions, "function": integration_test_bulk_generation},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
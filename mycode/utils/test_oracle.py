@@ -2,6 +2,33 @@ from scipy.stats import mannwhitneyu
 import numpy as np
 from typing import Literal
 
+from .stage_timing import timed_stage
+
+@timed_stage("sampling")
+def expected_samples(outcomes: range | int, size: int, p: list[float] | np.ndarray) -> np.ndarray:
+    """
+    Draw samples from the expected probability distribution of a test case.
+
+    The samples are drawn by ``np.random.choice`` as before, so that seeded results are 
+    unchanged, while the time is counted as the sampling stage (see ``stage_timing.py``).
+
+    Parameters
+    ----------
+    outcomes : range or int
+        The outcomes (or their number) to sample from, e.g., ``range(2 ** qc.num_clbits)``.
+    size : int
+        The number of samples, i.e., the shots of the test case.
+    p : list or array-like
+        The expected probabilities of the outcomes, e.g., given by a specification.
+
+    Returns
+    -------
+    np.ndarray
+        The samples, to be compared with the measurement results by ``OPO_UTest``.
+    """
+    return np.random.choice(outcomes, size=size, p=p)
+
+@timed_stage("oracle")
 def OPO_UTest(
     exp_samps: list | np.ndarray, 
     test_samps: list | np.ndarray, 
@@ -34,9 +61,9 @@ def OPO_UTest(
  
     """
     
-    # Ensure the inputs are in list format for the statistical test
-    exp_samps = list(exp_samps)
-    test_samps = list(test_samps)
+    # Ensure the inputs are arrays for the statistical test, without copying arrays
+    exp_samps = np.asarray(exp_samps)
+    test_samps = np.asarray(test_samps)
 
     # Perform the Mann–Whitney U test
     # Returns U statistic (ignored here) and the two-sided p-value
@@ -56,7 +83,7 @@ if __name__ == "__main__":
     """
     Unit testing for OPO_UTest.
     Run:
-        python mycode/utils/test_oracle.py
+        python -m mycode.utils.test_oracle
     """
 
     # ----------------------------
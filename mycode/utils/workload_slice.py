@@ -0,0 +1,255 @@
+from contextlib import contextmanager
+from typing import Iterator
+
+# The slice applied to the testing processes decorated with `journaled`, if any
+_active_slice = None
+
+
+def parse_int_ranges(value: str) -> list[int]:
+    """
+    Parse a comma-separated list of integers and inclusive ranges.
+
+    Parameters
+    ----------
+    value : str
+        The list, e.g., ``"2,4-6"``.
+
+    Returns
+    -------
+    list[int]
+        The integers in order without duplicates.
+
+    Raises
+    ------
+    ValueError
+        If an entry is not an integer or a range ``a-b`` with ``a <= b``.
+
+    Example
+    -------
+    >>> parse_int_ranges("2,4-6")
+    [2, 4, 5, 6]
+    """
+    numbers = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        start, _, stop = entry.partition("-")
+        if not start.isdigit() or (stop and not stop.isdigit()):
+            raise ValueError(f"Invalid integer or range: {entry!r}")
+        stop = stop or start
+        if int(start) > int(stop):
+            raise ValueError(f"Invalid range: {entry!r}")
+        numbers += range(int(start), int(stop) + 1)
+    if not numbers:
+        raise ValueError(f"No integer is given: {value!r}")
+    return list(dict.fromkeys(numbers))
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parse a shard `i/N`, i.e., the i-th of N shards counted from 0.
+
+    Example
+    -------
+    >>> parse_shard("1/4")
+    (1, 4)
+    """
+    index, _, count = value.partition("/")
+    if not index.isdigit() or not count.isdigit() or int(index) >= int(count):
+        raise ValueError(f"Invalid shard {value!r}, expected `i/N` with 0 <= i < N")
+    return int(index), int(count)
+
+
+class WorkloadSlice:
+    """
+    A selection of the work items of the testing processes.
+
+    A work item (see ``checkpoint_journal.py``) is selected if it matches every given
+    filter. The filters of n, suites and shots only apply to the items with such an
+    argument, i.e., the input size of an element of `n_list` or the number of target
+    qubits of a mixed-state suite, the `saving_name` of a suite (e.g., `T1`), and the
+    shots. The shard selects the items whose keys, i.e., the SHA-256 hashes of their
+    processes and arguments, equal its index modulo the number of shards, so that the
+    shards are disjoint, cover all the items, and do not depend on the machine. The
+    items select the work items by their keys, e.g., the subset chosen for a budget.
+
+    Parameters
+    ----------
+    n : list[int] or None
+        The input sizes (i.e., numbers of target qubits) to run.
+    suites : list[str] or None
+        The saving names of the mixed-state suites to run.
+    shots : list[int] or None
+        The numbers of shots to run.
+    shard : tuple[int, int] or None
+        The index of the shard and the number of shards.
+    items : list[str] or None
+        The keys of the work items to run.
+
+    Example
+    -------
+    >>> workload = WorkloadSlice(n=[2], shard=(0, 2))
+    >>> workload.selects("0a" * 32, {"n_list": [2], "shots": 1024})
+    True
+    """
+
+    def __init__(
+        self,
+        n: list[int] | None = None,
+        suites: list[str] | None = None,
+        shots: list[int] | None = None,
+        shard: tuple[int, int] | None = None,
+        items: list[str] | None = None
+    ):
+        self.n = n
+        self.suites = suites
+        self.shots = shots
+        self.shard = shard
+        self.items = set(items) if items is not None else None
+
+    def selects(self, key: str, arguments: dict) -> bool:
+        if self.items is not None and key not in self.items:
+            return False
+        suite = None
+        if "inputs_list" in arguments and isinstance(arguments["inputs_list"][0], dict):
+            suite = arguments["inputs_list"][0]
+
+        if self.n is not None:
+            if "n_list" in arguments and arguments["n_list"][0] not in self.n:
+                return False
+            if suite is not None and suite.get("num_target") not in self.n:
+                return False
+        if self.suites is not None and suite is not None and suite.get("saving_name") not in self.suites:
+            return False
+        if self.shots is not None and "shots" in arguments and arguments["shots"] not in self.shots:
+            return False
+        if self.shard is not None:
+            index, count = self.shard
+            if int(key[:16], 16) % count != index:
+                return False
+        return True
+
+
+@contextmanager
+def workload_slice(
+    n: list[int] | None = None,
+    suites: list[str] | None = None,
+    shots: list[int] | None = None,
+    shard: tuple[int, int] | None = None,
+    items: list[str] | None = None
+) -> Iterator[WorkloadSlice]:
+    """
+    Skip the work items outside the slice in the testing processes decorated with `journaled`.
+
+    The results of the skipped items are left out, so that the CSV files only contain the
+    selected rows. The slices can be merged through their checkpoint journals.
+    """
+    global _active_slice
+    previous_slice = _active_slice
+    _active_slice = WorkloadSlice(n, suites, shots, shard, items)
+    try:
+        yield _active_slice
+    finally:
+        _active_slice = previous_slice
+
+
+def active_workload_slice() -> WorkloadSlice | None:
+    return _active_slice
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the workload slices.
+    Run:
+        python -m mycode.utils.workload_slice
+    """
+    import hashlib
+
+    from .checkpoint_journal import journaled
+    # The decorator consults the imported module rather than this script
+    from .workload_slice import workload_slice
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    @journaled
+    def testing_process_toy(program_version: str, n_list: list[int], shots: int, verbose: bool = False) -> list[dict]:
+        return [{"num_qubits": n, "num_shots": shots} for n in n_list]
+
+    @journaled
+    def testing_process_suites(program_version: str, inputs_list: list[dict], shots: int) -> list[dict]:
+        return [{"saving_name": suite["saving_name"]} for suite in inputs_list]
+
+    def test_input_suites():
+        return [
+            {"num_target": 2, "saving_name": "T1"},
+            {"num_target": 3, "saving_name": "T2"},
+            {"num_target": 3, "saving_name": "T4"}
+        ]
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_parse(suites):
+        assert parse_int_ranges("2,4-6,5") == [2, 4, 5, 6]
+        assert parse_shard("0/3") == (0, 3)
+        for invalid in ["", "3-1", "a"]:
+            try:
+                parse_int_ranges(invalid)
+                assert False
+            except ValueError:
+                pass
+        for invalid in ["3/3", "1", "-1/2"]:
+            try:
+                parse_shard(invalid)
+                assert False
+            except ValueError:
+                pass
+
+    def unit_test_filters(suites):
+        with workload_slice(n=[2, 3], shots=[8]):
+            assert testing_process_toy("v1", [1, 2, 3], 8) == [
+                {"num_qubits": 2, "num_shots": 8}, {"num_qubits": 3, "num_shots": 8}
+            ]
+            assert testing_process_toy("v1", [2], 16) == []
+        with workload_slice(n=[3], suites=["T1", "T2"]):
+            assert testing_process_suites("v1", suites, 8) == [{"saving_name": "T2"}]
+        # The suites do not filter the items without a suite
+        with workload_slice(suites=["T4"]):
+            assert len(testing_process_toy("v1", [1, 2], 8)) == 2
+
+    def unit_test_shards(suites):
+        # The shards are a partition of the items
+        sharded = []
+        for index in range(3):
+            with workload_slice(shard=(index, 3)):
+                sharded += testing_process_toy("v1", list(range(1, 13)), 8)
+        assert sorted(record["num_qubits"] for record in sharded) == list(range(1, 13))
+        # A shard is decided by the key only
+        key = hashlib.sha256(b"item").hexdigest()
+        assert [WorkloadSlice(shard=(index, 4)).selects(key, {}) for index in range(4)].count(True) == 1
+        # The items are selected by their keys
+        assert WorkloadSlice(items=[key]).selects(key, {}) and not WorkloadSlice(items=[]).selects(key, {})
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_suites, "function": unit_test_parse},
+        "1": {"input": test_input_suites, "function": unit_test_filters},
+        "2": {"input": test_input_suites, "function": unit_test_shards},
+    }
+
+    for test_id, execution_dict in executed_test.items():
+        print(f"test_id={test_id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise
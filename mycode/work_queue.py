@@ -0,0 +1,469 @@
+"""
+This module distributes a replication campaign over several nodes through a SQLite store.
+
+The store is a single SQLite file on a filesystem shared by the nodes (e.g., an NFS
+mount), so that no message broker is needed. A campaign is submitted as work units
+(see `mycode/campaign.py`), and each worker started by `python -m mycode.run --worker`
+repeatedly leases the most expensive pending unit, runs it and marks it as done. A
+lease expires unless the worker renews it, so that the units of a crashed node are
+retried by the other workers, up to a maximum number of attempts.
+
+The recorded results of the work items (i.e., the entries of the checkpoint journals)
+are written back into the same store, so that a retried unit resumes from the items
+completed by its previous attempt, possibly on another node. The CSV files are saved
+by each unit into `RQ_saving_dir` as usual. A unit may carry a workload slice (see
+`mycode/utils/workload_slice.py`), e.g., the work items selected for a time budget.
+
+Note that the store relies on the file locks of SQLite, so the shared filesystem must
+support POSIX locks, and the clocks of the nodes should be roughly synchronized.
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Literal
+
+from .campaign import expand_units, run_unit
+from .utils import to_json
+
+# The default store at the root of the repository
+DEFAULT_QUEUE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "work_queue.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS units (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    program TEXT NOT NULL,
+    rq TEXT NOT NULL,
+    version TEXT NOT NULL,
+    cost REAL NOT NULL,
+    rep_mode TEXT NOT NULL,
+    seed INTEGER,
+    workload TEXT,
+    state TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    lease_expires REAL,
+    error TEXT,
+    UNIQUE (program, rq, version, rep_mode)
+);
+CREATE TABLE IF NOT EXISTS items (
+    key TEXT PRIMARY KEY,
+    unit_id INTEGER NOT NULL,
+    item TEXT NOT NULL,
+    records TEXT NOT NULL,
+    elapsed REAL NOT NULL
+);
+"""
+
+
+class WorkQueue:
+    """
+    A queue of work units with leases and retries, stored in a SQLite file.
+
+    Every operation opens its own connection and commits immediately, and the leasing
+    runs in an exclusive transaction, so that concurrent workers on several nodes never
+    lease the same unit at once.
+
+    Parameters
+    ----------
+    path : str
+        The path of the SQLite file, created if absent.
+    lease_timeout : float
+        The seconds after which an unrenewed lease expires.
+    max_attempts : int
+        The number of attempts before a unit is marked as failed.
+
+    Example
+    -------
+    >>> queue = WorkQueue("work_queue.sqlite")
+    >>> queue.submit([{"program": "qft", "rq": "1", "version": "v2", "cost": 8.0}], "toy")
+    1
+    >>> queue.lease("node-1")["version"]
+    'v2'
+    """
+
+    def __init__(self, path: str, lease_timeout: float = 600.0, max_attempts: int = 3):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as connection:
+            connection.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode, so that transactions are opened explicitly
+        connection = sqlite3.connect(self.path, timeout=60.0, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        try:
+            yield connection
+        finally:
+            connection.close()
+
+    def submit(
+        self,
+        units: list[dict],
+        rep_mode: Literal["toy", "all"] | None = None,
+        seed: int | None = None
+    ) -> int:
+        """
+        Add the units (see `expand_units`) to the queue and return the number of new ones.
+
+        A unit already in the queue is kept as is, unless it has failed and is then reset
+        to pending, so that a campaign can be resubmitted after failures. The optional
+        `workload` of a unit is the workload slice it runs, all its work items by default.
+        """
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            before = connection.total_changes
+            for unit in units:
+                connection.execute(
+                    "INSERT INTO units (program, rq, version, cost, rep_mode, seed, workload) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT (program, rq, version, rep_mode) DO UPDATE SET "
+                    "state = 'pending', attempts = 0, error = NULL, seed = excluded.seed, "
+                    "workload = excluded.workload WHERE state = 'failed'",
+                    # Store NULLs as values, as they are never equal in the unique constraint
+                    (unit["program"], unit["rq"], unit["version"] or "", unit["cost"], rep_mode or "all", seed,
+                     json.dumps(unit["workload"]) if unit.get("workload") else None)
+                )
+            connection.execute("COMMIT")
+            return connection.total_changes - before
+
+    def lease(self, worker: str) -> dict | None:
+        """
+        Lease the most expensive unit that is pending or whose lease has expired.
+
+        Returns:
+            dict | None: The leased unit, or None if no unit is available right now.
+        """
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            # Units whose last attempt expired are given up after the maximum attempts
+            connection.execute(
+                "UPDATE units SET state = 'failed', error = 'lease expired' "
+                "WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                (now, self.max_attempts)
+            )
+            row = connection.execute(
+                "SELECT * FROM units WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?) "
+                "ORDER BY cost DESC, id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE units SET state = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker, now + self.lease_timeout, row["id"])
+                )
+            connection.execute("COMMIT")
+        if row is None:
+            return None
+        unit = dict(row)
+        unit["version"] = unit["version"] or None
+        unit["workload"] = json.loads(unit["workload"]) if unit["workload"] is not None else None
+        unit["attempts"] += 1
+        return unit
+
+    def renew(self, unit_id: int, worker: str) -> bool:
+        """
+        Extend the lease of a unit, and return whether the worker still holds it.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE units SET lease_expires = ? WHERE id = ? AND worker = ? AND state = 'leased'",
+                (time.time() + self.lease_timeout, unit_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, unit_id: int, worker: str) -> bool:
+        """
+        Mark a unit as done, and return whether the worker still held its lease.
+
+        A worker whose lease expired and was taken over by another worker cannot
+        complete the unit, which is still run by the other worker.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE units SET state = 'done', error = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                (unit_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, unit_id: int, worker: str, error: str) -> bool:
+        """
+        Release a failed unit for a retry, or mark it as failed after the maximum attempts.
+
+        Returns:
+            bool: Whether the worker still held the lease, see `complete`.
+        """
+        with self._connect() as connection:
+            cursor = connection.execute(
+                "UPDATE units SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = ?, lease_expires = NULL WHERE id = ? AND worker = ? AND state = 'leased'",
+                (self.max_attempts, error, unit_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def status(self) -> dict[str, int]:
+        """
+        Count the units per state, i.e., `pending`, `leased`, `done` and `failed`.
+        """
+        with self._connect() as connection:
+            rows = connection.execute("SELECT state, COUNT(*) FROM units GROUP BY state").fetchall()
+        return {state: count for state, count in rows}
+
+    def journal(self, unit_id: int) -> "QueueJournal":
+        return QueueJournal(self, unit_id)
+
+
+class QueueJournal:
+    """
+    A checkpoint journal (see `mycode/utils/checkpoint_journal.py`) stored in the work queue.
+    """
+
+    def __init__(self, queue: WorkQueue, unit_id: int):
+        self.queue = queue
+        self.unit_id = unit_id
+
+    def get(self, key: str) -> list[dict] | None:
+        with self.queue._connect() as connection:
+            row = connection.execute("SELECT records FROM items WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["records"]) if row is not None else None
+
+    def append(self, key: str, item: dict, records: list[dict], elapsed: float) -> None:
+        with self.queue._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO items (key, unit_id, item, records, elapsed) VALUES (?, ?, ?, ?, ?)",
+                (key, self.unit_id, json.dumps(item, default=to_json),
+                 json.dumps(records, default=to_json), elapsed)
+            )
+
+
+def submit_campaign(
+    path: str,
+    experiments: list[tuple[str, str]],
+    rep_mode: Literal["toy", "all"] | None = None,
+    seed: int | None = None,
+    versions: list[str] | None = None,
+    items: list[dict] | None = None
+) -> int:
+    """
+    Submit the experiments as work units into the store and return the number of new units.
+
+    Given the work items selected for a time budget (see `mycode/planner.py`), each unit
+    only runs its own selected items, and the units without any are not submitted.
+    """
+    units = expand_units(experiments, rep_mode, versions)
+    if items is not None:
+        selected = {}
+        for item in items:
+            selected.setdefault((item["program"], item["rq"], item["version"]), []).append(item["key"])
+        units = [
+            dict(unit, workload={"items": selected[(unit["program"], unit["rq"], unit["version"])]})
+            for unit in units if (unit["program"], unit["rq"], unit["version"]) in selected
+        ]
+    return WorkQueue(path).submit(units, rep_mode, seed)
+
+
+def run_worker(
+    path: str,
+    worker: str | None = None,
+    verbose: bool = False,
+    cache_dir: str | None = None,
+    lease_timeout: float = 600.0,
+    poll_interval: float = 10.0,
+    profile: Literal["cpu", "mem"] | None = None
+) -> int:
+    """
+    Lease and run work units from the store until none is pending or leased.
+
+    While a unit runs, a background thread renews its lease every third of the timeout.
+    If the lease is lost (e.g., after a long pause), the unit is neither completed nor
+    released by this worker, as another worker has taken it over.
+    If other workers still hold leases, the worker polls the store, so that it can take
+    over the units whose leases expire.
+
+    Args:
+        path (str): The path of the store.
+        worker (str | None): The name of the worker, `<host>-<pid>` by default.
+        verbose (bool): Whether to print detailed progress information.
+        cache_dir (str | None): The result cache of the worker, see `mycode/utils/result_cache.py`.
+        lease_timeout (float): The seconds after which an unrenewed lease expires.
+        poll_interval (float): The seconds between polls while the other units are leased.
+        profile (Literal["cpu", "mem"] | None): Profile each unit by `cpu` or `mem`, see `mycode/campaign.py`.
+
+    Returns:
+        int: The number of units completed by the worker.
+    """
+    queue = WorkQueue(path, lease_timeout)
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    completed = 0
+    while True:
+        unit = queue.lease(worker)
+        if unit is None:
+            if queue.status().get("leased", 0) == 0:
+                return completed
+            time.sleep(poll_interval)
+            continue
+
+        name = f"{unit['program']}-RQ{unit['rq']}-{unit['version'] or 'all'}"
+        stop, lost = threading.Event(), threading.Event()
+
+        def heartbeat(unit_id=unit["id"], name=name):
+            while not stop.wait(lease_timeout / 3):
+                if not queue.renew(unit_id, worker):
+                    lost.set()
+                    print(f"Worker {worker}: lost the lease of unit {name} to another worker.")
+                    return
+
+        renewer = threading.Thread(target=heartbeat, daemon=True)
+        renewer.start()
+        try:
+            run_unit(unit, unit["rep_mode"], verbose, cache_dir, unit["seed"], queue.journal(unit["id"]), unit["workload"], profile)
+            # A unit taken over by another worker is left to that worker
+            if lost.is_set() or not queue.complete(unit["id"], worker):
+                print(f"Worker {worker}: unit {name} is finished after losing its lease, so it is not marked as done.")
+            else:
+                completed += 1
+                print(f"Worker {worker}: unit {name} is done!")
+        except Exception as e:
+            if lost.is_set() or not queue.fail(unit["id"], worker, repr(e)):
+                print(f"Worker {worker}: unit {name} failed after losing its lease: {e!r}")
+            else:
+                print(f"Worker {worker}: unit {name} failed: {e!r}")
+        finally:
+            stop.set()
+            renewer.join()
+
+
+if __name__ == "__main__":
+    """
+    Unit testing for the work queue.
+    Run:
+        python -m mycode.work_queue
+    """
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    # ----------------------------
+    # Test inputs
+    # ----------------------------
+
+    def test_input_queue():
+        units = [
+            {"program": "qft", "rq": "1", "version": f"v{index}", "cost": float(index)}
+            for index in range(1, 9)
+        ]
+        return os.path.join(tempfile.mkdtemp(), "work_queue.sqlite"), units
+
+    def lease_all(path, worker):
+        # Lease units as a worker process until none is left
+        queue, leased = WorkQueue(path), []
+        while (unit := queue.lease(worker)) is not None:
+            leased.append(unit["id"])
+            queue.complete(unit["id"], worker)
+        return leased
+
+    # ----------------------------
+    # Unit tests
+    # ----------------------------
+
+    def unit_test_lease_order(test_input):
+        path, units = test_input
+        queue = WorkQueue(path, max_attempts=1)
+        assert queue.submit(units, "toy") == 8
+        # The most expensive units are leased first
+        assert queue.lease("w")["version"] == "v8"
+        queue.complete(queue.lease("w")["id"], "w")
+        # The resubmission only resets the failed units
+        queue.fail(queue.lease("w")["id"], "w", "error")
+        assert queue.submit(units + [{"program": "id", "rq": "1", "version": None, "cost": 0.0}], "toy") == 2
+        assert queue.submit(units[:1], "toy") == 0
+        assert queue.status() == {"done": 1, "leased": 1, "pending": 7}
+
+    def unit_test_retry(test_input):
+        path, units = test_input
+        queue = WorkQueue(path, lease_timeout=0.05, max_attempts=2)
+        queue.submit(units[:1], "toy")
+        first = queue.lease("crashed")
+        assert queue.lease("w") is None
+        # The expired lease is taken over, and the old worker cannot renew it
+        time.sleep(0.1)
+        second = queue.lease("w")
+        assert second["id"] == first["id"] and second["attempts"] == 2
+        assert not queue.renew(first["id"], "crashed") and queue.renew(first["id"], "w")
+        # A failure after the maximum attempts is final
+        queue.fail(second["id"], "w", "error")
+        assert queue.lease("w") is None and queue.status() == {"failed": 1}
+
+    def unit_test_stale_worker(test_input):
+        path, units = test_input
+        queue = WorkQueue(path, lease_timeout=0.05)
+        queue.submit(units[:1], "toy")
+        first = queue.lease("a")
+        time.sleep(0.1)
+        second = queue.lease("b")
+        assert second["id"] == first["id"]
+        queue.renew(second["id"], "b")
+        # The late results of the old worker neither release nor complete the unit of the new one
+        assert not queue.fail(first["id"], "a", "error") and queue.lease("c") is None
+        assert not queue.complete(first["id"], "a") and queue.status() == {"leased": 1}
+        assert queue.complete(second["id"], "b") and queue.status() == {"done": 1}
+        assert not queue.complete(second["id"], "b")
+
+    def unit_test_budget_units(test_input):
+        path, units = test_input
+        experiments = [("qft", "1")]
+        version = expand_units(experiments, "toy")[0]["version"]
+        items = [{"program": "qft", "rq": "1", "version": version, "key": key} for key in ["a", "b"]]
+        # Only the units with selected items are submitted, and each one runs its own items
+        assert submit_campaign(path, experiments, "toy", items=items) == 1
+        unit = WorkQueue(path).lease("w")
+        assert unit["version"] == version and unit["workload"] == {"items": ["a", "b"]}
+        assert submit_campaign(path, experiments, "toy") == len(expand_units(experiments, "toy")) - 1
+        assert all(unit["workload"] is None for unit in iter(lambda: WorkQueue(path).lease("w"), None))
+
+    def unit_test_journal(test_input):
+        path, units = test_input
+        queue = WorkQueue(path)
+        journal = queue.journal(1)
+        journal.append("key", {"process": "toy"}, [{"ave_faults": 0.5}], 1.0)
+        assert WorkQueue(path).journal(2).get("key") == [{"ave_faults": 0.5}]
+        assert journal.get("missing") is None
+
+    def unit_test_concurrent_workers(test_input):
+        path, units = test_input
+        WorkQueue(path).submit(units, "toy")
+        # Several worker processes lease every unit exactly once
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            leased = list(executor.map(lease_all, [path] * 4, [f"w{index}" for index in range(4)]))
+        assert sorted(sum(leased, [])) == list(range(1, 9))
+        assert WorkQueue(path).status() == {"done": 8}
+
+    # ----------------------------
+    # Test execution table
+    # ----------------------------
+
+    executed_test = {
+        "0": {"input": test_input_queue, "function": unit_test_lease_order},
+        "1": {"input": test_input_queue, "function": unit_test_retry},
+        "2": {"input": test_input_queue, "function": unit_test_journal},
+        "3": {"input": test_input_queue, "function": unit_test_concurrent_workers},
+        "4": {"input": test_input_queue, "function": unit_test_stale_worker},
+        "5": {"input": test_input_queue, "function": unit_test_budget_units},
+    }
+
+    for id, execution_dict in executed_test.items():
+        print(f"test_id={id}:")
+        test_input = execution_dict["input"]()
+        try:
+            execution_dict["function"](test_input)
+            print("pass")
+        except AssertionError as e:
+            print("fail")
+            raise